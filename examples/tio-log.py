@@ -10,6 +10,8 @@ Log data!
 
 import tldevice
 import argparse
+import queue
+from tiotools.tiotsv import TSVWriter
 
 parser = argparse.ArgumentParser(prog='tio_log', 
                                  description='Very simple logging utility.')
@@ -27,20 +29,30 @@ parser.add_argument("--rpc",
                     default=[],
                     type=lambda kv: kv.split(":"), 
                     help='Commands to be run on start; rpc:type:val')
+parser.add_argument("--precision", 
+                    type=int,
+                    default=None,
+                    help='Significant digits of floats (default: full precision)')
 args = parser.parse_args()
 
 device = tldevice.Device(url=args.url, rpcs=args.rpc)
 
-file = open(args.logfile,'w') 
+file = TSVWriter(args.logfile, precision=args.precision, threaded=True)
 
 print(f"Logging to {args.logfile} ...")
 
-file.write("\t".join(map(str,device.data.columnnames()))+"\n")
-
-for row in device.data.iter():
-  # Tab delimited data
-  rowstring = "\t".join(map(str,row))+"\n"
-  # Write line
-  file.write(rowstring)
+file.write_header(device.data.columnnames())
+
+device._tio.pub_flush()
+try:
+  while True:
+    # Everything received since the last pass, formatted and written as one block
+    try:
+      file.write_block(device.data.read_available(timeout=1))
+    except queue.Empty:
+      continue
+    device._tio.pub_warn_overload()
+finally:
+  file.close()
 
 
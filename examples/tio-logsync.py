@@ -11,6 +11,7 @@ Log data!
 import tldevicesync
 import argparse
 import datetime
+from tiotools.tiotsv import TSVWriter
 
 now =  datetime.datetime.now()
 filenamedefault = now.strftime("Log %Y-%m-%d %H;%M.tsv")
@@ -31,26 +32,32 @@ parser.add_argument("--rpc",
                     default=[],
                     type=lambda kv: kv.split(":"), 
                     help='Commands to be run on start; rpc:type:val')
+parser.add_argument("--precision", 
+                    type=int,
+                    default=None,
+                    help='Significant digits of floats (default: full precision)')
 args = parser.parse_args()
 
 tio = tldevicesync.DeviceSync(url=args.url, rpcs=args.rpc)
 
-file = open(args.logfile,'w') 
-
-print(f"Logging to {args.logfile} ...")
-
 streams = []
 streams += [tio.vmr0.vector]
 streams += [tio.vmr1.vector]
 ss = tldevicesync.SyncStream(streams)
 
-# Write column names as header
-file.write("\t".join(map(str,ss.columnnames()))+"\n")
+# Times are written in full
+file = TSVWriter(args.logfile, precision=[None] + [args.precision]*(len(ss.columnnames())-1), threaded=True)
 
-for row in ss.iter():
-  # Tab delimited data
-  rowstring = "\t".join(map(str,row))+"\n"
-  # Write line
-  file.write(rowstring)
+print(f"Logging to {args.logfile} ...")
+
+# Write column names as header
+file.write_header(ss.columnnames())
+
+try:
+  while True:
+    # Everything queued on the streams, formatted and written as one block
+    file.write_block(ss.readAvailable())
+finally:
+  file.close()
 
 
@@ -10,6 +10,7 @@ Log raw data from TCP port.
 
 import argparse
 import socket
+import tio.tio_logzip
 
 parser = argparse.ArgumentParser(prog='tio-record', 
                                  description='Log raw data from TCP port.')
@@ -18,6 +19,10 @@ parser.add_argument("file",
                     nargs='?', 
                     default='log.tio',
                     help='filename to store data')
+parser.add_argument("--compress",
+                    choices=['zlib', 'lzma'],
+                    default=None,
+                    help='store compressed chunks (read transparently by tiologparse and tio)')
 parser.add_argument("-v","--verbosity",
                     type=int,
                     default = 1,
@@ -37,13 +42,19 @@ if args.verbosity>0:
   stored = 0
   spinner.start()
 
+if args.compress:
+  args.file = tio.tio_logzip.TIOZWriter(args.file, codec=args.compress)
+
 with args.file as file:
-  while True:
-    data = s.recv(1024)
-    file.write(data)
-    if args.verbosity>0:
-      stored += len(data)
-      spinner.text = f"Recorded {stored} bytes."
+  try:
+    while True:
+      data = s.recv(1024)
+      file.write(data)
+      if args.verbosity>0:
+        stored += len(data)
+        spinner.text = f"Recorded {stored} bytes."
+  except KeyboardInterrupt:
+    pass # Closing the file writes the last compressed chunk and the chunk index
 
 if args.verbosity>0:
   spinner.stop()
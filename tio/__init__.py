@@ -1,2 +1,10 @@
 from .tio_protocol import *
 from .tio_session import *
+# Modules that need numpy are imported where they are used: tio.tio_decimate, tio.tio_runstats, tio.tio_logreader,
+# tio.tio_logindex, tio.tio_logexport, tio.tio_resample, tio.tio_logdataset. tio.tio_logzip (compressed logs) needs
+# only the standard library
+
+def open_log(paths, cacheSize=16, every=1<<20, verbose=False):
+  """Lazily decoded view of a .tio log (or of the files of one recording); see tio.tio_logdataset"""
+  from .tio_logdataset import open_log
+  return open_log(paths, cacheSize=cacheSize, every=every, verbose=verbose)
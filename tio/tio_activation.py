@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Source activation manager
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Reference counts the sources that readers need so that a polling loop does
+not switch a source on and off around every read. Sources switched on here
+are switched off again only after they have been unused for a while, and all
+changes that come due together are sent together.
+"""
+
+import contextlib
+import threading
+import time
+from .tio_protocol import *
+
+class TIOSourceActivation(object):
+  def __init__(self, session, linger=2.0, timeout=2.0):
+    self.session = session
+    self.linger = linger # Seconds an unused source stays on before it is switched off
+    self.timeout = timeout # Seconds to wait for the new stream layout
+    self.lock = threading.RLock() # Guards the counts; never held while waiting on the device
+    self.changing = threading.Lock() # One change of the stream layout at a time
+    self.refs = {}
+    self.owned = set() # Sources that were switched on here rather than by the device configuration
+    self.pendingOff = {} # topic: time after which it is switched off
+    self.timer = None
+
+  def acquire(self, topics):
+    """Marks sources as in use, switches on those that are off and waits for the stream metadata.
+    The sources are only counted once they are on, so nothing is left counted if that fails."""
+    with self.lock:
+      if all(topic in self.refs for topic in topics): # Already on and in use
+        for topic in topics:
+          self.refs[topic] += 1
+        return
+    with self.changing:
+      with self.lock:
+        lingering = { topic: self.pendingOff.pop(topic) for topic in topics if topic in self.pendingOff }
+      inactive = [topic for topic in topics if topic not in self.session.protocol.columnsByName]
+      try:
+        if inactive:
+          failed = self.switch(inactive, True)
+          with self.lock:
+            self.owned.update(topic for topic in inactive if topic not in failed)
+          if failed:
+            raise next(iter(failed.values()))
+          self.wait(inactive)
+      except BaseException:
+        with self.lock:
+          # Sources switched on or kept on for this call are switched off again in time
+          now = time.monotonic()
+          for topic in topics:
+            if topic not in self.refs and topic in self.owned:
+              self.pendingOff[topic] = lingering.get(topic, now + self.linger)
+          if self.pendingOff and self.timer is None:
+            self.schedule()
+        raise
+      with self.lock:
+        for topic in topics:
+          self.refs[topic] = self.refs.get(topic, 0) + 1
+          self.pendingOff.pop(topic, None)
+
+  def release(self, topics):
+    """Marks sources as no longer in use; owned ones are switched off after the linger time"""
+    with self.lock:
+      for topic in topics:
+        self.refs[topic] = self.refs.get(topic, 0) - 1
+        if self.refs[topic] <= 0:
+          del self.refs[topic]
+          if topic in self.owned:
+            self.pendingOff[topic] = time.monotonic() + self.linger
+      if self.pendingOff and self.timer is None:
+        self.schedule()
+
+  @contextlib.contextmanager
+  def active(self, topics):
+    self.acquire(topics)
+    try:
+      yield
+    finally:
+      self.release(topics)
+
+  def wait(self, topics, on=True):
+    """Waits for the stream layout to include the sources, or with on=False to leave them out"""
+    changed = lambda: all((topic in self.session.protocol.columnsByName) == on for topic in topics)
+    with self.session.metadataCondition:
+      if self.session.metadataCondition.wait_for(changed, timeout=self.timeout/2):
+        return
+    self.session.data_send_all() # Ask again in case the device did not announce the new layout
+    with self.session.metadataCondition:
+      if not self.session.metadataCondition.wait_for(changed, timeout=self.timeout/2):
+        self.session.logger.error(f"Stream layout {'did not include' if on else 'still included'} {topics} after {'activation' if on else 'deactivation'}")
+
+  def schedule(self):
+    delay = max(0, min(self.pendingOff.values()) - time.monotonic())
+    self.timer = threading.Timer(delay, self.flush)
+    self.timer.daemon = True
+    self.timer.start()
+
+  def switch(self, topics, on):
+    """Sets .data.active of the sources with one batch of RPCs. Returns the errors of those that failed by topic."""
+    replies = self.session.rpc_val_batch([ (topic+".data.active", UINT8_T, int(on)) for topic in topics ])
+    return { topic: reply for topic, reply in zip(topics, replies) if isinstance(reply, Exception) }
+
+  def flush(self):
+    """Switches off every source whose linger time has passed, in one batch"""
+    with self.changing:
+      with self.lock:
+        self.timer = None
+        now = time.monotonic()
+        due = [topic for topic, deadline in self.pendingOff.items() if deadline <= now]
+        for topic in due:
+          del self.pendingOff[topic]
+          self.owned.discard(topic)
+      failed = self.switch(due, False) if due else {}
+      for topic, error in failed.items():
+        self.session.logger.error(f"Could not switch off {topic}: {error}")
+      # Until the layout leaves them out, acquire() would take these sources to be still on
+      switchedOff = [topic for topic in due if topic not in failed]
+      if switchedOff:
+        self.wait(switchedOff, on=False)
+      with self.lock:
+        if self.pendingOff and self.timer is None:
+          self.schedule()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Host-side streaming decimation
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Stateful decimating filters that run on blocks of decoded samples, so that a
+reader can follow a high-rate source at a low rate while the full-rate data
+stays available to other readers.
+
+Every method is an FIR filter followed by downsampling: a boxcar average, a
+CIC filter (a cascade of boxcars, expressed through its equivalent taps) or a
+windowed-sinc lowpass. Outputs are placed on a fixed grid of input sample
+numbers, so block boundaries do not shift them, and the filter restarts after
+a gap in the sample numbers instead of averaging across it.
+"""
+
+import numpy as np
+
+def decimation_taps(factor, method='boxcar', order=3, numtaps=None, window='hamming', cutoff=0.8):
+  """FIR taps (normalized to unit DC gain) for the given decimation method"""
+  if method == 'boxcar':
+    taps = np.ones(factor)
+  elif method == 'cic':
+    taps = np.ones(1)
+    for stage in range(order):
+      taps = np.convolve(taps, np.ones(factor))
+  elif method == 'fir':
+    if numtaps is None:
+      numtaps = 8*factor + 1
+    n = np.arange(numtaps) - (numtaps-1)/2
+    fc = cutoff * 0.5 / factor # cycles per input sample
+    taps = 2*fc*np.sinc(2*fc*n) * getattr(np, window)(numtaps)
+  else:
+    raise ValueError(f"Unknown decimation method {method}")
+  return taps / taps.sum()
+
+class TIODecimator(object):
+  def __init__(self, factor, method='boxcar', **options):
+    self.factor = int(factor)
+    self.method = method
+    self.taps = decimation_taps(self.factor, method=method, **options)
+    self.delay = (len(self.taps)-1)/2 # Group delay in input samples
+    self.reset()
+
+  def reset(self):
+    self.history = None
+    self.nextSample = None
+
+  def process(self, sampleNumbers, data):
+    """Filters a block shaped (channels, samples) with its sample numbers.
+    Returns the output sample numbers (the centres of the filter windows, in input samples)
+    and the decimated data shaped (channels, outputs)."""
+    sampleNumbers = np.asarray(sampleNumbers, dtype=np.int64)
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+      data = data[np.newaxis, :]
+    outSamples = []
+    outData = []
+    # Contiguous runs of sample numbers
+    breaks = np.flatnonzero(np.diff(sampleNumbers) != 1) + 1
+    for start, stop in zip(np.r_[0, breaks], np.r_[breaks, len(sampleNumbers)]):
+      if start == stop:
+        continue
+      samples, filtered = self.process_run(sampleNumbers[start], data[:, start:stop])
+      outSamples += [samples]
+      outData += [filtered]
+    if outSamples == []:
+      return np.empty(0), np.empty((data.shape[0], 0))
+    return np.concatenate(outSamples), np.concatenate(outData, axis=1)
+
+  def process_run(self, firstSample, run):
+    ntaps = len(self.taps)
+    if self.nextSample != firstSample or self.history is None or self.history.shape[0] != run.shape[0]:
+      self.history = np.empty((run.shape[0], 0)) # Gap, reset or first block: restart the filter
+    x = np.concatenate((self.history, run), axis=1)
+    s0 = firstSample - self.history.shape[1] # Sample number of x[:, 0]
+    self.nextSample = firstSample + run.shape[1]
+    self.history = x[:, max(0, x.shape[1]-(ntaps-1)):]
+
+    # Outputs where the window ends on the grid: (sample number + 1) divisible by factor
+    j0 = ntaps-1 + (-(s0 + ntaps)) % self.factor
+    ends = np.arange(j0, x.shape[1], self.factor)
+    if len(ends) == 0:
+      return np.empty(0), np.empty((run.shape[0], 0))
+    windows = np.lib.stride_tricks.sliding_window_view(x, ntaps, axis=1)[:, ends-(ntaps-1), :]
+    return s0 + ends - self.delay, windows @ self.taps[::-1]
+
+class TIODecimatedStream(object):
+  """A reader that follows a session's stream (or one source of it) through a decimator.
+  It subscribes to the session, so it does not take packets from other readers."""
+
+  def __init__(self, session, factor, method='boxcar', topic=None, maxsize=10000, **options):
+    self.session = session
+    self.topic = topic
+    self.decimator = TIODecimator(factor, method=method, **options)
+    self.subscription = session.subscribe(maxsize=maxsize)
+    self.pendingSamples = np.empty(0)
+    self.pendingData = None
+
+  def close(self):
+    self.session.unsubscribe(self.subscription)
+
+  def rate(self):
+    if self.topic is None:
+      return self.session.protocol.streams[0]['stream_Fs'] / self.decimator.factor
+    return self.session.source_rate(self.topic) / self.decimator.factor
+
+  def drain(self):
+    """Filters everything received so far; blocks until at least one packet arrives"""
+    sampleNumbers, data = self.session.subscription_read_array(self.subscription, topic=self.topic)
+    period = 1
+    if self.topic is not None:
+      period = self.session.protocol.columnsByName[self.topic]['stream_period'] # A slower source is only in every period-th packet
+    samples, filtered = self.decimator.process(sampleNumbers // period, data)
+    samples = samples * period
+    if self.pendingData is None:
+      self.pendingData = np.empty((filtered.shape[0], 0))
+    self.pendingSamples = np.concatenate((self.pendingSamples, samples))
+    self.pendingData = np.concatenate((self.pendingData, filtered), axis=1)
+
+  def read(self, samples=1, timeaxis=False):
+    """Next decimated samples shaped (channels, samples), preceded by their times if requested"""
+    while self.pendingData is None or len(self.pendingSamples) < samples:
+      self.drain()
+    sampleNumbers, self.pendingSamples = self.pendingSamples[:samples], self.pendingSamples[samples:]
+    data, self.pendingData = self.pendingData[:, :samples], self.pendingData[:, samples:]
+    if timeaxis:
+      stream = self.session.protocol.streams[0]
+      return sampleNumbers / stream['stream_Fs'] + stream['stream_start_time_sec'], data
+    return data
+
+  def __call__(self, samples=1, duration=None, timeaxis=False):
+    if duration is not None:
+      samples = int(duration * self.rate())
+    return self.read(samples=samples, timeaxis=timeaxis)
+
+  def iter(self, timeaxis=False):
+    """Yields decimated blocks as they become available"""
+    while True:
+      while self.pendingData is None or len(self.pendingSamples) == 0:
+        self.drain()
+      yield self.read(samples=len(self.pendingSamples), timeaxis=timeaxis)
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Link latency statistics
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Rolling statistics of host arrival time minus device sample time.
+
+Host times come from time.monotonic(), so the absolute offset only has
+meaning relative to itself; drift, jitter and burstiness do not depend on
+the choice of clock.
+"""
+
+import collections
+import math
+
+def _percentile(ordered, fraction):
+  if not ordered:
+    return math.nan
+  return ordered[min(len(ordered)-1, int(fraction*len(ordered)))]
+
+class TIOLatencyStats(object):
+  def __init__(self, window=5000, burstFraction=0.1):
+    self.window = window
+    self.burstFraction = burstFraction # Arrivals closer than this fraction of the sample period are batched
+    self.reset()
+
+  def reset(self):
+    self.samples = collections.deque(maxlen=self.window)
+    self.count = 0
+
+  def update(self, hostTime, deviceTime):
+    self.samples.append((hostTime, deviceTime))
+    self.count += 1
+
+  def report(self):
+    samples = list(self.samples)
+    n = len(samples)
+    report = {'count': self.count, 'window': n}
+    if n < 3:
+      return report
+    hosts = [host for host, device in samples]
+    devices = [device for host, device in samples]
+    offsets = [host - device for host, device in samples]
+
+    # Drift: least squares slope of offset against device time
+    meanDevice = sum(devices)/n
+    meanOffset = sum(offsets)/n
+    sxx = sum((device-meanDevice)**2 for device in devices)
+    sxy = sum((device-meanDevice)*(offset-meanOffset) for device, offset in zip(devices, offsets))
+    drift = sxy/sxx if sxx > 0 else 0.0
+
+    # Jitter: residual offsets after removing offset and drift; the minimum is the fastest path through the link
+    residuals = [offset - meanOffset - drift*(device-meanDevice) for device, offset in zip(devices, offsets)]
+    floor = min(residuals)
+    jitter = sorted(residual - floor for residual in residuals)
+
+    # Burstiness: how often packets arrive back to back instead of one sample period apart
+    period = (devices[-1]-devices[0])/(n-1)
+    gaps = [later - earlier for earlier, later in zip(hosts, hosts[1:])]
+    batched = 0
+    burst = 1
+    longestBurst = 1
+    for gap in gaps:
+      if gap < self.burstFraction*period:
+        batched += 1
+        burst += 1
+        longestBurst = max(longestBurst, burst)
+      else:
+        burst = 1
+    meanGap = sum(gaps)/len(gaps)
+    gapStd = math.sqrt(sum((gap-meanGap)**2 for gap in gaps)/len(gaps))
+
+    report.update({
+      'offset': meanOffset + drift*(devices[-1]-meanDevice), # Fitted at the latest sample
+      'offset_min': min(offsets),
+      'drift_ppm': drift*1e6,
+      'jitter_p50': _percentile(jitter, 0.50),
+      'jitter_p90': _percentile(jitter, 0.90),
+      'jitter_p99': _percentile(jitter, 0.99),
+      'jitter_max': jitter[-1],
+      'period': period,
+      'batched_fraction': batched/len(gaps),
+      'longest_burst': longestBurst,
+      'arrival_cv': gapStd/meanGap if meanGap > 0 else math.nan,
+    })
+    return report
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Lazily decoded view of .tio logs
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+tio.open_log(paths) returns a TIOLogDataset. Its routes, and each route's
+sources and columns, behave like arrays but decode only the index chunks
+that a slice touches (see tio.tio_logindex). Decoded chunks are kept in an
+LRU cache, so memory follows what is looked at rather than the size of the
+recording:
+
+  log = tio.open_log('Log 000000.tio')
+  vmr = log['/0/']
+  vmr['vector.x'][1000:2000]        # by row
+  vmr.between(t0, t1)['vector.x']   # by time
+  vmr['vector'][:, -100:]           # a source, shaped (channels, rows)
+
+Several paths are read as consecutive parts of one recording (such as the
+files of a rotated recording): each route's rows continue from one file to
+the next. Columns that a route gains or loses partway are NaN where absent.
+"""
+
+import collections
+import numpy as np
+from .tio_protocol import *
+from .tio_logindex import TIOLogIndex
+from .tio_logreader import TIOLogFile
+
+class TIOLogDataset(object):
+  def __init__(self, paths, cacheSize=16, every=1<<20, verbose=False):
+    self.paths = [paths] if isinstance(paths, str) else list(paths)
+    self.verbose = verbose
+    self.indexes = [ TIOLogIndex(path, every=every, verbose=verbose) for path in self.paths ]
+    self.cacheSize = cacheSize # Decoded chunks kept
+    self.cache = collections.OrderedDict() # (file, chunk, route): columns
+    self.routes = {}
+    for index in self.indexes:
+      for stateIDs in [ checkpoint['states'] for checkpoint in index.checkpoints ] + [index.final]:
+        for route, stateID in stateIDs.items():
+          if route not in self.routes and index.states[stateID][3] != []:
+            self.routes[route] = TIOLogRoute(self, route, index.states[stateID])
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def __getitem__(self, route):
+    return self.routes[route]
+
+  def __iter__(self):
+    return iter(self.routes)
+
+  def __repr__(self):
+    lines = [f"TIOLogDataset({self.paths})"]
+    lines += [ f"  {route}: {len(stream)} rows at {stream.Fs} Hz, {', '.join(stream.sources)}" for route, stream in self.routes.items() ]
+    return "\n".join(lines)
+
+  def keys(self):
+    return self.routes.keys()
+
+  def close(self):
+    self.cache.clear()
+
+  def chunk(self, fileIndex, chunkIndex, route):
+    """Columns of a route decoded from one index chunk, through the LRU cache"""
+    key = (fileIndex, chunkIndex, route)
+    if key in self.cache:
+      self.cache.move_to_end(key)
+      return self.cache[key]
+    index = self.indexes[fileIndex]
+    checkpoint = index.checkpoints[chunkIndex]
+    stop = index.checkpoints[chunkIndex+1]['offset'] if chunkIndex+1 < len(index.checkpoints) else index.end
+    with TIOLogFile(index.filename, verbose=self.verbose, start=checkpoint['offset'], stop=stop, states=index.route_states(checkpoint['states'])) as log:
+      segments = log.read(route=route) if route in log.routes else []
+    self.cache[key] = self.routes[route].join(segments)
+    while len(self.cache) > self.cacheSize:
+      self.cache.popitem(last=False)
+    return self.cache[key]
+
+class TIOLogRoute(object):
+  """The rows of one route: time, sample_number and the stream columns"""
+
+  def __init__(self, dataset, route, state):
+    self.dataset = dataset
+    self.route = route
+    protocol = TIOProtocol()
+    protocol.stateImport(state)
+    self.columns = list(protocol.columns)
+    self.Fs = protocol.streams[0]['stream_Fs']
+    self.sources = { stream['source_name']: self.columns[stream['stream_column_start']:stream['stream_column_start']+stream['source_channels']]
+                     for stream in protocol.streams }
+    fullDtype = protocol.stream_dtype(max(protocol.rowunpackByBytes))
+    self.dtypes = { 'time': np.dtype(np.float64), 'sample_number': np.dtype(np.uint32) }
+    self.dtypes.update({ column: fullDtype[i] for i, column in enumerate(self.columns) })
+    self.index_chunks()
+
+  def index_chunks(self):
+    """First row, row count and first time of every index chunk that holds rows of the route"""
+    self.chunks = [] # (file, chunk)
+    firstRows = []
+    firstTimes = []
+    rows = 0
+    for fileIndex, index in enumerate(self.dataset.indexes):
+      checkpoints = index.checkpoints
+      for c, checkpoint in enumerate(checkpoints):
+        before = checkpoint['rows'].get(self.route, 0)
+        after = checkpoints[c+1]['rows'].get(self.route, 0) if c+1 < len(checkpoints) else index.totals.get(self.route, 0)
+        if after > before:
+          self.chunks += [(fileIndex, c)]
+          firstRows += [rows + before]
+          firstTimes += [checkpoint['times'].get(self.route, np.nan)]
+      rows += index.totals.get(self.route, 0)
+    self.firstRows = np.array(firstRows, dtype=np.int64)
+    # A chunk whose first time was not known when it was indexed (before the timing metadata)
+    # is searched as if it started with the chunk before it
+    self.knownTimes = np.isfinite(firstTimes)
+    self.firstTimes = np.fmax.accumulate(np.where(self.knownTimes, firstTimes, -np.inf)) if firstTimes else np.empty(0)
+    self.rowCount = rows
+
+  def __len__(self):
+    return self.rowCount
+
+  def __repr__(self):
+    return f"TIOLogRoute({self.route}: {self.rowCount} rows at {self.Fs} Hz, columns {self.columns})"
+
+  def __getitem__(self, name):
+    """A column ('time', 'sample_number' or a stream column) or a source, as a TIOLogColumn"""
+    if name in self.sources and name not in self.dtypes:
+      return TIOLogColumn(self, self.sources[name])
+    if name not in self.dtypes:
+      raise KeyError(f"No column or source {name} in route {self.route}")
+    return TIOLogColumn(self, [name])
+
+  def join(self, segments):
+    """One array per column from the segments of a chunk"""
+    data = {}
+    for column, dtype in self.dtypes.items():
+      parts = []
+      for segment in segments:
+        if column in ['time', 'sample_number']:
+          parts += [segment[column]]
+        elif column in segment['data']:
+          parts += [segment['data'][column]]
+        else:
+          parts += [np.full(len(segment['time']), np.nan)]
+      data[column] = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    return data
+
+  def read_chunks(self, first, stop, names=None):
+    names = list(self.dtypes) if names is None else names
+    parts = [ self.dataset.chunk(*self.chunks[c], self.route) for c in range(first, stop) ]
+    return { name: np.concatenate([ part[name] for part in parts ]) if parts else np.empty(0, dtype=self.dtypes[name])
+             for name in names }
+
+  def rows(self, start=0, stop=None, names=None):
+    """Rows from index start up to stop, as a dict of arrays"""
+    stop = self.rowCount if stop is None else min(stop, self.rowCount)
+    start = max(start, 0)
+    if stop <= start:
+      return self.read_chunks(0, 0, names)
+    first = int(np.searchsorted(self.firstRows, start, side='right')) - 1
+    last = int(np.searchsorted(self.firstRows, stop, side='left'))
+    data = self.read_chunks(first, last, names)
+    offset = start - self.firstRows[first]
+    return { name: values[offset:offset + stop - start] for name, values in data.items() }
+
+  def between(self, start=None, end=None, names=None):
+    """Rows with times from start to end (inclusive), as a dict of arrays"""
+    first = 0 if start is None else max(int(np.searchsorted(self.firstTimes, start, side='right')) - 1, 0)
+    while first > 0 and not self.knownTimes[first]:
+      first -= 1
+    last = len(self.chunks) if end is None else int(np.searchsorted(self.firstTimes, end, side='right'))
+    data = self.read_chunks(first, last, (names or list(self.dtypes)) + ['time'])
+    keep = np.ones(len(data['time']), dtype=bool)
+    if start is not None:
+      keep &= data['time'] >= start
+    if end is not None:
+      keep &= data['time'] <= end
+    return { name: values[keep] for name, values in data.items() }
+
+class TIOLogColumn(object):
+  """Array-like view of one column, or of the columns of a source shaped (channels, rows).
+  Indexing by row decodes only the chunks the rows are in."""
+
+  def __init__(self, route, names):
+    self.route = route
+    self.names = names
+    self.dtype = np.result_type(*[ route.dtypes[name] for name in names ])
+
+  @property
+  def shape(self):
+    return (len(self.route),) if len(self.names) == 1 else (len(self.names), len(self.route))
+
+  def __len__(self):
+    return self.shape[0]
+
+  def __repr__(self):
+    return f"TIOLogColumn({self.route.route} {', '.join(self.names)}: {len(self.route)} rows)"
+
+  def stack(self, data):
+    if len(self.names) == 1:
+      return data[self.names[0]]
+    return np.vstack([ data[name] for name in self.names ]).astype(self.dtype, copy=False)
+
+  def __getitem__(self, key):
+    if len(self.names) > 1 and isinstance(key, tuple):
+      channels, key = key
+      return TIOLogColumn(self.route, list(np.array(self.names)[channels].reshape(-1)))[key]
+    return self.rows_at(key)
+
+  def rows_at(self, key):
+    count = len(self.route)
+    if isinstance(key, (int, np.integer)):
+      position = key + count if key < 0 else key
+      if not 0 <= position < count:
+        raise IndexError(f"Row {key} out of range for {count} rows")
+      return self.stack(self.route.rows(position, position+1, self.names))[..., 0]
+    if isinstance(key, slice):
+      start, stop, step = key.indices(count)
+      if step == 1:
+        return self.stack(self.route.rows(start, stop, self.names))
+      positions = np.arange(start, stop, step)
+    else:
+      positions = np.asarray(key)
+      positions = np.where(positions < 0, positions + count, positions)
+    if len(positions) == 0:
+      return self.stack(self.route.rows(0, 0, self.names))
+    first = int(positions.min())
+    return self.stack(self.route.rows(first, int(positions.max())+1, self.names))[..., positions - first]
+
+  def between(self, start=None, end=None):
+    """Values with times from start to end (inclusive)"""
+    return self.stack(self.route.between(start, end, self.names))
+
+  def __array__(self, dtype=None, copy=None):
+    values = self.rows_at(slice(None))
+    return values if dtype is None else values.astype(dtype)
+
+def open_log(paths, cacheSize=16, every=1<<20, verbose=False):
+  """Lazily decoded view of one log, or of the consecutive files of one recording"""
+  return TIOLogDataset(paths, cacheSize=cacheSize, every=every, verbose=verbose)
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Columnar export of .tio logs
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Writes the columns of every route of a log in their native types instead of
+text. Each route and stream layout becomes a group of columns (time,
+sample_number and the stream columns); a manifest.json next to the data
+lists the groups with their column names, types, units and timing.
+
+Formats:
+  npy     - a directory per group with one .npy file per column
+  npz     - the npy directories stored in a single .npz (zip) archive
+  parquet - one .parquet file per group (needs pyarrow)
+  hdf5    - one .h5 file with a group per route (needs h5py)
+
+The log is decoded one index chunk at a time and appended to the outputs, so
+memory does not depend on the length of the log.
+"""
+
+import json
+import os
+import shutil
+import struct
+import zipfile
+import numpy as np
+from .tio_logindex import TIOLogIndex
+
+EXPORT_FORMATS = ['npy', 'npz', 'parquet', 'hdf5']
+
+def group_name(route, generation=0):
+  """File-system friendly name for a route such as /0/1/"""
+  name = "route" + route.rstrip('/').replace('/', '-') if route != "/" else "route"
+  if generation > 0:
+    name += f".{generation}"
+  return name
+
+def column_file(column):
+  return column.replace('/', '_').replace(os.sep, '_')
+
+def npy_header(dtype, count, size=128):
+  """.npy version 1.0 header of a fixed size, so it can be rewritten once the length is known"""
+  header = "{'descr': %r, 'fortran_order': False, 'shape': (%d,), }" % (np.lib.format.dtype_to_descr(np.dtype(dtype)), count)
+  header = header.ljust(size - 10 - 1) + "\n"
+  return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+class NpyColumns(object):
+  """Appends to one .npy file per column"""
+
+  def __init__(self, directory, dtypes):
+    os.makedirs(directory, exist_ok=True)
+    self.directory = directory
+    self.dtypes = dtypes
+    self.files = {}
+    self.rows = 0
+    for column, dtype in dtypes.items():
+      self.files[column] = open(os.path.join(directory, column_file(column)+".npy"), 'wb')
+      self.files[column].write(npy_header(dtype, 0))
+
+  def append(self, columns):
+    for column, values in columns.items():
+      self.files[column].write(np.ascontiguousarray(values, dtype=self.dtypes[column]).tobytes())
+    self.rows += len(next(iter(columns.values())))
+
+  def close(self):
+    for column, f in self.files.items():
+      f.seek(0)
+      f.write(npy_header(self.dtypes[column], self.rows))
+      f.close()
+    return { column: os.path.join(os.path.basename(self.directory), column_file(column)+".npy") for column in self.dtypes }
+
+def require(format):
+  """Imports the optional library a format needs, with a hint if it is missing"""
+  try:
+    if format == 'parquet':
+      import pyarrow.parquet
+      return pyarrow
+    if format == 'hdf5':
+      import h5py
+      return h5py
+  except ImportError:
+    library = {'parquet': 'pyarrow', 'hdf5': 'h5py'}[format]
+    raise ImportError(f"{format} output needs {library} (pip3 install {library})")
+
+class ParquetColumns(object):
+  """Appends a row group per chunk to one .parquet file"""
+
+  def __init__(self, filename, dtypes):
+    pyarrow = require('parquet')
+    self.pyarrow = pyarrow
+    self.filename = filename
+    schema = pyarrow.schema([ (column, pyarrow.from_numpy_dtype(dtype)) for column, dtype in dtypes.items() ])
+    self.writer = pyarrow.parquet.ParquetWriter(filename, schema)
+    self.dtypes = dtypes
+    self.rows = 0
+
+  def append(self, columns):
+    table = self.pyarrow.table({ column: np.asarray(columns[column], dtype=dtype) for column, dtype in self.dtypes.items() })
+    self.writer.write_table(table)
+    self.rows += table.num_rows
+
+  def close(self):
+    self.writer.close()
+    return { column: os.path.basename(self.filename) for column in self.dtypes }
+
+class HDF5Columns(object):
+  """Appends to resizable datasets in one group of an HDF5 file"""
+
+  def __init__(self, h5file, name, dtypes):
+    self.group = h5file.create_group(name)
+    self.datasets = { column: self.group.create_dataset(column_file(column), shape=(0,), maxshape=(None,), dtype=dtype, chunks=True)
+                      for column, dtype in dtypes.items() }
+    self.name = name
+    self.rows = 0
+
+  def append(self, columns):
+    count = len(next(iter(columns.values())))
+    for column, values in columns.items():
+      dataset = self.datasets[column]
+      dataset.resize((self.rows + count,))
+      dataset[self.rows:] = values
+    self.rows += count
+
+  def close(self):
+    return { column: f"{self.name}/{column_file(column)}" for column in self.datasets }
+
+def export_log(filename, output, format='npy', start=None, end=None, route=None):
+  """Writes the columns of a log (or of the time range from start to end) to output, which is
+  a directory for npy and parquet and a file for npz and hdf5. Returns the manifest."""
+  if format not in EXPORT_FORMATS:
+    raise ValueError(f"Unknown format {format}; choose from {EXPORT_FORMATS}")
+  library = require(format)
+  directory = output if format in ['npy', 'parquet'] else output + ".parts"
+  os.makedirs(directory, exist_ok=True)
+  h5file = None
+  if format == 'hdf5':
+    h5file = library.File(output, 'w')
+
+  writers = {} # (route, layout): writer
+  groups = {}
+  generations = {}
+  for segments in TIOLogIndex(filename).iter_read(start, end, route):
+    for segment in segments:
+      columns = { 'time': segment['time'], 'sample_number': segment['sample_number'] }
+      columns.update(segment['data'])
+      layout = (segment['route'], tuple((column, values.dtype.str) for column, values in columns.items()), segment['Fs'], segment['start_time'])
+      if layout not in writers:
+        generation = generations.get(segment['route'], 0)
+        generations[segment['route']] = generation + 1
+        name = group_name(segment['route'], generation)
+        dtypes = { column: values.dtype for column, values in columns.items() }
+        if format in ['npy', 'npz']:
+          writers[layout] = NpyColumns(os.path.join(directory, name), dtypes)
+        elif format == 'parquet':
+          writers[layout] = ParquetColumns(os.path.join(directory, name+".parquet"), dtypes)
+        else:
+          writers[layout] = HDF5Columns(h5file, name, dtypes)
+        groups[layout] = {
+          'name': name,
+          'route': segment['route'],
+          'columns': [ {'name': column, 'dtype': np.dtype(dtype).str, 'units': units}
+                       for (column, dtype), units in zip(dtypes.items(), ['s', ''] + segment['units']) ],
+          'Fs': segment['Fs'],
+          'start_time': segment['start_time'],
+          'first_time': float(segment['time'][0]),
+        }
+      writers[layout].append(columns)
+      groups[layout]['last_time'] = float(segment['time'][-1])
+
+  for layout, writer in writers.items():
+    groups[layout]['rows'] = writer.rows
+    groups[layout]['files'] = writer.close()
+  manifest = {'source': os.path.basename(filename), 'format': format, 'start': start, 'end': end, 'groups': list(groups.values())}
+
+  if format == 'hdf5':
+    h5file.attrs['manifest'] = json.dumps(manifest)
+    h5file.close()
+    os.rmdir(directory)
+    with open(output + ".json", 'w') as f:
+      json.dump(manifest, f, indent=2)
+  elif format == 'npz':
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+      for group in manifest['groups']:
+        for column, path in group['files'].items():
+          archive.write(os.path.join(directory, path), path)
+      archive.writestr('manifest.json', json.dumps(manifest, indent=2))
+    shutil.rmtree(directory)
+  else:
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+      json.dump(manifest, f, indent=2)
+  return manifest
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Sidecar index for .tio logs
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Periodic checkpoints into a log so that a time range can be decoded without
+reading the file from the start. Each checkpoint is a packet boundary with,
+for every route, the sample number and time of its first row after the
+boundary, the number of rows before it, and the protocol state (timebases,
+sources, stream layout) needed to decode from there.
+
+The index is kept next to the log as "<log>.idx". Since logs and their
+indexes are shared, it is JSON (with tagged bytes, tuples and dicts, so the
+protocol states come back exactly) rather than a pickle, and loading it
+cannot run code. If the log has grown since the index was written, only the
+new part is scanned and appended. Where the index cannot be written, such as
+next to a read-only archive, it is kept in memory only.
+"""
+
+import copy
+import json
+import os
+import pickle
+import numpy as np
+from .tio_protocol import *
+from .tio_logreader import TIOLogFile, METADATA_TYPES
+from .tio_logzip import log_size
+
+INDEX_VERSION = 3
+
+def index_path(filename):
+  return filename + ".idx"
+
+def file_signature(filename, size=4096):
+  with open(filename, 'rb') as f:
+    return f.read(size)
+
+def to_json(value):
+  """JSON-compatible form of a value made of dicts, lists, tuples, bytes and scalars"""
+  if isinstance(value, dict):
+    return {'d': [ [to_json(key), to_json(item)] for key, item in value.items() ]}
+  if isinstance(value, tuple):
+    return {'t': [ to_json(item) for item in value ]}
+  if isinstance(value, list):
+    return [ to_json(item) for item in value ]
+  if isinstance(value, (bytes, bytearray)):
+    return {'b': bytes(value).hex()}
+  if isinstance(value, np.generic):
+    return value.item()
+  if value is None or isinstance(value, (str, int, float)):
+    return value
+  raise TypeError(f"Cannot save {type(value).__name__} in a log index")
+
+def from_json(value):
+  """Inverse of to_json"""
+  if isinstance(value, list):
+    return [ from_json(item) for item in value ]
+  if isinstance(value, dict):
+    (tag, item), = value.items()
+    if tag == 'd':
+      return { from_json(key): from_json(entry) for key, entry in item }
+    if tag == 't':
+      return tuple(from_json(entry) for entry in item)
+    if tag == 'b':
+      return bytes.fromhex(item)
+    raise ValueError(f"Unknown tag {tag} in a log index")
+  return value
+
+class TIOLogIndex(object):
+  def __init__(self, filename, every=1<<20, save=True, verbose=False):
+    self.filename = filename
+    self.every = every # Bytes between checkpoints
+    self.verbose = verbose
+    self.states = [] # Distinct protocol states, referred to by position
+    self.stateIDs = {}
+    self.checkpoints = []
+    self.end = 0 # Offset after the last indexed packet
+    self.final = {} # Route: state after the last indexed packet
+    self.totals = {} # Route: rows before self.end
+    self.signature = b''
+    if not self.load() or self.end < log_size(filename):
+      self.update()
+      if save:
+        self.save()
+
+  def load(self):
+    """Reads the sidecar; False if it is missing, stale or does not match the log"""
+    try:
+      with open(index_path(self.filename), 'r', encoding='utf-8') as f:
+        saved = from_json(json.load(f))
+    except (OSError, ValueError, TypeError, AttributeError):
+      return False # Missing, or not an index in this format
+    if not isinstance(saved, dict) or saved.get('version') != INDEX_VERSION or saved['every'] != self.every:
+      return False
+    if saved['end'] > log_size(self.filename) or file_signature(self.filename, len(saved['signature'])) != saved['signature']:
+      return False
+    self.states = saved['states']
+    self.stateIDs = { pickle.dumps(state): i for i, state in enumerate(self.states) }
+    self.checkpoints = saved['checkpoints']
+    self.end = saved['end']
+    self.final = saved['final']
+    self.totals = saved['totals']
+    self.signature = saved['signature']
+    return True
+
+  def save(self):
+    saved = {'version': INDEX_VERSION, 'every': self.every, 'states': self.states, 'checkpoints': self.checkpoints,
+             'end': self.end, 'final': self.final, 'totals': self.totals, 'signature': self.signature}
+    temporary = index_path(self.filename) + ".tmp"
+    try:
+      with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(to_json(saved), f)
+      os.replace(temporary, index_path(self.filename))
+    except OSError: # Read-only or not ours; the index is only kept in memory
+      try:
+        os.remove(temporary)
+      except OSError:
+        pass
+
+  def state_id(self, state):
+    key = pickle.dumps(state)
+    if key not in self.stateIDs:
+      self.stateIDs[key] = len(self.states)
+      self.states += [copy.deepcopy(state)]
+    return self.stateIDs[key]
+
+  def route_states(self, stateIDs):
+    return { route: self.states[stateID] for route, stateID in stateIDs.items() }
+
+  def update(self, region=1<<28):
+    """Indexes the part of the log after the last indexed packet, `region` bytes at a time"""
+    if self.end == 0:
+      self.signature = file_signature(self.filename)
+    size = log_size(self.filename)
+    while self.end < size:
+      end = self.end
+      self.update_region(self.end + region)
+      if self.end == end: # Only a partly written packet is left
+        break
+
+  def update_region(self, stop):
+    with TIOLogFile(self.filename, verbose=self.verbose, start=self.end, stop=stop, states=self.route_states(self.final)) as log:
+      if len(log.offsets) == 0:
+        return
+      offsets = log.offsets + log.base # Raw offsets in the log
+      protocols = {}
+      for route, routing in zip(log.routes, log.routings):
+        protocols[route] = TIOProtocol(routing=routing, verbose=self.verbose)
+        if route in self.final:
+          protocols[route].stateImport(copy.deepcopy(self.states[self.final[route]]))
+
+      # Checkpoints at the first packet past every multiple of `every` bytes after the last one
+      first = self.checkpoints[-1]['offset'] + self.every if self.checkpoints else 0
+      targets = np.arange(max(first, int(offsets[0])), log.end, self.every)
+      packets = np.unique(np.searchsorted(offsets, targets))
+      packets = packets[packets < len(offsets)]
+
+      # First row of each route at or after each checkpoint, and the number of rows before it
+      isStream = log.types == TL_PTYPE_STREAM0
+      decodable = log.decodable()
+      firstRows = {}
+      previous = dict(self.totals)
+      rowsBefore = {}
+      for r, route in enumerate(log.routes):
+        rows = np.append(np.flatnonzero(isStream & (log.routeIndex == r)), -1) # -1: no row after the checkpoint
+        firstRows[route] = rows[np.minimum(np.searchsorted(rows[:-1], packets), len(rows)-1)]
+        decoded = np.flatnonzero(decodable & (log.routeIndex == r))
+        rowsBefore[route] = previous.get(route, 0) + np.searchsorted(decoded, packets)
+        self.totals[route] = previous.get(route, 0) + len(decoded)
+
+      metadata = np.flatnonzero(np.isin(log.types, METADATA_TYPES))
+      m = 0
+      for c, packet in enumerate(packets):
+        while m < len(metadata) and metadata[m] < packet:
+          index = metadata[m]
+          protocols[log.routes[log.routeIndex[index]]].decode_packet(log.packet(index))
+          m += 1
+        checkpoint = {'offset': int(offsets[packet]), 'states': {}, 'samples': {}, 'times': {},
+                      'rows': dict(previous, **{ route: int(rows[c]) for route, rows in rowsBefore.items() })}
+        for route, protocol in protocols.items():
+          if protocol.timebases == {} and protocol.sources == {}:
+            continue
+          checkpoint['states'][route] = self.state_id(protocol.stateExport())
+          row = firstRows[route][c]
+          if row >= 0 and protocol.streams != [] and int(log.payloadSizes[row])-4 in protocol.rowunpackByBytes:
+            offset = int(log.offsets[row])
+            sampleNumber = int(log.buffer[offset+4:offset+8].view('<u4')[0])
+            checkpoint['samples'][route] = sampleNumber
+            checkpoint['times'][route] = protocol.stream_time({'sampleNumber': sampleNumber})
+        self.checkpoints += [checkpoint]
+      for index in metadata[m:]:
+        protocols[log.routes[log.routeIndex[index]]].decode_packet(log.packet(index))
+      for route, protocol in protocols.items():
+        if protocol.timebases != {} or protocol.sources != {}:
+          self.final[route] = self.state_id(protocol.stateExport())
+      self.end = log.end
+
+  def span(self, start=None, end=None, route=None):
+    """Byte range and starting states that cover the times from start to end for a route (or all routes)"""
+    first = 0
+    last = len(self.checkpoints)
+    for c, checkpoint in enumerate(self.checkpoints):
+      times = [ time for name, time in checkpoint['times'].items() if route is None or name == route ]
+      if times == []:
+        continue
+      if start is not None and max(times) <= start:
+        first = c # The last checkpoint before the start
+      if end is not None and min(times) > end:
+        last = c
+        break
+    if self.checkpoints == []:
+      return 0, None, {}
+    stop = self.checkpoints[last]['offset'] if last < len(self.checkpoints) else None
+    checkpoint = self.checkpoints[first]
+    return checkpoint['offset'], stop, self.route_states(checkpoint['states'])
+
+  def chunks(self, start=0, stop=None):
+    """Splits the byte range from start to stop at the checkpoints into (start, stop, states)
+    pieces that can be decoded independently"""
+    pieces = []
+    offset, states = start, None
+    for checkpoint in self.checkpoints:
+      if checkpoint['offset'] <= start:
+        states = checkpoint['states']
+        continue
+      if stop is not None and checkpoint['offset'] >= stop:
+        break
+      pieces += [(offset, checkpoint['offset'], self.route_states(states or {}))]
+      offset, states = checkpoint['offset'], checkpoint['states']
+    pieces += [(offset, stop, self.route_states(states or {}))]
+    return pieces
+
+  def read(self, start=None, end=None, route=None):
+    """Decodes the rows with times from start to end (inclusive); see TIOLogFile.read"""
+    offset, stop, states = self.span(start, end, route)
+    with TIOLogFile(self.filename, verbose=self.verbose, start=offset, stop=stop, states=states) as log:
+      return trim(log.read(route=route), start, end)
+
+  def iter_read(self, start=None, end=None, route=None):
+    """Like read, but yields the segments of one index chunk at a time so that memory stays bounded"""
+    offset, stop, states = self.span(start, end, route)
+    for chunk in self.chunks(offset, stop):
+      with TIOLogFile(self.filename, verbose=self.verbose, start=chunk[0], stop=chunk[1], states=chunk[2]) as log:
+        segments = trim(log.read(route=route), start, end)
+      if segments:
+        yield segments
+
+def trim(segments, start=None, end=None):
+  """Keeps the rows of each segment with times from start to end (inclusive)"""
+  if start is None and end is None:
+    return segments
+  trimmed = []
+  for segment in segments:
+    keep = np.ones(len(segment['time']), dtype=bool)
+    if start is not None:
+      keep &= segment['time'] >= start
+    if end is not None:
+      keep &= segment['time'] <= end
+    if not np.any(keep):
+      continue
+    segment['sample_number'] = segment['sample_number'][keep]
+    segment['time'] = segment['time'][keep]
+    segment['data'] = { column: values[keep] for column, values in segment['data'].items() }
+    trimmed += [segment]
+  return trimmed
+
+def read_log_range(filename, start=None, end=None, route=None, every=1<<20):
+  """Decodes a time range of a log, building or extending its sidecar index first"""
+  return TIOLogIndex(filename, every=every).read(start, end, route)
@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Memory-mapped .tio log reader
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Reads native .tio logs (packets as sent, without SLIP framing) into NumPy
+columns. The file is memory mapped and its packet boundaries are scanned
+into an offset array; runs of packets with identical headers, the usual
+case for a stream, are stepped over with one vectorized comparison.
+
+A compressed log (tio.tio_logzip) is read as its packet stream: only the
+chunks covering the requested byte range are decompressed, into one buffer.
+Offsets into self.buffer are then relative to self.base, the raw offset of
+its first byte; for a plain log, base is 0 and the buffer is the whole file.
+
+Metadata packets are decoded in order for each route. Every change of the
+stream layout starts a new schema generation, and the STREAM0 packets of one
+route and generation are decoded together: their payloads are gathered into
+one buffer and viewed through a structured dtype with a single frombuffer.
+"""
+
+import copy
+import mmap
+import os
+import struct
+import numpy as np
+from .tio_protocol import *
+from .tio_logzip import TIOZFile, is_compressed
+
+METADATA_TYPES = [TL_PTYPE_TIMEBASE, TL_PTYPE_SOURCE, TL_PTYPE_STREAM]
+
+def route_name(routing):
+  """Routing string such as /0/1/, upstream host first"""
+  if len(routing) == 0:
+    return "/"
+  return "/" + "/".join(map(str, routing)) + "/"
+
+def packet_offsets(buffer, start=0, stop=None, maxRun=1<<16):
+  """Byte offsets of the packets from start up to stop (exclusive); a truncated last packet is left out.
+  Returns the offsets and the offset after the last complete packet."""
+  size = len(buffer) if stop is None else stop
+  chunks = []
+  single = []
+  offset = start
+  lastHeader = None
+  streak = 0
+  while offset + 4 <= size:
+    header = buffer[offset:offset+4]
+    payloadType, routingSize, payloadSize = struct.unpack("<BBH", header)
+    if payloadSize > TL_PACKET_MAX_SIZE or routingSize > TL_PACKET_MAX_ROUTING_SIZE:
+      raise ValueError(f"Packet too big at byte {offset}")
+    length = 4 + payloadSize + routingSize
+    if offset + length > size:
+      break
+    streak = streak + 1 if header == lastHeader else 0
+    lastHeader = header
+    if streak < 4:
+      single += [offset]
+      offset += length
+      continue
+    # A run of identical headers: each packet has the same length, so the next header is known
+    n = min(maxRun, (size - offset) // length)
+    headers = np.ndarray(shape=(n, 4), dtype=np.uint8, buffer=buffer, offset=offset, strides=(length, 1))
+    mismatch = np.flatnonzero((headers != headers[0]).any(axis=1))
+    run = int(mismatch[0]) if len(mismatch) else n
+    if single:
+      chunks += [np.array(single, dtype=np.int64)]
+      single = []
+    chunks += [np.arange(offset, offset + run*length, length, dtype=np.int64)]
+    offset += run*length
+    streak = 0 if run < n else streak
+  if single:
+    chunks += [np.array(single, dtype=np.int64)]
+  offsets = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+  return offsets, offset
+
+def gather(buffer, starts, length, rows=1<<16):
+  """Copies length bytes from each start offset into one array shaped (len(starts), length)"""
+  out = np.empty((len(starts), length), dtype=np.uint8)
+  if len(starts) > 1 and np.all(np.diff(starts) == starts[1] - starts[0]) and starts[1] > starts[0]:
+    # Evenly spaced: a strided view does the gather
+    out[:] = np.ndarray(shape=out.shape, dtype=np.uint8, buffer=buffer, offset=int(starts[0]), strides=(int(starts[1]-starts[0]), 1))
+    return out
+  span = np.arange(length)
+  for i in range(0, len(starts), rows):
+    out[i:i+rows] = buffer[starts[i:i+rows, np.newaxis] + span]
+  return out
+
+class TIOLogFile(object):
+  """Index of the packets of a log, or of the byte range from start to stop. A range that does
+  not begin at the start of the file needs the protocol state of its routes at that point
+  (TIOProtocol.stateExport by route name), as kept by the checkpoints of tio.tio_logindex."""
+
+  def __init__(self, filename, verbose=False, start=0, stop=None, states=None):
+    self.filename = filename
+    self.verbose = verbose
+    self.states = states or {}
+    self.mmap = None
+    self.base = 0
+    self.data = b''
+    if is_compressed(filename):
+      self.file = TIOZFile(filename)
+      self.base, self.data = self.file.chunk_range(start, stop)
+    else:
+      self.file = open(filename, 'rb')
+      if os.fstat(self.file.fileno()).st_size > 0:
+        self.data = self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+    self.buffer = np.frombuffer(self.data, dtype=np.uint8)
+    self.offsets, end = packet_offsets(self.data, start - self.base, None if stop is None else min(stop - self.base, len(self.data)))
+    self.end = end + self.base # Raw offset after the last complete packet
+    self.index_headers()
+    self.index_metadata()
+
+  def close(self):
+    self.buffer = None
+    self.data = None
+    if self.mmap is not None:
+      self.mmap.close()
+    self.file.close()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def index_headers(self):
+    """Packet types, payload sizes and route of every packet"""
+    offsets = self.offsets
+    self.types = self.buffer[offsets]
+    routingSizes = self.buffer[offsets+1].astype(np.int64)
+    self.payloadSizes = self.buffer[offsets+2].astype(np.int64) | (self.buffer[offsets+3].astype(np.int64) << 8)
+    # Routing bytes follow the payload in reverse order; pack them into one key per packet
+    routingStart = offsets + 4 + self.payloadSizes
+    keys = np.zeros(len(offsets), dtype=np.uint64)
+    for i in range(int(routingSizes.max(initial=0))):
+      present = routingSizes > i
+      byte = self.buffer[np.where(present, routingStart + routingSizes - 1 - i, 0)].astype(np.uint64)
+      keys |= np.where(present, byte, 0) << np.uint64(8*i)
+    if routingSizes.max(initial=0) < 8:
+      # Room for the routing size in the top byte, so one sort of a flat key finds the routes
+      unique, self.routeIndex = np.unique(keys | (routingSizes.astype(np.uint64) << np.uint64(56)), return_inverse=True)
+      pairs = [ (int(key) >> 56, int(key) & 0xFFFFFFFFFFFFFF) for key in unique ]
+    else:
+      pairs, self.routeIndex = np.unique(np.stack((routingSizes.astype(np.uint64), keys), axis=1), axis=0, return_inverse=True)
+      pairs = [ (int(size), int(key)) for size, key in pairs ]
+    self.routeIndex = self.routeIndex.reshape(-1)
+    self.routings = [ [(key >> 8*i) & 0xFF for i in range(size)] for size, key in pairs ]
+    self.routes = [ route_name(routing) for routing in self.routings ]
+
+  def index_metadata(self):
+    """Decodes the metadata packets of each route in order and records a schema generation
+    for every change of the stream layout"""
+    self.generations = []
+    self.protocols = [ TIOProtocol(routing=routing, verbose=self.verbose) for routing in self.routings ]
+    layouts = [None] * len(self.routes)
+    for route, protocol in enumerate(self.protocols):
+      if self.routes[route] in self.states:
+        protocol.stateImport(copy.deepcopy(self.states[self.routes[route]]))
+        layouts[route] = self.add_generation(route, -1, None)
+    for index in np.flatnonzero(np.isin(self.types, METADATA_TYPES)):
+      route = self.routeIndex[index]
+      self.protocols[route].decode_packet(self.packet(index))
+      layouts[route] = self.add_generation(route, index, layouts[route])
+
+  def add_generation(self, route, index, layout):
+    """Starts a generation at packet index if the route's stream layout differs from layout.
+    Returns the current layout."""
+    protocol = self.protocols[route]
+    if protocol.streams == [] or protocol.columns == []:
+      return layout
+    stream = protocol.streams[0]
+    current = (tuple(protocol.columns), tuple(sorted(protocol.rowunpackByBytes.items())), stream['stream_Fs'], stream['stream_start_time_sec'])
+    if current != layout:
+      self.generations += [{
+        'route': self.routes[route],
+        'routeIndex': int(route),
+        'packet': int(index), # First packet decoded with this layout
+        'columns': list(protocol.columns),
+        'units': [ streamInfo['source_units'] for streamInfo in protocol.streams for i in range(streamInfo['source_channels']) ],
+        'Fs': stream['stream_Fs'],
+        'start_time': stream['stream_start_time_sec'],
+        'rowunpackByBytes': dict(protocol.rowunpackByBytes),
+        'dtypes': { rowBytes: protocol.stream_dtype(rowBytes) for rowBytes in protocol.rowunpackByBytes },
+      }]
+    return current
+
+  def packet(self, index):
+    offset = int(self.offsets[index])
+    return bytes(self.data[offset:offset + 4 + int(self.payloadSizes[index]) + len(self.routings[self.routeIndex[index]])])
+
+  def route_generations(self, route):
+    return [ generation for generation in self.generations if generation['route'] == route ]
+
+  def decodable(self):
+    """Boolean per packet: True for the STREAM0 packets that read() decodes into rows"""
+    mask = np.zeros(len(self.offsets), dtype=bool)
+    isStream = self.types == TL_PTYPE_STREAM0
+    for routeIndex, name in enumerate(self.routes):
+      generations = self.route_generations(name)
+      indices = np.flatnonzero(isStream & (self.routeIndex == routeIndex))
+      boundaries = np.array([ generation['packet'] for generation in generations ], dtype=np.int64)
+      owner = np.searchsorted(boundaries, indices, side='right') - 1
+      for g, generation in enumerate(generations):
+        packets = indices[owner == g]
+        mask[packets[np.isin(self.payloadSizes[packets] - 4, list(generation['rowunpackByBytes']))]] = True
+    return mask
+
+  def read(self, route=None, start=0, stop=None):
+    """Decodes the STREAM0 packets with indices from start to stop (all by default).
+    Returns a list of segments, one per route and schema generation, each a dict with the
+    route, column names and units, rate, sample numbers, times and a dict of column arrays."""
+    routes = self.routes if route is None else [route]
+    segments = []
+    for name in routes:
+      routeIndex = self.routes.index(name)
+      generations = self.route_generations(name)
+      selected = (self.routeIndex[start:stop] == routeIndex) & (self.types[start:stop] == TL_PTYPE_STREAM0)
+      indices = np.flatnonzero(selected) + start
+      boundaries = np.array([ generation['packet'] for generation in generations ], dtype=np.int64)
+      owner = np.searchsorted(boundaries, indices, side='right') - 1
+      for g, generation in enumerate(generations):
+        packets = indices[owner == g]
+        if len(packets) > 0:
+          segments += [self.decode(generation, packets)]
+    return segments
+
+  def decode(self, generation, packets):
+    """Decodes the STREAM0 packets (indices) of one generation"""
+    offsets = self.offsets[packets]
+    rowSizes = self.payloadSizes[packets] - 4
+    sampleNumbers = gather(self.buffer, offsets + 4, 4).view('<u4').reshape(-1)
+    columns = generation['columns']
+    fullBytes = max(generation['rowunpackByBytes'])
+    fullDtype = generation['dtypes'][fullBytes]
+    sizes = np.unique(rowSizes)
+    known = np.isin(rowSizes, list(generation['rowunpackByBytes']))
+    # Columns that some rows lack are filled with NaN
+    shortest = min((len(generation['dtypes'][int(size)]) for size in sizes if int(size) in generation['dtypes']), default=0)
+    data = {}
+    for i, column in enumerate(columns):
+      dtype = fullDtype[i]
+      if i >= shortest:
+        dtype = np.result_type(dtype, np.float32)
+      data[column] = np.full(len(packets), np.nan, dtype=dtype) if dtype.kind == 'f' else np.empty(len(packets), dtype=dtype)
+    for size in sizes:
+      size = int(size)
+      if size not in generation['dtypes']:
+        continue
+      where = np.flatnonzero(rowSizes == size)
+      rows = gather(self.buffer, offsets[where] + 8, size).reshape(-1).view(generation['dtypes'][size])
+      for i, field in enumerate(rows.dtype.names):
+        data[columns[i]][where] = rows[field]
+    keep = known
+    if not np.all(keep):
+      sampleNumbers = sampleNumbers[keep]
+      data = { column: values[keep] for column, values in data.items() }
+    return {
+      'route': generation['route'],
+      'columns': list(columns),
+      'units': list(generation['units']),
+      'Fs': generation['Fs'],
+      'start_time': generation['start_time'],
+      'sample_number': sampleNumbers,
+      'time': sampleNumbers / generation['Fs'] + generation['start_time'],
+      'data': data,
+    }
+
+def read_log(filename, route=None, verbose=False):
+  """Decodes a whole .tio log; see TIOLogFile.read"""
+  with TIOLogFile(filename, verbose=verbose) as log:
+    return log.read(route=route)
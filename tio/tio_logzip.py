@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Compressed, chunked .tio recordings
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+A container for recordings that stores the packets in independently
+compressed chunks (zlib or lzma from the standard library):
+
+  file header   b"TIOZ", version, 3 reserved bytes
+  chunk         header "<4sBBHIIQI": b"TZCK", codec, flags, reserved,
+                compressed size, raw size, raw offset, CRC-32 of the raw bytes;
+                then the compressed bytes
+  ...
+  chunk index   written on close: b"TZIX", chunk count, then per chunk the
+                file offset of its data, raw offset, raw size, compressed size,
+                codec and CRC-32;
+                then the index offset and b"TZEN"
+
+Each chunk starts with the latest metadata packets (timebases, sources and
+streams of every route) followed by whole packets, so it can be decoded on
+its own. The raw bytes of the chunks, one after another, form a valid .tio
+packet stream: readers see a compressed file as that stream (with the
+metadata repeated at chunk starts), so offsets into it are "raw" offsets.
+A file that is still being written, or was not closed, has no chunk index;
+its chunk headers are scanned instead, and scanned again as it grows.
+
+open_log_file(filename) gives a file-like object for either kind of log.
+"""
+
+import bisect
+import lzma
+import mmap
+import os
+import struct
+import zlib
+from .tio_protocol import *
+
+FILE_MAGIC = b"TIOZ"
+FILE_HEADER = FILE_MAGIC + b"\x01\x00\x00\x00"
+CHUNK_HEADER = struct.Struct("<4sBBHIIQI")
+INDEX_ENTRY = struct.Struct("<QQIIBI")
+INDEX_TRAILER = struct.Struct("<Q4s")
+CODECS = {'none': 0, 'zlib': 1, 'lzma': 2}
+METADATA_TYPES = [TL_PTYPE_TIMEBASE, TL_PTYPE_SOURCE, TL_PTYPE_STREAM]
+
+def compress(data, codec, level=None):
+  if codec == CODECS['zlib']:
+    return zlib.compress(data, 6 if level is None else level)
+  if codec == CODECS['lzma']:
+    return lzma.compress(data, preset=6 if level is None else level)
+  return bytes(data)
+
+def decompress(data, codec):
+  if codec == CODECS['zlib']:
+    return zlib.decompress(data)
+  if codec == CODECS['lzma']:
+    return lzma.decompress(data)
+  return bytes(data)
+
+def is_compressed(filename):
+  with open(filename, 'rb') as f:
+    return f.read(len(FILE_MAGIC)) == FILE_MAGIC
+
+def open_log_file(filename):
+  """Binary file-like object reading the packet stream of a plain or compressed log"""
+  if is_compressed(filename):
+    return TIOZFile(filename)
+  return open(filename, 'rb')
+
+def log_pieces(filename, start=0, stop=None):
+  """Yields (raw offset, buffer) pieces of the packet stream from start up to stop, each holding
+  whole packets: the memory-mapped file for a plain log, one decompressed chunk at a time for a
+  compressed log"""
+  if is_compressed(filename):
+    with TIOZFile(filename) as f:
+      first = max(bisect.bisect_right(f.starts, start) - 1, 0)
+      for i in range(first, len(f.chunks)):
+        if stop is not None and f.starts[i] >= stop:
+          break
+        yield f.starts[i], f.chunk_data(i)
+    return
+  with open(filename, 'rb') as f:
+    if os.fstat(f.fileno()).st_size == 0:
+      return
+    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+      yield 0, mm
+
+def log_size(filename):
+  """Length of the packet stream of a plain or compressed log"""
+  if is_compressed(filename):
+    with TIOZFile(filename) as f:
+      return f.size
+  return os.path.getsize(filename)
+
+class TIOZWriter(object):
+  """Writes packets into a compressed, chunked log. Packets may be given whole (write_packet)
+  or as a stream of bytes split anywhere (write)."""
+
+  def __init__(self, file, codec='zlib', level=None, chunkSize=1<<22):
+    self.owner = isinstance(file, str)
+    self.file = open(file, 'wb') if self.owner else file
+    self.name = getattr(self.file, 'name', None)
+    self.codec = CODECS[codec]
+    self.level = level
+    self.chunkSize = chunkSize # Raw bytes of packets per chunk
+    self.metadata = {} # (routing, type, id): latest packet
+    self.chunk = bytearray()
+    self.pending = bytearray() # Start of a packet not yet complete
+    self.index = []
+    self.rawOffset = 0
+    self.rawBytes = 0 # Packet bytes written, not counting repeated metadata
+    self.file.write(FILE_HEADER)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def write(self, data):
+    """Adds bytes of a packet stream; a packet split across calls is kept until it is complete"""
+    self.pending += data
+    offset = 0
+    while offset + 4 <= len(self.pending):
+      payloadType, routingSize, payloadSize = struct.unpack_from("<BBH", self.pending, offset)
+      if payloadSize > TL_PACKET_MAX_SIZE or routingSize > TL_PACKET_MAX_ROUTING_SIZE:
+        raise ValueError(f"Packet too big in stream written to {self.name}")
+      length = 4 + payloadSize + routingSize
+      if offset + length > len(self.pending):
+        break
+      self.write_packet(bytes(self.pending[offset:offset+length]))
+      offset += length
+    del self.pending[:offset]
+
+  def write_packet(self, packet):
+    payloadType, routingSize, payloadSize = struct.unpack_from("<BBH", packet)
+    if len(self.chunk) == 0:
+      self.chunk += self.metadata_packets()
+    if payloadType in METADATA_TYPES:
+      routing = bytes(packet[4+payloadSize:])
+      self.metadata[(routing, payloadType, bytes(packet[4:6]))] = bytes(packet)
+    self.chunk += packet
+    self.rawBytes += len(packet)
+    if len(self.chunk) >= self.chunkSize:
+      self.flush_chunk()
+
+  def metadata_packets(self):
+    """The latest metadata of every route, timebases first so that each can be decoded"""
+    return b"".join(packet for payloadType in METADATA_TYPES for key, packet in self.metadata.items() if key[1] == payloadType)
+
+  def flush_chunk(self):
+    """Compresses and writes the packets so far as a chunk"""
+    if len(self.chunk) == 0:
+      return
+    raw = bytes(self.chunk)
+    data = compress(raw, self.codec, self.level)
+    codec = self.codec
+    if len(data) >= len(raw): # Not worth compressing
+      data, codec = raw, CODECS['none']
+    crc = zlib.crc32(raw)
+    self.index += [(self.file.tell() + CHUNK_HEADER.size, self.rawOffset, len(raw), len(data), codec, crc)]
+    self.file.write(CHUNK_HEADER.pack(b"TZCK", codec, 0, 0, len(data), len(raw), self.rawOffset, crc) + data)
+    self.rawOffset += len(raw)
+    self.chunk = bytearray()
+
+  def flush(self):
+    """Writes the current chunk, so that everything written so far can be read back"""
+    self.flush_chunk()
+    self.file.flush()
+
+  def close(self):
+    self.flush_chunk()
+    indexOffset = self.file.tell()
+    self.file.write(b"TZIX" + struct.pack("<I", len(self.index)) + b"".join(INDEX_ENTRY.pack(*entry) for entry in self.index))
+    self.file.write(INDEX_TRAILER.pack(indexOffset, b"TZEN"))
+    if self.owner:
+      self.file.close()
+    else:
+      self.file.flush()
+
+def compress_log(filename, output, codec='zlib', level=None, chunkSize=1<<22):
+  """Writes a plain or compressed log as a compressed log"""
+  with open_log_file(filename) as f, TIOZWriter(output, codec=codec, level=level, chunkSize=chunkSize) as writer:
+    while True:
+      data = f.read(1<<20)
+      if len(data) == 0:
+        break
+      writer.write(data)
+
+class TIOZFile(object):
+  """Reads the packet stream of a compressed log; file-like (read, seek, tell) and sliceable
+  by raw offset. Only the chunks that are read from are decompressed."""
+
+  def __init__(self, filename, cacheSize=2):
+    self.name = filename
+    self.file = open(filename, 'rb')
+    if self.file.read(len(FILE_HEADER))[:len(FILE_MAGIC)] != FILE_MAGIC:
+      raise ValueError(f"{filename} is not a compressed TIO log")
+    self.chunks = [] # (file offset of the data, raw offset, raw size, compressed size, codec, CRC-32)
+    self.starts = []
+    self.scanned = len(FILE_HEADER) # File offset after the last chunk found
+    self.closed = False
+    self.cache = {} # chunk: raw bytes
+    self.cacheSize = cacheSize
+    self.position = 0
+    if not self.read_index():
+      self.refresh()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def close(self):
+    self.cache = {}
+    self.file.close()
+
+  def read_index(self):
+    """Loads the chunk index written on close; False if there is none"""
+    size = os.fstat(self.file.fileno()).st_size
+    if size < len(FILE_HEADER) + INDEX_TRAILER.size:
+      return False
+    self.file.seek(size - INDEX_TRAILER.size)
+    indexOffset, magic = INDEX_TRAILER.unpack(self.file.read(INDEX_TRAILER.size))
+    if magic != b"TZEN" or indexOffset >= size:
+      return False
+    self.file.seek(indexOffset)
+    if self.file.read(4) != b"TZIX":
+      return False
+    count, = struct.unpack("<I", self.file.read(4))
+    entries = self.file.read(count * INDEX_ENTRY.size)
+    self.chunks = [ INDEX_ENTRY.unpack_from(entries, i*INDEX_ENTRY.size) for i in range(count) ]
+    self.starts = [ chunk[1] for chunk in self.chunks ]
+    self.closed = True
+    return True
+
+  def refresh(self):
+    """Finds chunks written since the last look (for files still being written)"""
+    if self.closed:
+      return
+    size = os.fstat(self.file.fileno()).st_size
+    while self.scanned + CHUNK_HEADER.size <= size:
+      self.file.seek(self.scanned)
+      header = self.file.read(CHUNK_HEADER.size)
+      if header[:4] == b"TZIX":
+        self.closed = True
+        break
+      magic, codec, flags, reserved, compressedSize, rawSize, rawOffset, crc = CHUNK_HEADER.unpack(header)
+      if magic != b"TZCK":
+        raise ValueError(f"Bad chunk at byte {self.scanned} of {self.name}")
+      if self.scanned + CHUNK_HEADER.size + compressedSize > size: # Still being written
+        break
+      self.chunks += [(self.scanned + CHUNK_HEADER.size, rawOffset, rawSize, compressedSize, codec, crc)]
+      self.starts += [rawOffset]
+      self.scanned += CHUNK_HEADER.size + compressedSize
+
+  @property
+  def size(self):
+    if not self.chunks:
+      return 0
+    return self.chunks[-1][1] + self.chunks[-1][2]
+
+  def __len__(self):
+    return self.size
+
+  def chunk_data(self, i):
+    if i in self.cache:
+      return self.cache[i]
+    fileOffset, rawOffset, rawSize, compressedSize, codec, crc = self.chunks[i]
+    self.file.seek(fileOffset)
+    raw = decompress(self.file.read(compressedSize), codec)
+    if len(raw) != rawSize or zlib.crc32(raw) != crc:
+      raise ValueError(f"Chunk {i} of {self.name} is corrupt")
+    if len(self.cache) >= self.cacheSize:
+      self.cache.pop(next(iter(self.cache)))
+    self.cache[i] = raw
+    return raw
+
+  def read_range(self, start, stop):
+    """Raw bytes from start up to stop (or the end)"""
+    stop = self.size if stop is None else min(stop, self.size)
+    parts = []
+    position = start
+    while position < stop:
+      i = bisect.bisect_right(self.starts, position) - 1
+      data = self.chunk_data(i)
+      parts += [data[position-self.starts[i]:stop-self.starts[i]]]
+      position = self.starts[i] + len(data)
+    return b"".join(parts)
+
+  def chunk_range(self, start, stop=None):
+    """Raw offset and bytes of the whole chunks that cover start up to stop, for readers that
+    need one contiguous buffer"""
+    stop = self.size if stop is None else min(stop, self.size)
+    if stop <= start or not self.chunks:
+      return start, b""
+    first = max(bisect.bisect_right(self.starts, start) - 1, 0)
+    last = bisect.bisect_left(self.starts, stop)
+    return self.starts[first], b"".join(self.chunk_data(i) for i in range(first, last))
+
+  def __getitem__(self, key):
+    if isinstance(key, slice):
+      return self.read_range(key.start or 0, key.stop)
+    return self.read_range(key, key+1)[0]
+
+  def seek(self, position, whence=0):
+    if whence == 1:
+      position += self.position
+    elif whence == 2:
+      position += self.size
+    self.position = position
+    return position
+
+  def tell(self):
+    return self.position
+
+  def read(self, size=-1):
+    if size < 0 or self.position + size > self.size:
+      self.refresh()
+    data = self.read_range(self.position, None if size < 0 else self.position + size)
+    self.position += len(data)
+    return data
@@ -50,6 +50,9 @@ TL_RPC_ERRORS = [ \
   'TL_RPC_ERROR_USER'      , # 18 Start value to define per-RPC error codes
 ]
 
+class TLRPCException(Exception):
+    pass
+
 
 UINT8_T =      0x10
 INT8_T =       0x11
@@ -108,6 +111,7 @@ class TIOProtocol(object):
     self.columns = []
     self.columnsByName = {}
     self.rowunpackByBytes = {}
+    self.sourceUnpack = {}
 
   def stateExport(self):
     return [self.timebases, self.sources, self.streamInfo, self.streams]
@@ -313,6 +317,7 @@ class TIOProtocol(object):
   def streamCompile(self, streams):
     columns = []
     columnsByName = {}
+    sourceUnpack = {}
     column = 0
     rowBytes = 0
     rowPack = "<"
@@ -327,12 +332,16 @@ class TIOProtocol(object):
         return
       stream.update( sourceInfo )
       stream['stream_column_start'] = column
+      stream['stream_byte_start'] = rowBytes
+      stream['stream_byte_size'] = stream['source_channels'] * stream['source_dtype_bytes']
+      stream['stream_pack'] = "<" + stream['source_dtype_pack'] * stream['source_channels']
       stream['stream_period_us'] = period_us * stream['stream_period']
       stream['stream_Fs'] = round(1e6/stream['stream_period_us']) # Round to nearest integer TODO: error for substantially non-integer frequencies
       stream['stream_start_time_sec'] = self.timebases[self.streamInfo['stream_timebase_id']]['timebase_start_time']
       self.sources[stream['source_name']]['Fs'] = stream['stream_Fs']
 
       columnsByName[ stream['source_name'] ] = stream
+      sourceUnpack[ stream['source_name'] ] = (rowBytes, struct.Struct(stream['stream_pack']))
 
       for i in range(stream['source_channels']):
         column += 1
@@ -356,11 +365,13 @@ class TIOProtocol(object):
     self.streams = streams
     self.columns = columns
     self.columnsByName = columnsByName
+    self.sourceUnpack = sourceUnpack
 
-  def req(self, topic, payload):
+  def req(self, topic, payload, requestID=None):
     if type(topic) is str:
       topic = topic.encode('utf-8')
-    requestID = random.randint(0,0xFFFF)
+    if requestID is None:
+      requestID = random.randint(0,0xFFFF)
     methodID = len(topic) + 0x8000 # Set high bit and use length for named method
     requestHeader = struct.pack("<HH", requestID, methodID )
     msg = requestHeader + topic
@@ -377,6 +388,11 @@ class TIOProtocol(object):
     msg = header + msg + self.routingBytes
     return msg
 
+  def stream_time(self, parsedPacket):
+    time = parsedPacket['sampleNumber'] / self.streams[0]['stream_Fs']
+    time += self.streams[0]['stream_start_time_sec']
+    return time
+
   def stream_data(self, parsedPacket, timeaxis = False):
     packet_bytes = int(len(parsedPacket['rawdata']))
     if packet_bytes not in self.rowunpackByBytes.keys():
@@ -384,9 +400,112 @@ class TIOProtocol(object):
       return []
     data = struct.unpack( self.rowunpackByBytes[packet_bytes], parsedPacket['rawdata'] )
     if timeaxis:
-      time = parsedPacket['sampleNumber'] / self.streams[0]['stream_Fs']
-      time += self.streams[0]['stream_start_time_sec']
-      return time,data
+      return self.stream_time(parsedPacket),data
+    else:
+      return data
+
+  def stream_source_data(self, parsedPacket, topic, timeaxis = False):
+    """Unpacks only the columns of one source; empty if the packet does not carry it"""
+    offset, unpack = self.sourceUnpack[topic]
+    rawdata = parsedPacket['rawdata']
+    if len(rawdata) < offset + unpack.size:
+      data = ()
+    else:
+      data = unpack.unpack_from(rawdata, offset)
+    if timeaxis:
+      return self.stream_time(parsedPacket),data
+    else:
+      return data
+
+  def stream_source_array(self, parsedPackets, topic, timeaxis = False):
+    """Decodes one source from packets that all carry it into an array shaped (channels, samples).
+    Each row size is read through a strided view of the joined packet bytes, so the other
+    columns are never converted."""
+    import numpy as np
+    streamInfo = self.columnsByName[topic]
+    offset = streamInfo['stream_byte_start']
+    channels = streamInfo['source_channels']
+    dtype = np.dtype('<'+streamInfo['source_dtype_pack'])
+    groups = {}
+    for i, parsedPacket in enumerate(parsedPackets):
+      groups.setdefault(len(parsedPacket['rawdata']), []).append(i)
+    data = np.empty((channels, len(parsedPackets)), dtype=dtype)
+    for packet_bytes, indices in groups.items():
+      if len(indices) == len(parsedPackets):
+        indices = slice(None)
+        raw = b''.join(parsedPacket['rawdata'] for parsedPacket in parsedPackets)
+      else:
+        raw = b''.join(parsedPackets[i]['rawdata'] for i in indices)
+      rows = len(raw) // packet_bytes
+      view = np.ndarray(shape=(channels, rows), dtype=dtype, buffer=raw, offset=offset, strides=(dtype.itemsize, packet_bytes))
+      data[:, indices] = view
+    if timeaxis:
+      sampleNumbers = np.fromiter((parsedPacket['sampleNumber'] for parsedPacket in parsedPackets), dtype=np.float64, count=len(parsedPackets))
+      time = sampleNumbers / self.streams[0]['stream_Fs'] + self.streams[0]['stream_start_time_sec']
+      return time, data
+    else:
+      return data
+
+  def stream_dtype(self, packet_bytes):
+    """numpy dtype for rows of the given size, one field per column"""
+    import numpy as np
+    return np.dtype([ (f"c{i}", '<'+code) for i, code in enumerate(self.rowunpackByBytes[packet_bytes][1:]) ])
+
+  def stream_data_columns(self, parsedPackets):
+    """Decodes a list of STREAM0 packets into a list of one array per column, each in the
+    column's own type. Rows of a given size are decoded together straight from the packet
+    bytes. A column that some rows do not carry is promoted to floating point and padded
+    with NaN in those rows."""
+    import numpy as np
+    groups = {}
+    for i, parsedPacket in enumerate(parsedPackets):
+      groups.setdefault(len(parsedPacket['rawdata']), []).append(i)
+    rowDtypes = { packet_bytes: self.stream_dtype(packet_bytes) for packet_bytes in groups if packet_bytes in self.rowunpackByBytes }
+    fullBytes = max(self.rowunpackByBytes.keys(), default=0)
+    fullDtype = self.stream_dtype(fullBytes) if fullBytes else ()
+    single = rowDtypes.get(next(iter(groups))) if len(groups) == 1 else None
+    columns = []
+    for column in range(len(self.columns)):
+      dtype = fullDtype[column] if column < len(fullDtype) else np.dtype(np.float64)
+      if any(packet_bytes not in rowDtypes or len(rowDtypes[packet_bytes]) <= column for packet_bytes in groups):
+        dtype = np.result_type(dtype, np.float32) # Missing values are NaN
+      if single is not None and column < len(single) and single[column] == dtype:
+        columns += [None] # Filled below with a view of the rows
+      else:
+        columns += [np.empty(len(parsedPackets), dtype=dtype)]
+    for packet_bytes, indices in groups.items():
+      if len(indices) == len(parsedPackets):
+        indices = slice(None)
+      if packet_bytes not in rowDtypes:
+        self.logger.debug(f"No source information for packet")
+        for data in columns:
+          data[indices] = np.nan
+        continue
+      rowDtype = rowDtypes[packet_bytes]
+      if isinstance(indices, slice):
+        raw = b''.join(parsedPacket['rawdata'] for parsedPacket in parsedPackets)
+      else:
+        raw = b''.join(parsedPackets[i]['rawdata'] for i in indices)
+      rows = np.frombuffer(raw, dtype=rowDtype)
+      for column, data in enumerate(columns):
+        if data is None:
+          columns[column] = rows[f"c{column}"]
+        elif column < len(rowDtype):
+          data[indices] = rows[f"c{column}"]
+        else:
+          data[indices] = np.nan
+    return columns
+
+  def stream_data_array(self, parsedPackets, timeaxis = False):
+    """Decodes a list of STREAM0 packets into one array shaped (columns, samples), in one type
+    that holds every column; see stream_data_columns."""
+    import numpy as np
+    data = self.stream_data_columns(parsedPackets)
+    data = np.vstack(data) if data else np.empty((0, len(parsedPackets)))
+    if timeaxis:
+      sampleNumbers = np.fromiter((parsedPacket['sampleNumber'] for parsedPacket in parsedPackets), dtype=np.float64, count=len(parsedPackets))
+      time = sampleNumbers / self.streams[0]['stream_Fs'] + self.streams[0]['stream_start_time_sec']
+      return time, data
     else:
       return data
 
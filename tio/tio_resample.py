@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Resampling of logged routes onto a common time base
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Puts routes with different sample rates on one grid of times,
+start + k/rate, so that a mixed-rate array merges into a single table
+without dropping the slow routes. The methods are:
+
+  hold   - the latest sample at or before each grid time
+  linear - linear interpolation between the samples around each grid time
+  mean   - the mean of the samples in [t, t + 1/rate) for each grid time t
+
+Samples are added a block at a time and a grid value is given out once later
+samples can no longer change it, so a log is resampled one index chunk at a
+time with memory bounded by the chunk size.
+"""
+
+import os
+import numpy as np
+from .tio_logindex import TIOLogIndex
+
+RESAMPLE_METHODS = ['hold', 'linear', 'mean']
+
+class TIOResampler(object):
+  """Resamples the channels of one route onto the grid start + k/rate, k = 0, 1, ...
+  Grid times before the first sample are NaN."""
+
+  def __init__(self, channels, rate, start, method='linear'):
+    if method not in RESAMPLE_METHODS:
+      raise ValueError(f"Unknown resampling method {method}; choose from {RESAMPLE_METHODS}")
+    self.rate = rate
+    self.start = start
+    self.method = method
+    self.next = 0 # Grid index of the next value to give out
+    self.times = np.empty(0)
+    self.values = np.empty((channels, 0))
+
+  def grid(self, first, stop):
+    return self.start + np.arange(first, stop) / self.rate
+
+  def add(self, times, values):
+    """Adds samples shaped (channels, samples) in time order; samples that do not come after
+    the ones before them are dropped. Returns the grid values settled by them, shaped
+    (channels, n), for grid indices from the previous value of self.next."""
+    times = np.asarray(times, dtype=np.float64)
+    values = np.asarray(values, dtype=np.float64).reshape(self.values.shape[0], -1)
+    if len(times) == 0:
+      return self.emit(self.next)
+    latest = np.maximum.accumulate(np.concatenate((self.times[-1:] if len(self.times) else [-np.inf], times)))
+    keep = times > latest[:-1]
+    self.times = np.concatenate((self.times, times[keep]))
+    self.values = np.concatenate((self.values, values[:, keep]), axis=1)
+    last = np.floor((self.times[-1] - self.start) * self.rate)
+    if self.method == 'mean':
+      stop = int(last) # Bins that end at or before the latest sample
+    else:
+      stop = int(last) + 1 # Grid times at or before the latest sample
+    return self.emit(stop)
+
+  def finish(self):
+    """Values left once there are no more samples: the bin of the last sample for mean"""
+    if self.method != 'mean' or len(self.times) == 0:
+      return self.emit(self.next)
+    return self.emit(int(np.floor((self.times[-1] - self.start) * self.rate)) + 1)
+
+  def emit(self, stop):
+    channels = self.values.shape[0]
+    if stop <= self.next:
+      return np.empty((channels, 0))
+    grid = self.grid(self.next, stop)
+    times, values = self.times, self.values
+    if len(times) == 0:
+      out = np.full((channels, len(grid)), np.nan)
+    elif self.method == 'linear':
+      out = np.vstack([ np.interp(grid, times, channel, left=np.nan, right=np.nan) for channel in values ]) if channels else np.empty((0, len(grid)))
+    elif self.method == 'hold':
+      index = np.searchsorted(times, grid, side='right') - 1
+      out = values[:, np.maximum(index, 0)]
+      out[:, index < 0] = np.nan
+    else:
+      edges = np.searchsorted(times, self.grid(self.next, stop+1), side='left')
+      finite = np.isfinite(values)
+      sums = np.concatenate((np.zeros((channels, 1)), np.cumsum(np.where(finite, values, 0), axis=1)), axis=1)
+      counts = np.concatenate((np.zeros((channels, 1)), np.cumsum(finite, axis=1)), axis=1)
+      total = sums[:, edges[1:]] - sums[:, edges[:-1]]
+      count = counts[:, edges[1:]] - counts[:, edges[:-1]]
+      with np.errstate(invalid='ignore', divide='ignore'):
+        out = np.where(count > 0, total / count, np.nan)
+
+    # Keep only the samples later grid values depend on
+    nextTime = self.start + stop / self.rate
+    if self.method == 'mean':
+      first = np.searchsorted(times, nextTime, side='left')
+    else:
+      first = max(np.searchsorted(times, nextTime, side='right') - 1, 0)
+    self.times = times[first:]
+    self.values = values[:, first:]
+    self.next = stop
+    return out
+
+def route_prefix(filename, prefix):
+  return os.path.basename(filename[:-4]) if prefix else ""
+
+def resample_logs(filenames, columns, rate, start, end, method='linear', prefix=False, margin=1.0):
+  """Yields blocks of (times, {route: values shaped (columns, n)}) on the grid of times from
+  start to end (inclusive) at rate, for the routes named in columns (route: column names, with
+  the file name before each route when prefix is set, as tiologparse names them).
+  Each file is decoded an index chunk at a time, including samples up to margin seconds
+  outside the range so that the values at its edges can use them; a route is NaN where it
+  has no data."""
+  resamplers = { route: TIOResampler(len(names), rate, start, method) for route, names in columns.items() }
+  pending = { route: np.empty((len(names), 0)) for route, names in columns.items() }
+  produced = { route: 0 for route in columns } # Grid values ready for each route
+  fileRoutes = { filename: [ route for route in columns if route.startswith(route_prefix(filename, prefix)+"/") ] for filename in filenames }
+  chunks = { filename: TIOLogIndex(filename).iter_read(start - margin, end + margin) for filename in filenames if fileRoutes[filename] }
+  count = int(np.floor((end - start) * rate + 1e-3)) + 1 # Tolerates rounding of large (Unix) times
+  k = 0
+
+  def add(route, values):
+    pending[route] = np.concatenate((pending[route], values), axis=1)
+    produced[route] += values.shape[1]
+
+  while k < count:
+    ready = min(produced.values(), default=count)
+    if ready > k:
+      stop = min(ready, count)
+      block = {}
+      for route in columns:
+        block[route] = pending[route][:, k-(produced[route]-pending[route].shape[1]):][:, :stop-k]
+        pending[route] = pending[route][:, block[route].shape[1]:]
+      yield start + np.arange(k, stop) / rate, block
+      k = stop
+      continue
+    # Decode more of the file of the route that is furthest behind
+    route = min(produced, key=produced.get)
+    filename = next(name for name, routes in fileRoutes.items() if route in routes)
+    try:
+      segments = next(chunks[filename])
+    except StopIteration:
+      for name in fileRoutes[filename]:
+        add(name, resamplers[name].finish())
+        add(name, np.full((len(columns[name]), max(count - produced[name], 0)), np.nan)) # Nothing after the end of the file
+      continue
+    for segment in segments:
+      name = route_prefix(filename, prefix) + segment['route']
+      if name not in columns:
+        continue
+      values = np.vstack([ segment['data'][column] if column in segment['data'] else np.full(len(segment['time']), np.nan)
+                           for column in columns[name] ])
+      add(name, resamplers[name].add(segment['time'], values))
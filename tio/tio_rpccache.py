@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - RPC result cache
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Answers repeated RPC reads from earlier replies instead of a round trip to
+the device. Each RPC has a lifetime for its cached reply:
+
+  FOREVER  - identity fields such as dev.name, dev.serial and dev.firmware.serial
+  ttl      - other readable values, for ttl seconds (0, the default, for none)
+  0        - actions, RPCs that cannot be read and reads that take an argument
+
+A request with a payload is a write: it is always sent, and drops the cached
+reply of the same RPC both before it is sent and after it returns. A read that
+was in flight across a write does not store its reply. When the device reports a new dev.session (it was
+restarted), everything is dropped. The session is checked at most every
+sessionInterval seconds, before a cached reply is used.
+
+Enabled per session with TIOSession.enable_rpc_cache().
+"""
+
+import queue
+import threading
+import time
+from .tio_protocol import *
+
+FOREVER = float('inf')
+
+IDENTITY_RPCS = ['dev.name', 'dev.desc', 'dev.model', 'dev.revision', 'dev.serial', 'dev.uid', 'dev.mcu_id',
+                 'dev.firmware.serial', 'dev.firmware.hash', 'dev.firmware.rev', 'dev.firmware.tstamp']
+
+class TIORPCCache(object):
+  def __init__(self, session, ttl=0, policies=None, sessionInterval=5.0):
+    self.session = session
+    self.ttl = ttl # Seconds a readable value is kept
+    self.policies = { name: FOREVER for name in IDENTITY_RPCS }
+    self.policies.update(policies or {}) # name: seconds
+    self.sessionInterval = sessionInterval # Seconds between checks of dev.session; None for no checks
+    self.lock = threading.Lock()
+    self.entries = {} # topic: (expiry time, reply)
+    self.generations = {} # topic: number of invalidations, to spot reads that overlap a write
+    self.epoch = 0 # Number of clears, likewise for reads that overlap a clear
+    self.deviceSession = None
+    self.lastCheck = None
+    self.hits = 0
+    self.misses = 0
+    self.invalidations = 0
+    self.clears = 0
+    self.sessionChecks = 0
+
+  def lifetime(self, topic):
+    """Seconds a reply of an RPC is kept"""
+    if topic in self.policies:
+      return self.policies[topic]
+    if topic == 'dev.session':
+      return 0
+    rpcNumber = getattr(self.session, 'rpcNames', {}).get(topic)
+    if rpcNumber is None or rpcNumber >= len(self.session.rpcs):
+      return 0
+    rpc = self.session.rpcs[rpcNumber]
+    if not (rpc['valid'] and rpc['r']) or rpc['datatype'] == NONE_T:
+      return 0
+    return self.ttl
+
+  def rpc(self, topic, payload=None):
+    """The reply to an RPC, from the cache when it holds a live one"""
+    if payload is not None:
+      self.invalidate(topic)
+      try:
+        return self.session.rpc_request(topic, payload)
+      finally:
+        self.invalidate(topic)
+    lifetime = self.lifetime(topic)
+    if lifetime <= 0:
+      return self.session.rpc_request(topic)
+    self.check_session()
+    now = time.monotonic()
+    with self.lock:
+      entry = self.entries.get(topic)
+      if entry is not None and entry[0] > now:
+        self.hits += 1
+        return entry[1]
+      self.misses += 1
+      generation = (self.epoch, self.generations.get(topic, 0))
+    reply = self.session.rpc_request(topic)
+    with self.lock:
+      if (self.epoch, self.generations.get(topic, 0)) == generation: # No write or clear since the request was sent
+        self.entries[topic] = (now + lifetime, reply)
+    return reply
+
+  def check_session(self):
+    """Clears the cache when dev.session has changed since the last check"""
+    if self.sessionInterval is None:
+      return
+    now = time.monotonic()
+    if self.lastCheck is not None and now - self.lastCheck < self.sessionInterval:
+      return
+    self.lastCheck = now
+    self.sessionChecks += 1
+    try:
+      deviceSession = self.session.rpc_request('dev.session')
+    except TLRPCException:
+      self.sessionInterval = None # No dev.session on this device
+      return
+    except queue.Empty:
+      return # No reply this time; checked again after the interval
+    if self.deviceSession is not None and deviceSession != self.deviceSession:
+      self.clear()
+    self.deviceSession = deviceSession
+
+  def invalidate(self, topic):
+    with self.lock:
+      self.generations[topic] = self.generations.get(topic, 0) + 1
+      if self.entries.pop(topic, None) is not None:
+        self.invalidations += 1
+
+  def clear(self):
+    with self.lock:
+      self.entries = {}
+      self.epoch += 1
+      self.clears += 1
+
+  def stats(self, reset=False):
+    """Hit and miss counts; each hit is a round trip saved"""
+    stats = {
+      'hits': self.hits,
+      'misses': self.misses,
+      'invalidations': self.invalidations,
+      'clears': self.clears,
+      'session_checks': self.sessionChecks,
+      'entries': len(self.entries),
+    }
+    if reset:
+      self.hits = self.misses = self.invalidations = self.clears = self.sessionChecks = 0
+    return stats
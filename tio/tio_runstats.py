@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Incremental per-column statistics
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Running count, mean, variance, min/max and measured sample rate for every
+column, updated a block at a time. Blocks are combined with Chan's parallel
+form of Welford's algorithm, so memory does not grow with the amount of
+data. Sliding windows are answered from per-bucket aggregates (one bucket per
+`bucket` seconds), so their resolution is one bucket.
+"""
+
+import collections
+import queue
+import threading
+import numpy as np
+
+def _block_moments(data):
+  """count, mean, M2, min and max of each row, ignoring NaN"""
+  mask = np.isfinite(data)
+  count = mask.sum(axis=1)
+  mean = np.where(mask, data, 0).sum(axis=1) / np.maximum(count, 1)
+  m2 = (np.where(mask, data - mean[:, np.newaxis], 0)**2).sum(axis=1)
+  low = np.where(mask, data, np.inf).min(axis=1)
+  high = np.where(mask, data, -np.inf).max(axis=1)
+  return [count, mean, m2, low, high]
+
+def _merge(a, b):
+  """Chan et al. pairwise combination of two [count, mean, M2, min, max] aggregates"""
+  countA, meanA, m2A, lowA, highA = a
+  countB, meanB, m2B, lowB, highB = b
+  count = countA + countB
+  safe = np.maximum(count, 1)
+  delta = meanB - meanA
+  mean = meanA + delta * countB / safe
+  m2 = m2A + m2B + delta**2 * countA * countB / safe
+  return [count, mean, m2, np.minimum(lowA, lowB), np.maximum(highA, highB)]
+
+def _empty(n):
+  """Aggregate of no data for n columns"""
+  return [np.zeros(n, dtype=np.int64), np.zeros(n), np.zeros(n), np.full(n, np.inf), np.full(n, -np.inf)]
+
+class TIORunningStats(object):
+  def __init__(self, columns, window=60, bucket=1.0):
+    self.columns = columns
+    self.window = window # Longest sliding window kept, in seconds
+    self.bucket = bucket
+    self.reset()
+
+  def reset(self):
+    self.total = _empty(len(self.columns))
+    self.firstTime = None
+    self.lastTime = None
+    self.buckets = collections.deque() # [bucket start, first time, last time, aggregate]
+
+  def set_columns(self, columns):
+    """Follows a change of the stream layout. Statistics are kept by column name: columns that
+    are new start empty and those that are no longer in the stream are dropped."""
+    columns = list(columns)
+    if columns == list(self.columns):
+      return
+    previous = { name: i for i, name in enumerate(self.columns) }
+    take = np.array([ previous.get(name, -1) for name in columns ], dtype=np.int64)
+    present = take >= 0
+    empty = _empty(len(columns))
+    def remap(aggregate):
+      if len(self.columns) == 0:
+        return empty
+      return [ np.where(present, values[np.maximum(take, 0)], blank) for values, blank in zip(aggregate, empty) ]
+    self.total = remap(self.total)
+    for entry in self.buckets:
+      entry[3] = remap(entry[3])
+    self.columns = columns
+
+  def update(self, data, times):
+    """Adds a block shaped (columns, samples) with the time of each sample"""
+    if data.shape[1] == 0:
+      return
+    moments = _block_moments(np.asarray(data, dtype=np.float64))
+    self.total = _merge(self.total, moments)
+    if self.firstTime is None:
+      self.firstTime = times[0]
+    self.lastTime = times[-1]
+
+    # Split the block at bucket boundaries only when it spans more than one
+    starts = np.floor(np.asarray(times) / self.bucket) * self.bucket
+    if starts[0] == starts[-1]:
+      self.add_bucket(starts[0], times[0], times[-1], moments)
+    else:
+      edges = np.flatnonzero(np.diff(starts)) + 1
+      for begin, end in zip(np.r_[0, edges], np.r_[edges, len(starts)]):
+        self.add_bucket(starts[begin], times[begin], times[end-1], _block_moments(data[:, begin:end]))
+    while self.buckets and self.buckets[0][0] < self.lastTime - self.window - self.bucket:
+      self.buckets.popleft()
+
+  def add_bucket(self, start, first, last, moments):
+    if self.buckets and self.buckets[-1][0] == start:
+      entry = self.buckets[-1]
+      entry[2] = last
+      entry[3] = _merge(entry[3], moments)
+    else:
+      self.buckets.append([start, first, last, moments])
+
+  def query(self, window=None):
+    """Statistics since the start, or over the last `window` seconds.
+    Returns a dict of per-column arrays plus the column names."""
+    if window is None:
+      aggregate, first, last = self.total, self.firstTime, self.lastTime
+    else:
+      selected = [entry for entry in self.buckets if entry[2] >= self.lastTime - window]
+      aggregate = _empty(len(self.columns))
+      for entry in selected:
+        aggregate = _merge(aggregate, entry[3])
+      first = selected[0][1] if selected else None
+      last = selected[-1][2] if selected else None
+    count, mean, m2, low, high = aggregate
+    empty = count == 0
+    span = (last - first) if first is not None and last > first else np.nan
+    with np.errstate(invalid='ignore', divide='ignore'):
+      return {
+        'columns': self.columns,
+        'count': count,
+        'mean': np.where(empty, np.nan, mean),
+        'variance': np.where(count > 1, m2 / np.maximum(count-1, 1), np.nan),
+        'std': np.sqrt(np.where(count > 1, m2 / np.maximum(count-1, 1), np.nan)),
+        'min': np.where(empty, np.nan, low),
+        'max': np.where(empty, np.nan, high),
+        'rate': (count - 1) / span,
+      }
+
+class TIOStreamStatistics(object):
+  """Keeps TIORunningStats up to date from a session subscription on a background thread,
+  so that monitors can query it without reading from the session themselves. When the stream
+  layout changes, for example as sources are switched on and off, the timing and columns are
+  looked up again and the statistics follow the columns by name."""
+
+  def __init__(self, session, topic=None, window=60, bucket=1.0, maxsize=10000):
+    self.session = session
+    self.topic = topic
+    self.stats = TIORunningStats(self.columns(), window=window, bucket=bucket)
+    self.lock = threading.Lock()
+    self.subscription = session.subscribe(maxsize=maxsize)
+    self.alive = True
+    self.thread = threading.Thread(target=self.run, name='stats-thread', daemon=True)
+    self.thread.start()
+
+  def columns(self):
+    if self.topic is None:
+      return list(self.session.protocol.columns)
+    return self.session.stream_topic_columnnames(self.topic, withName=False)
+
+  def run(self):
+    while self.alive:
+      try:
+        sampleNumbers, data = self.session.subscription_read_array(self.subscription, topic=self.topic, timeout=0.5)
+        columns = self.columns()
+      except queue.Empty:
+        continue
+      except KeyError: # The source is not in the stream now
+        continue
+      stream = self.session.protocol.streams[0]
+      times = sampleNumbers / stream['stream_Fs'] + stream['stream_start_time_sec']
+      with self.lock:
+        if data.shape[0] != len(columns): # The layout changed again while decoding
+          continue
+        self.stats.set_columns(columns)
+        self.stats.update(data, times)
+
+  def query(self, window=None):
+    with self.lock:
+      return self.stats.query(window=window)
+
+  def reset(self):
+    with self.lock:
+      self.stats.reset()
+
+  def close(self):
+    self.alive = False
+    self.session.unsubscribe(self.subscription)
@@ -21,13 +21,18 @@ import logging
 import pickle
 import tempfile
 import os
+import cProfile
+import pstats
+import random
+import collections
 from .tio_protocol import *
-
-class TLRPCException(Exception):
-    pass
+from .tio_stats import *
+from .tio_latency import *
+from .tio_activation import *
+from .tio_rpccache import *
 
 class TIOSession(object):
-  def __init__(self, url="tcp://localhost", verbose=False, connectingMessage = True, rpcs=[], stateCache = True, send_router=None, specialize=True, timeout=False):
+  def __init__(self, url="tcp://localhost", verbose=False, connectingMessage = True, rpcs=[], stateCache = True, send_router=None, specialize=True, timeout=False, instrument=False, timestamps=False):
 
     if verbose:
       logLevel = logging.DEBUG
@@ -93,10 +98,25 @@ class TIOSession(object):
 
     # Initialize queues and threading controls
     self.pub_queue = queue.Queue(maxsize=1000)
+    self.subscribers = [] # Extra queues that receive every stream packet
     self.req_queue = queue.Queue(maxsize=1)
     self.rep_queue = queue.Queue(maxsize=1)
+    self.replyWaiters = {} # requestID: (queue, index) of a batch waiting for the reply, or the time until which a late reply is dropped
+    self.replyWaitersLock = threading.Lock()
     self.lock = threading.Lock()
     self.alive = True
+    self.metadataCondition = threading.Condition()
+    self.activation = TIOSourceActivation(self)
+    self.rpcCache = None # Optional TIORPCCache; see enable_rpc_cache
+
+    # Optional per-stage timing; drops are always counted
+    self.instrumented = instrument
+    self.statistics = TIOSessionStats()
+    self.profileRequest = None
+
+    # Optional host arrival time on each packet, with link latency statistics
+    self.timestamps = timestamps
+    self.latencyStats = TIOLatencyStats()
 
     # Launch socket management thread
     self.socket_recv_thread = threading.Thread(target=self.recv_thread)
@@ -182,37 +202,88 @@ class TIOSession(object):
 
   def recv_thread(self):
     while True:
+      if self.profileRequest is not None:
+        self.recv_profile(self.profileRequest)
+      self.recv_handle()
+
+  def recv_profile(self, request):
+    profiler = cProfile.Profile()
+    deadline = time.monotonic() + request['seconds']
+    profiler.enable()
+    try:
+      while time.monotonic() < deadline:
+        self.recv_handle()
+    finally:
+      profiler.disable()
+      self.profileRequest = None
+      request['stats'] = pstats.Stats(profiler)
+      if request['filename'] is not None:
+        request['stats'].dump_stats(request['filename'])
+      request['done'].set()
+
+  def recv_handle(self):
+    try:
+      decoded_packet = self.recv() # Blocks
+    except IOError as e:
+      # for now, just exit, TODO: reconnect?
+      # probably some I/O problem such as disconnected USB serial
+      #print("\x1Bc") # fix up after interactive python crash, TODO
+      self.logger.error(f"Error: {e}")
+      import os
+      os._exit(0)
+    # Handle stream
+    if decoded_packet['type'] == TL_PTYPE_STREAM0:
+      if self.timestamps and self.protocol.streams != []:
+        self.latencyStats.update(decoded_packet['host_time'], self.protocol.stream_time(decoded_packet))
+      if self.instrumented:
+        start = time.perf_counter()
       try:
-        decoded_packet = self.recv() # Blocks
-      except IOError as e:
-        # for now, just exit, TODO: reconnect?
-        # probably some I/O problem such as disconnected USB serial
-        #print("\x1Bc") # fix up after interactive python crash, TODO
-        self.logger.error(f"Error: {e}")
-        import os
-        os._exit(0)
-      # Handle stream
-      if decoded_packet['type'] == TL_PTYPE_STREAM0:
+        self.pub_queue.put(decoded_packet, block=False)
+      except queue.Full:
         try:
-          self.pub_queue.put(decoded_packet, block=False)
-        except queue.Full:
-          self.pub_queue.get() # Toss a packet
-          self.pub_queue.put(decoded_packet, block=False)
-        # except queue.Empty:
-        #   self.logger.error(f"No response. Timeout.")
-        #   import os
-        #   os._exit(0)
-      # Handle RPCs
-      elif decoded_packet['type'] == TL_PTYPE_RPC_REP or decoded_packet['type'] == TL_PTYPE_RPC_ERROR:
+          self.pub_queue.get(block=False) # Toss a packet
+        except queue.Empty: # A reader drained it meanwhile
+          pass
+        self.pub_queue.put(decoded_packet, block=False)
+        self.statistics.drop('pub')
+      for subscriber in self.subscribers:
         try:
-          self.rep_queue.put(decoded_packet, block=False)
+          subscriber.put(decoded_packet, block=False)
         except queue.Full:
-          self.rep_queue.get() # Toss a packet
-          self.rep_queue.put(decoded_packet, block=False)
-          self.logger.error("Tossing an unclaimed REP!")
-      elif decoded_packet['type'] == TL_PTYPE_OTHER_ROUTING:
-        if self.recv_router is not None:
-          self.recv_router(decoded_packet['routing'],decoded_packet['raw'])
+          try:
+            subscriber.get(block=False) # Toss a packet
+          except queue.Empty:
+            pass
+          subscriber.put(decoded_packet, block=False)
+          self.statistics.drop('subscriber')
+      if self.instrumented:
+        self.statistics.add('enqueue', time.perf_counter() - start)
+        self.statistics.depth('pub', self.pub_queue.qsize())
+      # except queue.Empty:
+      #   self.logger.error(f"No response. Timeout.")
+      #   import os
+      #   os._exit(0)
+    # Handle RPCs
+    elif decoded_packet['type'] == TL_PTYPE_RPC_REP or decoded_packet['type'] == TL_PTYPE_RPC_ERROR:
+      with self.replyWaitersLock:
+        waiter = self.replyWaiters.pop(decoded_packet['requestid'], None)
+      if waiter is not None:
+        if isinstance(waiter, tuple):
+          waiter[0].put((waiter[1], decoded_packet))
+        return
+      try:
+        self.rep_queue.put(decoded_packet, block=False)
+      except queue.Full:
+        self.rep_queue.get() # Toss a packet
+        self.rep_queue.put(decoded_packet, block=False)
+        self.statistics.drop('rep')
+        self.logger.error("Tossing an unclaimed REP!")
+    elif decoded_packet['type'] in [TL_PTYPE_TIMEBASE, TL_PTYPE_SOURCE, TL_PTYPE_STREAM]:
+      with self.metadataCondition:
+        self.metadataCondition.notify_all()
+    elif decoded_packet['type'] == TL_PTYPE_OTHER_ROUTING:
+      if self.recv_router is not None:
+        self.recv_router(decoded_packet['routing'],decoded_packet['raw'])
 
   def send_thread(self):
     while True:
@@ -225,6 +296,76 @@ class TIOSession(object):
       #print("❤️")
       self.send(self.protocol.heartbeat())
 
+  def pub_get(self):
+    if not self.instrumented:
+      return self.pub_queue.get()
+    start = time.perf_counter()
+    parsedPacket = self.pub_queue.get()
+    self.statistics.add('dequeue_wait', time.perf_counter() - start)
+    return parsedPacket
+
+  def stats(self, reset=False):
+    """Cumulative time and counts per receive stage, queue high-water marks and drops"""
+    report = self.statistics.report()
+    report['instrumented'] = self.instrumented
+    if reset:
+      self.statistics.reset()
+    return report
+
+  def latency(self, reset=False):
+    """Offset, drift, jitter and burstiness of host arrival time against device sample time"""
+    report = self.latencyStats.report()
+    if reset:
+      self.latencyStats.reset()
+    return report
+
+  def profile(self, seconds=10, filename=None):
+    """Runs the receive thread under cProfile for a while and returns the pstats.Stats.
+    The profile is also dumped to filename if given. Returns None if no packets arrived to end it."""
+    request = {'seconds':seconds, 'filename':filename, 'done':threading.Event(), 'stats':None}
+    self.profileRequest = request
+    request['done'].wait(seconds + 5)
+    return request['stats']
+
+  def subscribe(self, maxsize=1000):
+    """Returns a queue that receives every stream packet, independently of pub_queue"""
+    subscription = queue.Queue(maxsize=maxsize)
+    self.subscribers = self.subscribers + [subscription]
+    return subscription
+
+  def unsubscribe(self, subscription):
+    self.subscribers = [subscriber for subscriber in self.subscribers if subscriber is not subscription]
+
+  def subscription_read_array(self, subscription, topic=None, timeout=None, native=False):
+    """Decodes everything queued on a subscription, waiting for at least one packet
+    (raises queue.Empty after timeout). Returns the sample numbers and an array shaped
+    (columns, samples); with a topic, only that source and only the packets that carry it.
+    With native, the data of the whole stream is a list of one array per column in its own type."""
+    import numpy as np
+    packets = [subscription.get(timeout=timeout)]
+    while True:
+      try:
+        packets += [subscription.get(block=False)]
+      except queue.Empty:
+        break
+    if topic is None and native:
+      data = self.protocol.stream_data_columns(packets)
+    elif topic is None:
+      data = self.protocol.stream_data_array(packets)
+    else:
+      streamInfo = self.protocol.columnsByName[topic]
+      minimumBytes = streamInfo['stream_byte_start'] + streamInfo['stream_byte_size']
+      packets = [packet for packet in packets if len(packet['rawdata']) >= minimumBytes]
+      data = self.protocol.stream_source_array(packets, topic)
+    sampleNumbers = np.fromiter((packet['sampleNumber'] for packet in packets), dtype=np.int64, count=len(packets))
+    return sampleNumbers, data
+
+  def stream_read_available(self, timeout=None, native=False):
+    """Decodes every packet waiting in the stream queue, waiting up to timeout for the first
+    (raises queue.Empty). Returns the sample numbers and an array shaped (columns, samples),
+    or with native a list of one array per column in its own type."""
+    return self.subscription_read_array(self.pub_queue, timeout=timeout, native=native)
+
   def pub_flush(self):
     while not self.pub_queue.empty():
       try:
@@ -233,6 +374,8 @@ class TIOSession(object):
         break
 
   def recv_tcp_packet(self):
+    if self.instrumented:
+      start = time.perf_counter()
     try:
       header = bytes(self.socket.recv(4))
     except BlockingIOError:
@@ -244,15 +387,21 @@ class TIOSession(object):
     if payloadSize > TL_PACKET_MAX_SIZE or routingSize>TL_PACKET_MAX_ROUTING_SIZE:
       return b''
     payload = bytes(self.socket.recv(payloadSize+routingSize))
+    if self.instrumented:
+      self.statistics.add('read', time.perf_counter() - start)
     return header+payload
 
   def recv_udp_packet(self):
+    if self.instrumented:
+      start = time.perf_counter()
     try:
       d = self.socket.recvfrom(512)
       packet = d[0]
       address = d[1]
     except BlockingIOError:
       return b''
+    if self.instrumented:
+      self.statistics.add('read', time.perf_counter() - start)
     if len(packet) < 4:
       return b''
     headerFields = struct.unpack("<BBH", packet[0:4] )
@@ -263,21 +412,30 @@ class TIOSession(object):
 
   def recv_slip_packet(self):
     while self.alive and self.serial.is_open:
+      if self.instrumented:
+        start = time.perf_counter()
       try:
         # read all that is there or wait for one byte (blocking)
         data = self.serial.read(self.serial.in_waiting or 1)
       except serial.SerialException as e:
         raise IOError(f"serial error: {e}")
       else:
+        if self.instrumented:
+          self.statistics.add('read', time.perf_counter() - start)
         if data:
           self.buffer.extend(data)
           #print(len(self.buffer))
           if len(self.buffer)>2000:
             self.warn_overload()
           while slip.SLIP_END_CHAR in self.buffer:
+            if self.instrumented:
+              start = time.perf_counter()
             packet, self.buffer = self.buffer.split(slip.SLIP_END_CHAR, 1)
             try:
-              return slip.decode(packet)
+              packet = slip.decode(packet)
+              if self.instrumented:
+                self.statistics.add('framing', time.perf_counter() - start)
+              return packet
             except slip.SLIPEncodingError as error:
               self.logger.debug(error);
               #hexdump.hexdump(packet)
@@ -300,12 +458,28 @@ class TIOSession(object):
     elif self.uri.scheme == "udp":
       packet = self.recv_udp_packet()
     elif self.uri.scheme == "router":
-      packet = self.recv_queue.get()
+      if self.instrumented:
+        self.statistics.depth('recv', self.recv_queue.qsize())
+        start = time.perf_counter()
+        packet = self.recv_queue.get()
+        self.statistics.add('read', time.perf_counter() - start)
+      else:
+        packet = self.recv_queue.get()
     else:
       packet = self.recv_slip_packet()
+    if self.timestamps:
+      hostTime = time.monotonic()
     try:
       # Filter routing here? TODO
-      return self.protocol.decode_packet(packet)
+      if not self.instrumented:
+        decoded_packet = self.protocol.decode_packet(packet)
+      else:
+        start = time.perf_counter()
+        decoded_packet = self.protocol.decode_packet(packet)
+        self.statistics.add('decode', time.perf_counter() - start)
+      if self.timestamps:
+        decoded_packet['host_time'] = hostTime
+      return decoded_packet
     except Exception as error:
       self.logger.debug('Error decoding packet:');
       hexdump.hexdump(packet)
@@ -313,10 +487,25 @@ class TIOSession(object):
       return { 'type':TL_PTYPE_INVALID }
 
   def send_req(self, topic = "dev.desc", payload = None):
-    msg, requestID = self.protocol.req(topic, payload)
+    msg, requestID = self.protocol.req(topic, payload, self.request_id())
     self.req_queue.put(msg)
     return requestID
 
+  def request_id(self, waiter=None):
+    """A random request ID that is not in replyWaiters, registered there for waiter if given.
+    Dropped IDs whose late replies are no longer expected are freed first."""
+    with self.replyWaitersLock:
+      now = time.monotonic()
+      for requestID, until in list(self.replyWaiters.items()):
+        if not isinstance(until, tuple) and until <= now:
+          self.replyWaiters.pop(requestID, None)
+      requestID = random.randint(0, 0xFFFF)
+      while requestID in self.replyWaiters:
+        requestID = random.randint(0, 0xFFFF)
+      if waiter is not None:
+        self.replyWaiters[requestID] = waiter
+      return requestID
+
   def recv_rep(self, requestID = None):
     parsedPacket = self.rep_queue.get(timeout=3.0)
     if requestID is None or requestID == parsedPacket['requestid']:
@@ -328,6 +517,12 @@ class TIOSession(object):
         return parsedPacket['payload']
 
   def rpc(self, topic = "dev.desc", payload = None):
+    if self.rpcCache is not None:
+      return self.rpcCache.rpc(topic, payload)
+    return self.rpc_request(topic, payload)
+
+  def rpc_request(self, topic = "dev.desc", payload = None):
+    """Sends an RPC and waits for the reply, bypassing the cache"""
     requestID = self.send_req(topic, payload)
     try: 
       return self.recv_rep(requestID)
@@ -339,14 +534,17 @@ class TIOSession(object):
       raise
 
   def rpc_val(self, topic = "data.source.list", rpcType = FLOAT32_T, value = None, returnRaw = False):
-    if value is not None:
-      if rpcType == STRING_T:
-        reqPayload = value.encode('utf-8')
-      else:
-        reqPayload = struct.pack("<"+TYPES[rpcType][0], value)
-    else:
-      reqPayload = None
-    reply = self.rpc(topic, reqPayload)
+    reply = self.rpc(topic, self.rpc_encode(rpcType, value))
+    return self.rpc_decode(reply, rpcType, returnRaw)
+
+  def rpc_encode(self, rpcType, value):
+    if value is None:
+      return None
+    if rpcType == STRING_T:
+      return value.encode('utf-8')
+    return struct.pack("<"+TYPES[rpcType][0], value)
+
+  def rpc_decode(self, reply, rpcType, returnRaw = False):
     if reply is not None:
       if returnRaw:
         return reply
@@ -357,6 +555,71 @@ class TIOSession(object):
           return struct.unpack("<"+TYPES[rpcType][0], reply)[0]
     return None
 
+  def rpc_batch(self, requests, window=8, timeout=3.0, retries=1):
+    """Sends RPCs given as (topic, payload) with up to `window` of them waiting for their replies
+    at once, so that a batch takes about one round trip per window rather than per RPC. A request
+    without a reply after `timeout` seconds is sent again up to `retries` times. Returns the reply
+    to each in order, or for one that failed the exception (TLRPCException or queue.Empty)."""
+    results = [None] * len(requests)
+    attempts = [0] * len(requests)
+    todo = collections.deque(range(len(requests)))
+    outstanding = {} # requestID: (index, deadline)
+    replies = queue.Queue()
+    while todo or outstanding:
+      while todo and len(outstanding) < window:
+        index = todo.popleft()
+        topic, payload = requests[index]
+        if payload is not None and self.rpcCache is not None:
+          self.rpcCache.invalidate(topic)
+        msg, requestID = self.protocol.req(topic, payload, self.request_id((replies, index)))
+        outstanding[requestID] = (index, time.monotonic() + timeout)
+        attempts[index] += 1
+        self.req_queue.put(msg)
+      try:
+        index, packet = replies.get(timeout=max(min(deadline for index, deadline in outstanding.values()) - time.monotonic(), 0))
+      except queue.Empty:
+        now = time.monotonic()
+        for requestID, (index, deadline) in list(outstanding.items()):
+          if deadline > now:
+            continue
+          del outstanding[requestID]
+          with self.replyWaitersLock:
+            if requestID in self.replyWaiters: # Otherwise the reply has just been queued
+              self.replyWaiters[requestID] = now + timeout # Drop the reply if it comes late
+          if attempts[index] <= retries:
+            todo.append(index)
+          else:
+            self.logger.error(f"RPC TIMEOUT {requests[index][0]}")
+            results[index] = queue.Empty(f"No reply to {requests[index][0]}")
+        continue
+      outstanding.pop(packet['requestid'], None)
+      if packet['type'] == TL_PTYPE_RPC_ERROR:
+        self.logger.error(f"RPC ERROR {requests[index][0]}: {TL_RPC_ERRORS[packet['error']]}")
+        results[index] = TLRPCException(TL_RPC_ERRORS[packet['error']])
+      else:
+        results[index] = packet['payload'] if packet['payload'] != b'' else None
+    if self.rpcCache is not None:
+      for topic, payload in requests:
+        if payload is not None:
+          self.rpcCache.invalidate(topic) # Also after the write, for reads that overlapped it
+    return results
+
+  def rpc_val_batch(self, requests, window=8, timeout=3.0, retries=1):
+    """rpc_batch for (topic, rpcType, value) requests, with values encoded and replies decoded as rpc_val does"""
+    replies = self.rpc_batch([ (topic, self.rpc_encode(rpcType, value)) for topic, rpcType, value in requests ],
+                             window=window, timeout=timeout, retries=retries)
+    return [ reply if isinstance(reply, Exception) else self.rpc_decode(reply, rpcType)
+             for reply, (topic, rpcType, value) in zip(replies, requests) ]
+
+  def enable_rpc_cache(self, ttl=0, policies=None, sessionInterval=5.0):
+    """Answers repeated RPC reads from a cache; see TIORPCCache. Returns the cache, whose stats()
+    count the round trips saved."""
+    self.rpcCache = TIORPCCache(self, ttl=ttl, policies=policies, sessionInterval=sessionInterval)
+    return self.rpcCache
+
+  def disable_rpc_cache(self):
+    self.rpcCache = None
+
   def rpcList(self):
     self.rpcs = []
     rpcCount = self.rpc_val("rpc.list", UINT16_T)
@@ -392,18 +655,60 @@ class TIOSession(object):
       #return bool(self.rpc_val(topic+".data.active", UINT8_T))
       return topic in self.protocol.columnsByName.keys()
 
-  def stream_read_raw(self, samples = 1, duration=None, timeaxis=False, flush=True, simplify_single=True, transpose=True):
+  def sources_active(self, topics):
+    """Context manager that keeps the sources on while in use; see TIOSourceActivation"""
+    return self.activation.active(topics)
+
+  def stream_read_packets(self, samples, topic=None):
+    """Collects the next STREAM0 packets; with a topic, only those that carry it"""
+    minimumBytes = 0
+    if topic is not None:
+      streamInfo = self.protocol.columnsByName[topic]
+      minimumBytes = streamInfo['stream_byte_start'] + streamInfo['stream_byte_size']
+    packets = []
+    while len(packets) < samples:
+      parsedPacket = self.pub_get()
+      if parsedPacket['type'] == TL_PTYPE_STREAM0 and len(parsedPacket['rawdata']) >= minimumBytes:
+        packets += [parsedPacket]
+    return packets
+
+  def stream_read_array(self, packets, timeaxis=False, hosttime=False, topic=None):
+    """Array shaped (columns, samples), preceded by time arrays when requested"""
+    import numpy as np
+    if topic is None:
+      result = self.protocol.stream_data_array(packets, timeaxis=timeaxis)
+    else:
+      result = self.protocol.stream_source_array(packets, topic, timeaxis=timeaxis)
+    if not timeaxis:
+      result = (result,)
+    if hosttime:
+      hosttimes = np.fromiter((parsedPacket.get('host_time', np.nan) for parsedPacket in packets), dtype=np.float64, count=len(packets))
+      result = (hosttimes,) + result
+    if len(result) == 1:
+      return result[0]
+    return result
+
+  def stream_read_raw(self, samples = 1, duration=None, timeaxis=False, flush=True, simplify_single=True, transpose=True, hosttime=False, as_array=False):
+    if duration is not None:
+      samples = int(duration * self.protocol.streams[0]['stream_Fs'])
     if flush:
       self.pub_flush()
+    if as_array:
+      return self.stream_read_array(self.stream_read_packets(samples), timeaxis=timeaxis, hosttime=hosttime)
+    if samples <= 0: # A duration shorter than one sample period
+      return []
     data = []
     while True:
-      parsedPacket = self.pub_queue.get()
+      parsedPacket = self.pub_get()
       if parsedPacket['type'] == TL_PTYPE_STREAM0:
         if timeaxis:
           time, row = self.protocol.stream_data(parsedPacket, timeaxis=timeaxis)
-          data += [ [ time ] + list(row) ]
+          row = [ time ] + list(row)
         else:
-          data += [ self.protocol.stream_data(parsedPacket, timeaxis=timeaxis) ]
+          row = self.protocol.stream_data(parsedPacket, timeaxis=timeaxis)
+        if hosttime:
+          row = [ parsedPacket.get('host_time') ] + list(row)
+        data += [ row ]
         if len(data) == samples:
           break
     if transpose:
@@ -412,30 +717,33 @@ class TIOSession(object):
        data = [datum[0] for datum in data]
     return data
 
-  def stream_read_topic_raw(self, topic, samples = 10, timeaxis=False, simplify_single=True):
+  def stream_read_topic_raw(self, topic, samples = 10, timeaxis=False, simplify_single=True, hosttime=False):
     streamInfo = self.protocol.columnsByName[topic]
-    column = streamInfo['stream_column_start']
     channels = streamInfo['source_channels']
     data_flat = []
     times = []
+    hosttimes = []
     while True:
-      parsedPacket = self.pub_queue.get()
+      parsedPacket = self.pub_get()
       if parsedPacket['type'] == TL_PTYPE_STREAM0:
         if timeaxis:
-          time,row = self.protocol.stream_data(parsedPacket, timeaxis=timeaxis)
-          data_row = row[column:column+channels]
-          data_flat += data_row
-          if data_row != []:
-            times += [time]
+          time,data_row = self.protocol.stream_source_data(parsedPacket, topic, timeaxis=timeaxis)
         else:
-          row = self.protocol.stream_data(parsedPacket, timeaxis=timeaxis)          
-          data_flat += row[column:column+channels]
+          data_row = self.protocol.stream_source_data(parsedPacket, topic)
+        data_flat += data_row
+        if data_row:
+          if timeaxis:
+            times += [time]
+          if hosttime:
+            hosttimes += [parsedPacket.get('host_time')]
         if int(len(data_flat)/channels) >= samples: 
           break
     data_flat = data_flat[:channels*samples] # truncate at specified point
     data = [[row for row in data_flat[column::channels]] for column in range(channels)] # group data by channel
     if timeaxis:
       data = [times] + data
+    if hosttime:
+      data = [hosttimes[:samples]] + data
     if simplify_single:
       if samples == 1:
         data = [datum[0] for datum in data]
@@ -443,18 +751,25 @@ class TIOSession(object):
         data = data[0]
     return data
 
-  def stream_read_topic(self, topic, samples = 1, duration = None, autoActivate=True, timeaxis=False, flush=True, simplify_single=True):
+  def stream_read_topic_array(self, topic, samples = 10, timeaxis=False, hosttime=False):
+    packets = self.stream_read_packets(samples, topic=topic)
+    return self.stream_read_array(packets, timeaxis=timeaxis, hosttime=hosttime, topic=topic)
+
+  def stream_read_topic(self, topic, samples = 1, duration = None, autoActivate=True, timeaxis=False, flush=True, simplify_single=True, hosttime=False, as_array=False):
     if autoActivate:
-      wasActive = self.source_active(topic)
-      if not wasActive:
-        self.source_active(topic, True)
-    if duration is not None:
-      samples = int(duration * self.protocol.sources[topic]['Fs'])
-    if flush:
-      self.pub_flush()
-    data = self.stream_read_topic_raw(topic, samples, timeaxis=timeaxis, simplify_single=simplify_single)
-    if autoActivate and not wasActive:
-      self.source_active(topic, False)
+      self.activation.acquire([topic])
+    try:
+      if duration is not None:
+        samples = int(duration * self.protocol.sources[topic]['Fs'])
+      if flush:
+        self.pub_flush()
+      if as_array:
+        data = self.stream_read_topic_array(topic, samples, timeaxis=timeaxis, hosttime=hosttime)
+      else:
+        data = self.stream_read_topic_raw(topic, samples, timeaxis=timeaxis, simplify_single=simplify_single, hosttime=hosttime)
+    finally:
+      if autoActivate:
+        self.activation.release([topic])
     return data
 
   def stream_topic_columnnames(self, topic, withName = True):
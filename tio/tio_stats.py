@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# coding: utf-8
+"""
+Twinleaf IO (tio) - Session instrumentation
+Copyright 2026 Twinleaf LLC
+License: MIT
+
+Cumulative per-stage timing, queue high-water marks and drop counters for a
+TIOSession.
+"""
+
+import time
+
+TIO_STAGES = ['read', 'framing', 'decode', 'enqueue', 'dequeue_wait']
+
+class TIOSessionStats(object):
+  def __init__(self):
+    self.reset()
+
+  def reset(self):
+    self.started = time.monotonic()
+    self.seconds = dict.fromkeys(TIO_STAGES, 0.0)
+    self.counts = dict.fromkeys(TIO_STAGES, 0)
+    self.highWater = {}
+    self.dropped = {}
+
+  def add(self, stage, seconds):
+    self.seconds[stage] += seconds
+    self.counts[stage] += 1
+
+  def depth(self, name, depth):
+    if depth > self.highWater.get(name, 0):
+      self.highWater[name] = depth
+
+  def drop(self, name):
+    self.dropped[name] = self.dropped.get(name, 0) + 1
+
+  def report(self):
+    elapsed = time.monotonic() - self.started
+    stages = {}
+    for stage in TIO_STAGES:
+      seconds = self.seconds[stage]
+      count = self.counts[stage]
+      stages[stage] = {
+        'seconds': seconds,
+        'count': count,
+        'mean_us': 1e6*seconds/count if count else 0.0,
+        'fraction': seconds/elapsed if elapsed > 0 else 0.0,
+      }
+    queues = {}
+    for name in set(self.highWater) | set(self.dropped):
+      queues[name] = {
+        'high_water': self.highWater.get(name, 0),
+        'dropped': self.dropped.get(name, 0),
+      }
+    return {'elapsed': elapsed, 'stages': stages, 'queues': queues}
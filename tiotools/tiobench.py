@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+..
+    Copyright: 2026 Twinleaf LLC
+
+Benchmark the ingest and decode pipeline with synthetic packet streams.
+
+Everything runs offline: packets are generated in memory, devices are
+emulated through the router:// transport and logs are written to a
+temporary directory. Results are written as JSON so that releases can be
+compared. Rates count packets (one row each) and samples (one value per
+column per row). Memory is measured in a separate traced run; peak_bytes is
+the tracemalloc peak and result_blocks the number of blocks still held when
+the stage returns its result.
+"""
+
+import tio
+import slip
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import struct
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import queue
+
+# name: (rate in Hz, [(source name, column names, type)])
+LAYOUTS = {
+  'vector-1k':    (1000,  [('vector', ['x','y','z'], tio.FLOAT32_T)]),
+  'vector-10k':   (10000, [('vector', ['x','y','z'], tio.FLOAT32_T)]),
+  'housekeeping': (10,    [(f'hk{i}', [f'c{j}' for j in range(5)], dtype)
+                           for i, dtype in enumerate([tio.FLOAT32_T, tio.UINT16_T, tio.INT32_T, tio.FLOAT32_T,
+                                                      tio.FLOAT64_T, tio.FLOAT32_T, tio.UINT8_T, tio.FLOAT32_T])]),
+}
+
+STAGES = ['slip.decode', 'decode_packet', 'stream_data', 'stream_read_topic', 'stream_read_array', 'tiologparse', 'log_reader', 'startup']
+
+START_TIME = 1700000000 # Fixed epoch so that runs are reproducible
+
+def _packet(payloadType, payload, routing=[]):
+  routingBytes = bytes(routing[::-1])
+  return struct.pack("<BBH", payloadType, len(routingBytes), len(payload)) + payload + routingBytes
+
+def timebase_packet(rate):
+  payload = struct.pack("<HBBQLLLf", 0, 0, 0, START_TIME*1000000000, 1000000, rate, 0, 0.0) + bytes(16)
+  return _packet(tio.TL_PTYPE_TIMEBASE, payload)
+
+def source_packets(sources):
+  packets = []
+  for sourceID, (name, columns, dtype) in enumerate(sources):
+    description = "\t".join([name, ",".join(columns), name.title(), "V"]).encode('utf-8')
+    payload = struct.pack("<HHLLIHHB", sourceID, 0, 1, 0, 0, 0, len(columns), dtype) + description
+    packets += [_packet(tio.TL_PTYPE_SOURCE, payload)]
+  return packets
+
+def stream_packet(sources):
+  payload = struct.pack("<HHLLQHH", 0, 0, 1, 0, 0, len(sources), 0)
+  for sourceID in range(len(sources)):
+    payload += struct.pack("<HHLL", sourceID, 0, 1, 0)
+  return _packet(tio.TL_PTYPE_STREAM, payload)
+
+def metadata_packets(layout):
+  rate, sources = LAYOUTS[layout]
+  return [timebase_packet(rate)] + source_packets(sources) + [stream_packet(sources)]
+
+def data_packets(layout, count, start=0):
+  """Synthetic STREAM0 packets with a slowly varying value in every column"""
+  rate, sources = LAYOUTS[layout]
+  rowPack = "<I" + "".join(tio.TYPES[dtype][0]*len(columns) for name, columns, dtype in sources)
+  rowStruct = struct.Struct(rowPack)
+  integer = [dtype not in (tio.FLOAT32_T, tio.FLOAT64_T) for name, columns, dtype in sources for column in columns]
+  packets = []
+  for sampleNumber in range(start, start+count):
+    row = [ (sampleNumber+i) % 200 if isint else 0.001*(sampleNumber+i) for i, isint in enumerate(integer) ]
+    packets += [_packet(tio.TL_PTYPE_STREAM0, rowStruct.pack(sampleNumber, *row))]
+  return packets
+
+def layout_columns(layout):
+  rate, sources = LAYOUTS[layout]
+  return sum(len(columns) for name, columns, dtype in sources)
+
+def stage_columns(stage, layout):
+  """Values per row that a stage reads: the channels of the first source for the topic reads,
+  every column otherwise"""
+  rate, sources = LAYOUTS[layout]
+  if stage in ['stream_read_topic', 'stream_read_array']:
+    return len(sources[0][1])
+  return layout_columns(layout)
+
+def protocol_for(layout):
+  protocol = tio.TIOProtocol()
+  for packet in metadata_packets(layout):
+    protocol.decode_packet(packet)
+  return protocol
+
+class SyntheticDevice(object):
+  """Emulates a device behind a router:// session.
+
+  It answers the RPCs used while specializing a session and can publish
+  STREAM0 packets into the session's receive queue from a feeder thread.
+  """
+
+  def __init__(self, layout, rpcCount=200):
+    self.layout = layout
+    self.session = None
+    self.desc = f"Synthetic {layout} benchmark device"
+    rate, sources = LAYOUTS[layout]
+    self.rpcs = [('dev.name', tio.STRING_T, 0x83), ('dev.desc', tio.STRING_T, 0x82),
+                 ('data.rate', tio.FLOAT32_T, 0x87), ('data.send_all', tio.NONE_T, 0x00)]
+    for name, columns, dtype in sources:
+      self.rpcs += [(name+'.data.active', tio.UINT8_T, 0x83), (name+'.data.decimation', tio.UINT32_T, 0x87)]
+    for i in range(rpcCount - len(self.rpcs)):
+      self.rpcs += [(f'sys.group{i//10}.param{i%10}', tio.FLOAT32_T, 0x87)]
+
+  def attach(self, session):
+    self.session = session
+
+  def reply(self, topic, payload):
+    if topic == 'dev.desc':
+      return self.desc.encode('utf-8')
+    elif topic == 'dev.name':
+      return b'BENCH'
+    elif topic == 'rpc.list':
+      return struct.pack("<H", len(self.rpcs))
+    elif topic == 'rpc.listinfo':
+      name, dtype, flags = self.rpcs[struct.unpack("<H", payload)[0]]
+      return bytes([dtype, flags]) + name.encode('utf-8')
+    elif topic == 'data.send_all':
+      for packet in metadata_packets(self.layout):
+        self.session.recv_queue.put(packet)
+    return b''
+
+  def send(self, packet):
+    """send_router callback; everything other than RPC requests is ignored"""
+    if self.session is None or packet[0] != tio.TL_PTYPE_RPC_REQ:
+      return
+    payloadSize = struct.unpack("<H", bytes(packet[2:4]))[0]
+    requestID, methodID = struct.unpack("<HH", bytes(packet[4:8]))
+    topicLength = methodID & 0x7FFF
+    topic = bytes(packet[8:8+topicLength]).decode('utf-8')
+    reply = self.reply(topic, bytes(packet[8+topicLength:4+payloadSize]))
+    self.session.recv_queue.put(_packet(tio.TL_PTYPE_RPC_REP, struct.pack("<H", requestID) + reply))
+
+  def publish(self, packets, stop):
+    """Feed packets (cycling) until stop is set"""
+    while not stop.is_set():
+      for packet in packets:
+        try:
+          self.session.recv_queue.put(packet, timeout=0.1)
+        except queue.Full:
+          pass
+        if stop.is_set():
+          break
+
+def device_for(layout, rpcCount=200, stateCache=False):
+  import tldevice
+  fake = SyntheticDevice(layout, rpcCount=rpcCount)
+  dev = tldevice.Device(url="router://bench/", send_router=fake.send, specialize=False, connectingMessage=False)
+  fake.attach(dev._tio)
+  dev._tio.specialize(stateCache=stateCache, connectingMessage=False)
+  dev._specialize()
+  return dev, fake
+
+# Stages prepare their input and return run(), which performs the measured work and returns its result
+
+def stage_slip_decode(layout, count):
+  frames = [ bytes(slip.encode(bytearray(packet)))[1:-1] for packet in data_packets(layout, count) ]
+  def run():
+    return [ slip.decode(frame) for frame in frames ]
+  return run
+
+def stage_decode_packet(layout, count):
+  protocol = protocol_for(layout)
+  packets = data_packets(layout, count)
+  def run():
+    return [ protocol.decode_packet(packet) for packet in packets ]
+  return run
+
+def stage_stream_data(layout, count):
+  protocol = protocol_for(layout)
+  parsed = [ protocol.decode_packet(packet) for packet in data_packets(layout, count) ]
+  def run():
+    return [ protocol.stream_data(packet, timeaxis=True) for packet in parsed ]
+  return run
+
+def stage_stream_read_topic(layout, count, as_array=False):
+  dev, fake = device_for(layout)
+  rate, sources = LAYOUTS[layout]
+  topic = sources[0][0]
+  packets = data_packets(layout, min(count, 100000))
+  def run():
+    stop = threading.Event()
+    feeder = threading.Thread(target=fake.publish, args=(packets, stop), daemon=True)
+    feeder.start()
+    try:
+      return dev._tio.stream_read_topic(topic, samples=count, as_array=as_array)
+    finally:
+      stop.set()
+      feeder.join()
+  return run
+
+def stage_stream_read_array(layout, count):
+  return stage_stream_read_topic(layout, count, as_array=True)
+
+def write_log(layout, count, directory):
+  filename = os.path.join(directory, f"{layout}.tio")
+  with open(filename, 'wb') as f:
+    for packet in metadata_packets(layout) + data_packets(layout, count):
+      f.write(packet)
+  return filename
+
+# A stage whose run() has a cleanup attribute has it called by measure() once it is done
+
+def stage_tiologparse(layout, count):
+  from tiotools import tiologparse
+  directory = tempfile.TemporaryDirectory(prefix='tiobench-')
+  filename = write_log(layout, count, directory.name)
+  def run():
+    argv = sys.argv
+    sys.argv = ['tiologparse', filename]
+    try:
+      with contextlib.redirect_stdout(io.StringIO()):
+        tiologparse.main()
+    finally:
+      sys.argv = argv
+    return os.path.getsize(filename[:-4]+".tsv")
+  run.cleanup = directory.cleanup
+  return run
+
+def stage_log_reader(layout, count):
+  from tio.tio_logreader import read_log
+  directory = tempfile.TemporaryDirectory(prefix='tiobench-')
+  filename = write_log(layout, count, directory.name)
+  def run():
+    return read_log(filename)
+  run.cleanup = directory.cleanup
+  return run
+
+def stage_startup(layout, count):
+  def run():
+    dev, fake = device_for(layout, stateCache=False)
+    return dev
+  return run
+
+STAGE_FUNCTIONS = {
+  'slip.decode': stage_slip_decode,
+  'decode_packet': stage_decode_packet,
+  'stream_data': stage_stream_data,
+  'stream_read_topic': stage_stream_read_topic,
+  'stream_read_array': stage_stream_read_array,
+  'tiologparse': stage_tiologparse,
+  'log_reader': stage_log_reader,
+  'startup': stage_startup,
+}
+
+def measure(stage, layout, count, repeat=3):
+  run = STAGE_FUNCTIONS[stage](layout, count)
+  try:
+    seconds = float('inf')
+    for i in range(repeat):
+      start = time.perf_counter()
+      result = run()
+      seconds = min(seconds, time.perf_counter() - start)
+      del result
+
+    tracemalloc.start()
+    result = run()
+    current, peak = tracemalloc.get_traced_memory()
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+    tracemalloc.stop()
+    del result
+  finally:
+    if hasattr(run, 'cleanup'):
+      run.cleanup()
+
+  packets = 1 if stage == 'startup' else count
+  samples = packets * stage_columns(stage, layout)
+  return {
+    'stage': stage,
+    'layout': layout,
+    'packets': packets,
+    'samples': samples,
+    'seconds': seconds,
+    'packets_per_s': packets/seconds if seconds > 0 else None,
+    'samples_per_s': samples/seconds if seconds > 0 else None,
+    'peak_bytes': peak,
+    'result_blocks': blocks,
+  }
+
+def version():
+  try:
+    from importlib import metadata
+    return metadata.version('tio')
+  except Exception:
+    return None
+
+def main():
+  parser = argparse.ArgumentParser(prog='tiobench',
+                                   description='Benchmark the TIO ingest and decode pipeline offline.')
+  parser.add_argument('--stage',
+                      action='append',
+                      choices=STAGES,
+                      help='Stage to benchmark (default: all)')
+  parser.add_argument('--layout',
+                      action='append',
+                      choices=list(LAYOUTS.keys()),
+                      help='Synthetic stream layout (default: all)')
+  parser.add_argument('--packets',
+                      type=int,
+                      default=20000,
+                      help='Packets per stage')
+  parser.add_argument('--repeat',
+                      type=int,
+                      default=3,
+                      help='Timed repetitions; the best is reported')
+  parser.add_argument('--json',
+                      type=str,
+                      default=None,
+                      help='Write results to this file ("-" for stdout)')
+  args = parser.parse_args()
+
+  results = []
+  for layout in args.layout or list(LAYOUTS.keys()):
+    for stage in args.stage or STAGES:
+      result = measure(stage, layout, args.packets, repeat=args.repeat)
+      results += [result]
+      print(f"{stage:18s} {layout:13s} {result['packets_per_s']:12.0f} packets/s {result['samples_per_s']:12.0f} samples/s "
+            f"{result['peak_bytes']/1e6:9.2f} MB peak {result['result_blocks']:9d} blocks", file=sys.stderr)
+
+  document = {
+    'tio': version(),
+    'python': platform.python_version(),
+    'platform': platform.platform(),
+    'machine': platform.machine(),
+    'created': time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    'packets': args.packets,
+    'results': results,
+  }
+  if args.json == '-':
+    json.dump(document, sys.stdout, indent=2)
+    print()
+  elif args.json:
+    with open(args.json, 'w') as f:
+      json.dump(document, f, indent=2)
+
+if __name__ == "__main__":
+  main()
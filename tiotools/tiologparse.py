@@ -6,17 +6,460 @@
 
 Parse native format logged data.
 
-Assumes no SLIP encoding.
+Assumes no SLIP encoding. A first pass reads only the metadata and the
+sample numbers to choose the routes to merge; a second pass decodes every
+row once and writes the merged TSV directly.
+
+With --follow, the second pass does not stop at the end of a file that is
+still being recorded: it waits for new bytes (leaving a partly written
+packet for later), keeps each route's decoder, and appends the new rows to
+the output as they arrive. With --end as well, it stops once every route
+has passed the end time.
 
 """
 
 import tio
+import tio.tio_logzip
+import tiotools.tiotsv
 import argparse
+import array
+import collections
+import concurrent.futures
+import copy
 import hexdump
+import itertools
 import logging
 import struct
-import time
+import tempfile
 import os
+from time import sleep
+
+def output_name(filename):
+  if filename[-4:]==".tio":
+    return filename[:-4]+".tsv"
+  return filename+".tsv"
+
+def route_name(routingBytes, filename, prefix=False):
+  """Routing string such as /0/1/; with several files it is prefixed with the file name"""
+  routingString = "/"
+  if len(routingBytes) > 0:
+    routingString += "/".join(map(str,list(routingBytes)))+"/"
+  if prefix:
+    routingString = os.path.basename(filename[:-4]) + routingString
+  return routingString
+
+def new_protocol(routingBytes, states, verbose=False):
+  """Protocol for a route, starting from its state at an index checkpoint if there is one"""
+  protocol = tio.TIOProtocol(verbose = verbose, routing=list(routingBytes))
+  state = states.get(route_name(routingBytes, ''))
+  if state is not None:
+    protocol.stateImport(copy.deepcopy(state))
+  return protocol
+
+def read_packets(f, limit=None, start=0, stop=None, follow=None):
+  """Yields the type, routing bytes (upstream host first) and bytes of each packet
+  between the byte offsets start and stop.
+  With follow (a poll interval in seconds), the end of the file is waited on instead of
+  ending the packets: None is yielded each time there is nothing new, so that the caller
+  can flush its output, and a partly written packet is read again once it is complete."""
+  count = 0
+  f.seek(start)
+  position = start
+  while (limit is None or count < limit) and (stop is None or position < stop):
+    header = bytes(f.read(4))
+    if len(header) < 4:
+      if follow is None:
+        break
+      f.seek(position)
+      yield None
+      sleep(follow)
+      continue
+    payloadType, routingSize, payloadSize = struct.unpack("<BBH", header)
+    if payloadSize > tio.TL_PACKET_MAX_SIZE or routingSize > tio.TL_PACKET_MAX_ROUTING_SIZE:
+      raise ValueError(f"Packet too big at byte {f.tell()-4} of {f.name}")
+    payload = bytes(f.read(payloadSize+routingSize))
+    if len(payload) < payloadSize+routingSize and follow is not None:
+      f.seek(position)
+      yield None
+      sleep(follow)
+      continue
+    routingBytes = payload[len(payload)-routingSize:][::-1]
+    count += 1
+    position += 4+payloadSize+routingSize
+    yield payloadType, routingBytes, header+payload
+
+def scan(filenames, limit=None, verbose=False, spans={}):
+  """Reads the metadata of every route without decoding the data rows; spans optionally
+  gives each file's byte range and starting states as (start, stop, states).
+  Returns the routes in order of appearance, per-route columns, first and final times and
+  data rates, and the number of packets to take from each file."""
+  routes = []
+  sensors = {}
+  columns = {}
+  firsttimes = {}
+  finaltimes = {}
+  datarates = {}
+  filelimits = {}
+  lastSamples = {} # Sample number of the latest row, converted to a time when the metadata changes
+  packets = 0
+
+  def finish(routingString):
+    if routingString in lastSamples:
+      finaltimes[routingString] = sensors[routingString].stream_time({'sampleNumber': lastSamples.pop(routingString)})
+
+  for filename in filenames:
+    filelimits[filename] = 0
+    names = {}
+    start, stop, states = spans.get(filename, (0, None, {}))
+    # The whole file for a plain log, or one chunk at a time for a compressed one
+    for base, mm in tio.tio_logzip.log_pieces(filename, start, stop):
+      size = len(mm) if stop is None else min(len(mm), stop - base)
+      offset = max(start - base, 0)
+      while offset + 4 <= size and (limit is None or packets < limit):
+        payloadType, routingSize, payloadSize = struct.unpack_from("<BBH", mm, offset)
+        if payloadSize > tio.TL_PACKET_MAX_SIZE or routingSize > tio.TL_PACKET_MAX_ROUTING_SIZE:
+          raise ValueError(f"Packet too big at byte {base+offset} of {filename}")
+        end = offset + 4 + payloadSize + routingSize
+        if end > size: # Truncated, or still being written
+          break
+        packets += 1
+        filelimits[filename] += 1
+        routingBytes = mm[end-routingSize:end][::-1]
+        routingString = names.get(routingBytes)
+        if routingString is None:
+          routingString = names[routingBytes] = route_name(routingBytes, filename, len(filenames) > 1)
+          if routingString not in routes:
+            routes += [routingString]
+            sensors[routingString] = new_protocol(routingBytes, states, verbose)
+        if payloadType == tio.TL_PTYPE_STREAM0:
+          # Only the sample number is needed
+          if payloadSize-4 in sensors[routingString].rowunpackByBytes:
+            sampleNumber, = struct.unpack_from("<I", mm, offset+4)
+            if routingString not in firsttimes:
+              sensor = sensors[routingString]
+              firsttimes[routingString] = sensor.stream_time({'sampleNumber': sampleNumber})
+              datarates[routingString] = sensor.streams[0]['stream_Fs']
+              columns[routingString] = list(sensor.columns)
+            lastSamples[routingString] = sampleNumber
+        elif payloadType in [tio.TL_PTYPE_TIMEBASE, tio.TL_PTYPE_SOURCE, tio.TL_PTYPE_STREAM]:
+          finish(routingString)
+          sensors[routingString].decode_packet(mm[offset:end])
+        offset = end
+  for routingString in list(lastSamples):
+    finish(routingString)
+  return routes, columns, firsttimes, finaltimes, datarates, filelimits
+
+def format_row(sensor, time, data):
+  """TSV segment of the time and columns, padded with blanks to the full width of the stream"""
+  rowstring = str(time)+"\t"
+  rowstring += "\t".join(map(str,data))
+  # Add blanks to pack out when absent data
+  rowstring += "\t"*(len(sensor.columns)+1-len(data)) # +1 for time column
+  return rowstring[:-1]
+
+def segment_format(sensor, rowPack, precision=None):
+  """%-format string for the TSV segment of a time and a row unpacked with rowPack, like format_row"""
+  import numpy as np
+  dtypes = [ np.dtype(code) for code in rowPack[1:] ]
+  return "%r\t" + tiotools.tiotsv.row_format(dtypes, precision)[:-1] + "\t"*(len(sensor.columns)-len(dtypes))
+
+def rows(filename, prefix=False, limit=None, raw=False, verbose=False, logger=None, span=(0, None, {}), precision=None, follow=None):
+  """Yields the route, time and TSV segment of every data row in one file, decoding each packet once.
+  With follow, waits for the file to grow and yields None whenever there is nothing new."""
+  names = {}
+  formats = {} # (route, rowPack): segment format
+  start, stop, states = span
+  with tio.tio_logzip.open_log_file(filename) as f:
+    for item in read_packets(f, limit, start, stop, follow):
+      if item is None:
+        yield None
+        continue
+      payloadType, routingBytes, packet = item
+      route = names.get(routingBytes)
+      if route is None:
+        route = names[routingBytes] = (route_name(routingBytes, filename, prefix), new_protocol(routingBytes, states, verbose))
+      routingString, sensor = route
+      if payloadType == tio.TL_PTYPE_STREAM0 and not raw:
+        # Rows are unpacked straight from the packet; decode_packet would only wrap them in a dict
+        rowPack = sensor.rowunpackByBytes.get(len(packet)-8-len(routingBytes))
+        if rowPack is not None:
+          time = sensor.stream_time({'sampleNumber': struct.unpack_from("<I", packet, 4)[0]})
+          segmentFormat = formats.get((routingString, rowPack))
+          if segmentFormat is None:
+            segmentFormat = formats[(routingString, rowPack)] = segment_format(sensor, rowPack, precision)
+          yield routingString, time, segmentFormat % ((time,) + struct.unpack_from(rowPack, packet, 8))
+        continue
+      try:
+        parsedPacket = sensor.decode_packet(packet)
+      except Exception as error:
+        logger.debug('Error decoding packet:');
+        hexdump.hexdump(packet)
+        logger.exception(error)
+        continue
+      if raw:
+        print(parsedPacket)
+      if parsedPacket['type'] == tio.TL_PTYPE_STREAM0:
+        row = sensor.stream_data(parsedPacket, timeaxis=True)
+        if row !=[]:
+          time,data = row
+          yield routingString, time, format_row(sensor, time, data)
+
+def header(routingString, columns):
+  return "\t".join(routingString+column for column in ["time"]+columns)
+
+def span_rows(filename, prefix, span, verbose, precision=None):
+  """Worker: all rows of one byte range of a file, packed as the route names, the route and time
+  of each row and the segments joined into one string, which is much cheaper to send back
+  than a tuple per row"""
+  routeNumbers = {}
+  routeIndex = array.array('H')
+  times = array.array('d')
+  segments = []
+  for routingString, time, segment in rows(filename, prefix, None, False, verbose, logging.getLogger('tio-logfile'), span, precision):
+    routeIndex.append(routeNumbers.setdefault(routingString, len(routeNumbers)))
+    times.append(time)
+    segments += [segment]
+  return list(routeNumbers), routeIndex, times, "\n".join(segments)
+
+def unpack_rows(packed):
+  names, routeIndex, times, text = packed
+  if len(times) == 0:
+    return
+  yield from zip((names[i] for i in routeIndex), times, text.split("\n"))
+
+def parallel_rows(executor, filename, prefix, span, verbose, ahead, precision=None):
+  """Rows of a file decoded in chunks between index checkpoints by a process pool, in order.
+  At most `ahead` chunks per file are decoded or waiting at once, which bounds memory."""
+  from tio.tio_logindex import TIOLogIndex
+  start, stop, states = span
+  chunks = iter(TIOLogIndex(filename).chunks(start, stop))
+  pending = collections.deque()
+  for chunk in itertools.islice(chunks, ahead):
+    pending.append(executor.submit(span_rows, filename, prefix, chunk, verbose, precision))
+  while pending:
+    result = pending.popleft().result()
+    for chunk in itertools.islice(chunks, 1):
+      pending.append(executor.submit(span_rows, filename, prefix, chunk, verbose, precision))
+    yield from unpack_rows(result)
+
+def follow_until(followed, end):
+  """Rows of a followed file until every route seen in it has a row after end"""
+  passed = {} # route: whether its latest row is after end
+  for row in followed:
+    if row is not None:
+      routingString, time, segment = row
+      passed[routingString] = time > end
+      if all(passed.values()):
+        return
+    yield row
+
+def file_rows(filename, filenames, filelimits, spans, args, logger, executor=None):
+  span = spans.get(filename, (0, None, {}))
+  if args.follow is not None:
+    followed = rows(filename, len(filenames) > 1, None, args.raw, args.vp, logger, span[:1] + (None,) + span[2:], args.precision, args.follow)
+    return followed if args.end is None else follow_until(followed, args.end)
+  if executor is not None:
+    return parallel_rows(executor, filename, len(filenames) > 1, span, args.vp, 2*args.jobs, args.precision)
+  return rows(filename, len(filenames) > 1, filelimits[filename], args.raw, args.vp, logger, span, args.precision)
+
+def in_range(time, args):
+  return (args.start is None or time >= args.start) and (args.end is None or time <= args.end)
+
+def write_separate(filenames, routes, columns, filelimits, spans, args, logger, executor=None):
+  """Writes one TSV per route in a single pass over each file. Files that are followed
+  are read in turn, moving on whenever one has nothing new."""
+  files = {}
+  cursors = collections.deque((filename, file_rows(filename, filenames, filelimits, spans, args, logger, executor)) for filename in filenames)
+  try:
+    while cursors:
+      filename, cursor = cursors[0]
+      for row in cursor:
+        if row is None:
+          for writer in files.values():
+            writer.flush()
+          break
+        routingString, time, segment = row
+        if not in_range(time, args):
+          continue
+        writer = files.get(routingString)
+        if writer is None:
+          writer = files[routingString] = tiotools.tiotsv.TSVWriter(output_name(filename)[:-4]+f"-{[int(byte) for byte in routingString.split('/')[1:-1]]}.tsv")
+          writer.write_header([header(routingString, columns[routingString])])
+        writer.write_text(segment+"\n")
+      else:
+        cursors.popleft()
+        continue
+      cursors.rotate(-1)
+  finally:
+    for routingString, writer in files.items():
+      print(f"Wrote {routingString} to {writer.file.name}")
+      writer.close()
+
+class RowBuffer(object):
+  """First-in first-out rows (time, segment) of one route that keeps at most maxRows of them in
+  memory. Rows beyond that are spilled to a temporary file and read back in order."""
+
+  def __init__(self, maxRows=100000, spillRows=4096):
+    self.maxRows = maxRows
+    self.spillRows = spillRows # Rows gathered before a write to the spill file
+    self.rows = collections.deque()
+    self.pending = [] # Spilled lines not yet written
+    self.spill = None
+    self.spilled = 0 # Rows in the spill file or pending, not yet read back
+    self.readOffset = 0
+
+  def __len__(self):
+    return len(self.rows) + self.spilled
+
+  def append(self, row):
+    if self.spilled == 0 and len(self.rows) < self.maxRows:
+      self.rows.append(row)
+      return
+    time, segment = row
+    self.pending += [f"{float(time)!r}\t{segment}\n"]
+    self.spilled += 1
+    if len(self.pending) >= self.spillRows:
+      self.write_pending()
+
+  def popleft(self):
+    if not self.rows and self.spilled:
+      self.read_back()
+    return self.rows.popleft()
+
+  def write_pending(self):
+    if self.spill is None:
+      self.spill = tempfile.TemporaryFile()
+    self.spill.seek(0, os.SEEK_END)
+    self.spill.write("".join(self.pending).encode('utf-8'))
+    self.pending.clear()
+
+  def read_back(self):
+    if self.pending:
+      self.write_pending()
+    self.spill.seek(self.readOffset)
+    count = min(self.spilled, self.maxRows)
+    for line in itertools.islice(self.spill, count):
+      time, segment = line.decode('utf-8')[:-1].split("\t", 1)
+      self.rows.append((float(time), segment))
+    self.spilled -= count
+    self.readOffset = self.spill.tell()
+    if self.spilled == 0: # Start the file over
+      self.spill.seek(0)
+      self.spill.truncate()
+      self.readOffset = 0
+
+  def close(self):
+    if self.spill is not None:
+      self.spill.close()
+
+def merge(filenames, routes, columns, firsttime, finaltime, filelimits, spans, outputfile, args, logger, executor=None, maxBuffered=100000, batch=4096):
+  """Writes one line per row index across the routes in a single pass.
+  Every file is read and decoded once by its own cursor. A route that runs ahead of the others
+  in its file, such as one at a higher rate, keeps at most maxBuffered rows in memory and
+  spills the rest to a temporary file. As before, a line stops at the first route that has no
+  more rows."""
+  cursors = {}
+  for filename in filenames:
+    cursors[filename] = file_rows(filename, filenames, filelimits, spans, args, logger, executor)
+  routeFile = {}
+  for filename in filenames:
+    for route in routes:
+      if len(filenames) == 1 or route.startswith(os.path.basename(filename[:-4])+"/"):
+        routeFile[route] = filename
+  buffers = { route: RowBuffer(maxBuffered) for route in routes }
+  finished = set()
+  writer = tiotools.tiotsv.TSVWriter(outputfile)
+  lines = [] # Written a batch at a time, and whenever a followed file has nothing new
+
+  def write_lines():
+    writer.write_text("".join(lines))
+    lines.clear()
+
+  def fill(route):
+    """Reads the route's file until the route has a row after the first time, or the file ends"""
+    filename = routeFile[route]
+    while not buffers[route] and filename not in finished:
+      try:
+        row = next(cursors[filename])
+      except StopIteration:
+        finished.add(filename)
+        break
+      if row is None: # Waiting for a followed file to grow
+        write_lines()
+        writer.flush()
+        continue
+      routingString, time, segment = row
+      if routingString not in buffers or time <= firsttime or not in_range(time, args):
+        continue
+      buffers[routingString].append((time, segment))
+    return bool(buffers[route])
+
+  def merged_lines():
+    while True:
+      segments = []
+      for route in routes:
+        if not fill(route):
+          break
+        time, segment = buffers[route].popleft()
+        segments += [segment]
+      if not segments:
+        return
+      if time > finaltime and not args.ragged:
+        return
+      yield "\t".join(segments)+"\n"
+
+  try:
+    writer.write_header([header(route, columns[route]) for route in routes])
+    for line in merged_lines():
+      lines.append(line)
+      if len(lines) >= batch:
+        write_lines()
+  finally:
+    write_lines()
+    writer.close()
+    for buffer in buffers.values():
+      buffer.close()
+
+def resample_merge(filenames, routes, columns, firsttimes, finaltimes, outputfile, args, blockRows=1<<16):
+  """Writes every route on one grid of times at the --resample rate; see tio.tio_resample"""
+  from tio.tio_resample import resample_logs
+  import numpy as np
+  routes = sorted(routes)
+  rate = args.resample
+  if args.ragged:
+    start, end = min(firsttimes[route] for route in routes), max(finaltimes[route] for route in routes)
+  else:
+    start, end = max(firsttimes[route] for route in routes), min(finaltimes[route] for route in routes)
+  if args.start is not None:
+    start = max(start, args.start)
+  if args.end is not None:
+    end = min(end, args.end)
+  start = np.ceil(start * rate) / rate # Grid times at whole multiples of the period
+  print(f"Resampling data streams from routes ({args.method} at {rate} Hz):")
+  [print(f"- {route} starting {firsttimes[route]}, ending {finaltimes[route]}") for route in routes]
+  print(f"Writing log from {start} s to {end} s.")
+  names = [ route+column for route in routes for column in columns[route] ]
+  with tiotools.tiotsv.TSVWriter(outputfile, precision=[None] + [args.precision]*len(names)) as writer: # Full precision times
+    writer.write_header(["time"] + names)
+    for times, block in resample_logs(filenames, { route: columns[route] for route in routes }, rate, start, end, args.method, len(filenames) > 1):
+      writer.write_block([times] + [ values for route in routes for values in block[route] ])
+
+def export(filenames, args):
+  """Writes each log's routes as native-type columns; see tio.tio_logexport"""
+  from tio.tio_logexport import export_log, require
+  try:
+    require(args.format)
+  except ImportError as error:
+    print(error)
+    return
+  extensions = {'npy': '', 'parquet': '', 'npz': '.npz', 'hdf5': '.h5'}
+  for filename in filenames:
+    base = filename[:-4] if filename[-4:]==".tio" else filename
+    output = args.output if args.output is not None and len(filenames) == 1 else base + extensions[args.format]
+    manifest = export_log(filename, output, args.format, args.start, args.end)
+    print(f"Wrote {filename} to {output}:")
+    for group in manifest['groups']:
+      print(f"- {group['route']} ({group['name']}): {group['rows']} rows of {len(group['columns'])} columns at {group['Fs']} Hz")
 
 def main():
   
@@ -44,6 +487,43 @@ def main():
                       action="store",
                       default=None,
                       help='Limit number of packets to process')
+  parser.add_argument('--start', 
+                      type=float,
+                      default=None,
+                      help='Time (as in the time column) to start from; uses a sidecar index')
+  parser.add_argument('--end', 
+                      type=float,
+                      default=None,
+                      help='Time (as in the time column) to stop at; uses a sidecar index')
+  parser.add_argument('--jobs', '-j',
+                      type=int,
+                      default=1,
+                      help='Worker processes; files and index chunks of each file are decoded in parallel')
+  parser.add_argument('--format', 
+                      choices=['tsv', 'npy', 'npz', 'parquet', 'hdf5'],
+                      default='tsv',
+                      help='Output format; the binary formats write every route in native types with a JSON manifest')
+  parser.add_argument('--output', 
+                      default=None,
+                      help='Output file or directory for the binary formats (default: named after the log)')
+  parser.add_argument('--precision', 
+                      type=int,
+                      default=None,
+                      help='Significant digits of the data columns in TSV output (default: full precision)')
+  parser.add_argument('--follow', 
+                      type=float,
+                      nargs='?',
+                      const=1.0,
+                      default=None,
+                      help='Keep reading logs that are still being recorded, checking for new data every FOLLOW seconds (default 1); stop with Ctrl-C or --end')
+  parser.add_argument('--resample', 
+                      type=float,
+                      default=None,
+                      help='Merge every route (whatever its rate) onto one time base at this rate in Hz')
+  parser.add_argument('--method', 
+                      choices=['hold', 'linear', 'mean'],
+                      default='linear',
+                      help='How --resample computes each value: latest sample, linear interpolation or block average')
   parser.add_argument('--sth', 
                       type=float,
                       default=10,
@@ -58,6 +538,8 @@ def main():
                       help='Do not terminate the parsed log at the shortest data stream.')
   
   args = parser.parse_args()
+  if args.resample is not None and args.follow is not None:
+    parser.error("--resample cannot be used with --follow")
   
   logLevel = logging.ERROR
   if args.v:
@@ -65,111 +547,56 @@ def main():
   logging.basicConfig(level=logLevel)
   logger = logging.getLogger('tio-logfile')
   
-  # First read through and generate individual files for each stream.
-  routes=[]
-  sensors={}
-  tempfilenames = {}
-  tempfiles = {}
-  firsttimes = {}
-  finaltimes = {}
-  datarates = {}
-  lines = 0
-  
   filenames = args.logfile
-  for filename in filenames:
-    if filename[-4:]==".tio":
-      outputfile = filename[:-4]+".tsv"
-    else:
-      outputfile = filename+".tsv"
-    with open(filename,'rb') as f:
-      while True:
-        lines += 1
-        if args.lines is not None:
-          if lines > int(args.lines):
-            break
-        header = bytes(f.read(4))
-        if len(header) < 4:
-          break
-    
-        headerFields = struct.unpack("<BBH", header )
-        payloadType, routingSize, payloadSize = headerFields
-        if payloadSize > tio.TL_PACKET_MAX_SIZE or routingSize > tio.TL_PACKET_MAX_ROUTING_SIZE:
-          logger.error('Packet too big');
-          raise
-        else:
-          payload = bytes(f.read(payloadSize+routingSize))
-          packet = header+payload
-          routingBytes = b''
-          routingString = "/"
-          if routingSize > 0:
-            routingBytes = payload[-routingSize:]
-            routingBytes = routingBytes[::-1] # Reverse order so that the upstream host comes first
-            routingString += "/".join(map(str,list(routingBytes)))+"/"
-            # If there's more than one file, prefix the routing name with the filename
-          if len(filenames) > 1:
-            routingString = os.path.basename(filename[:-4]) + routingString
-          if routingString not in routes:
-            routes += [routingString]
-            sensors[routingString] = tio.TIOProtocol(verbose = args.vp, routing=list(routingBytes))
-            tempfilenames[routingString] = outputfile[:-4]+f"-{list(routingBytes)}.tsv"
-            tempfiles[routingString] = open(tempfilenames[routingString], 'w')
-    
-          try:
-            parsedPacket = sensors[routingString].decode_packet(packet)
-          except Exception as error:
-            logger.debug('Error decoding packet:');
-            hexdump.hexdump(packet)
-            logger.exception(error)
-          
-          if args.raw:
-            print(parsedPacket)
-    
-          if parsedPacket['type'] == tio.TL_PTYPE_STREAM0:
-            row = sensors[routingString].stream_data(parsedPacket, timeaxis=True)
-            if row !=[]:
-              time,data = row
-              if routingString not in firsttimes.keys():
-                # This is the first row
-                firsttimes[routingString] = time
-                datarates[routingString] = sensors[routingString].streams[0]['stream_Fs'] 
-                # Write out columns
-                headerString = ""
-                if len(sensors[routingString].columns)>0:
-                  for column in ["time"]+sensors[routingString].columns:
-                    headerString += routingString+column+"\t"
-                  tempfiles[routingString].write(headerString[:-1]+"\n")
-              # Note the time (will be the final time after the end)
-              finaltimes[routingString] = time
-              rowsamples = len(data)
-              rowstring = str(time)+"\t"
-              rowstring += "\t".join(map(str,data))
-              # Add blanks to pack out when absent data
-              rowstring += "\t"*(len(sensors[routingString].columns)+1-rowsamples) # +1 for time column
-              rowstring = rowstring[:-1]+"\n"
-              tempfiles[routingString].write(rowstring)
-  
-  for fd in tempfiles.values():
-    fd.close()
+  limit = int(args.lines) if args.lines is not None else None
+
+  if args.format != 'tsv':
+    export(filenames, args)
+    return
+  spans = {}
+  if args.start is not None or args.end is not None:
+    # Seek to the time range through each log's sidecar index (built on first use)
+    from tio.tio_logindex import TIOLogIndex
+    for filename in filenames:
+      spans[filename] = TIOLogIndex(filename).span(args.start, args.end)
+  routes, columns, firsttimes, finaltimes, datarates, filelimits = scan(filenames, limit, args.vp, spans)
+  while args.follow is not None and len(firsttimes) == 0:
+    # Nothing recorded yet; the routes to follow are those with data at the start
+    sleep(args.follow)
+    routes, columns, firsttimes, finaltimes, datarates, filelimits = scan(filenames, limit, args.vp, spans)
+  outputfile = output_name(filenames[-1])
   
   print(f"Found data streams from routes:")
   [print(f"- {route}") for route in routes]
   
+  executor = None
+  if args.jobs > 1:
+    if args.raw or limit is not None or args.follow is not None:
+      print("NB: Decoding serially because of --raw, --lines or --follow.")
+    else:
+      executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs)
+
+  try:
+    write_output(filenames, routes, columns, firsttimes, finaltimes, datarates, filelimits, spans, outputfile, args, logger, executor)
+  except KeyboardInterrupt:
+    if args.follow is None:
+      raise
+    print("Stopped following.")
+  finally:
+    if executor is not None:
+      executor.shutdown()
+
+def write_output(filenames, routes, columns, firsttimes, finaltimes, datarates, filelimits, spans, outputfile, args, logger, executor=None):
   if args.separate:
-    exit
-    stop
+    write_separate(filenames, routes, columns, filelimits, spans, args, logger, executor)
+    return
 
   # Remove routes that don't have valid start times
-  for idx,route in enumerate(list(routes)): # copy the routes
+  for route in list(routes): # copy the routes
     if route not in firsttimes.keys():
       print(f"NB: Not merging from route {route} because the timing metadata is missing.")
-      tempfiles.pop(route)
-      tempfilenames.pop(route)
-      sensors.pop(route)
-      datarates.pop(route)
-      finaltimes.pop(route)
       routes.remove(route)
 
-  
   try:
     firsttime = max(firsttimes.values())
   except:
@@ -184,33 +611,18 @@ def main():
     for route, thisfirsttime in firsttimes.items():
       if thisfirsttime < 1000000000:
         print(f"NB: Not merging from route {route} because its starting time {thisfirsttime} s does not appear to have a global timestamp.")
-        tempfiles.pop(route)
-        tempfilenames.pop(route)
-        sensors.pop(route)
-        # firsttimes.pop(route)
-        finaltimes.pop(route)
-        datarates.pop(route)
         routes.remove(route)
-      # else:
-        # print(f"Found metadata for route {route} with starting time {thisfirsttime}.")
-  
-  # discardedTime = max(firsttimes.values()) - min(firsttimes.values())
-  # if discardedTime > 0:
-  #   print(f"NB: Discarding up to the first {discardedTime} seconds of data to merge the logs")
 
-  # print(datarates)
+  if args.resample is not None:
+    resample_merge(filenames, routes, columns, firsttimes, finaltimes, outputfile, args)
+    return
 
   # If there are streams with widely varying data rates, then set aside the streams with low rates
   slowerThreshold = args.sth
-  dataratemax = max(datarates.values())
-  for route, datarate in datarates.items():
-    if datarate < dataratemax / slowerThreshold:
-      print(f"NB: Not merging from route {route} because its data rate {datarate} Hz < dominant rate {dataratemax} Hz / {slowerThreshold}." )
-      tempfiles.pop(route)
-      tempfilenames.pop(route)
-      sensors.pop(route)
-      firsttimes.pop(route)
-      finaltimes.pop(route)
+  dataratemax = max(datarates[route] for route in routes)
+  for route in list(routes):
+    if datarates[route] < dataratemax / slowerThreshold:
+      print(f"NB: Not merging from route {route} because its data rate {datarates[route]} Hz < dominant rate {dataratemax} Hz / {slowerThreshold}." )
       routes.remove(route)
 
   routes.sort()
@@ -218,51 +630,15 @@ def main():
   print(f"Merging data streams from routes:")
   [print(f"- {route} starting {firsttimes[route]}, ending {finaltimes[route]}") for route in routes]
   
-  finaltime = min(finaltimes.values())
-  if not args.ragged:
+  finaltime = min(finaltimes[route] for route in routes)
+  if args.follow is not None:
+    finaltime = float('inf')
+    until = "Ctrl-C to stop" if args.end is None else f"until {args.end} s"
+    print(f"Following; new rows are appended to {outputfile} as they are recorded ({until}).")
+  elif not args.ragged:
     print(f"Stopping log at time {finaltime} s (use --ragged to suppress).")
 
-  # Now write out combined file
-  tempfilelist = []
-  for routingString in routes:
-    fd = open(tempfilenames[routingString], 'r')
-    tempfilelist += [ fd ]
-  
-  with open(outputfile,'w') as fout:
-    headerString=""
-    for fd in tempfilelist:
-      headerString += fd.readline()[:-1] + "\t"
-    headerString = headerString[:-1]+"\n"
-    fout.write(headerString)
-  
-    while True:
-      line = ""
-      for fd in tempfilelist:
-        linesegment = fd.readline()
-        try:
-          time = float(linesegment.split('\t')[0])
-        except:
-          break
-        while time <= firsttime:
-          linesegment = fd.readline()
-          try:
-            time = float(linesegment.split('\t')[0])
-          except:
-            raise IndexError("Could not find time alignment among streams")
-        if linesegment != "":
-          line += linesegment[:-1]+"\t"
-      if line == "":
-        break
-      if time > finaltime and not args.ragged:
-        break
-      line = line[:-1]+"\n"
-      fout.write(line)
-  
-  # close and delete temporary files
-  for fd in tempfilelist:
-    fd.close()
-  for tempfile in tempfilenames.values():
-    os.remove(tempfile)
+  merge(filenames, routes, columns, firsttime, finaltime, filelimits, spans, outputfile, args, logger, executor)
   
 if __name__ == "__main__":
   main()
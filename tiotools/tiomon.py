@@ -12,22 +12,28 @@ Python Library Dependencies:
 """
 
 import blessings
-import math
+import numpy as np
+import queue
 import time
 import signal
 import sys
+import threading
 
 class TermPlotter(object):
-  """This is a helper/wrapper class to manage CLI animations and updates"""
+  """This is a helper/wrapper class to manage CLI animations and updates.
+  It is fed blocks of samples and draws each column once per update."""
 
   def __init__(self, columns, simple = False):
     self.columns = columns
     self.simple = simple
     self.term = blessings.Terminal()
     sys.stdout.write(self.term.move_up) # cover up connecting message from tio...
-    self.ranges = [(0,0)] * len(self.columns)
-    self.counts = [0] * len(columns)
-    self.startTimes = [None] * len(self.columns)
+    self.rmin = np.full(len(self.columns), np.inf)
+    self.rmax = np.full(len(self.columns), -np.inf)
+    self.last = np.full(len(self.columns), np.nan)
+    self.counts = np.zeros(len(self.columns), dtype=np.int64)
+    self.startTime = None
+    self.frames = 0
     self.nameWidth = 0
     for column in self.columns:
       sys.stdout.write(f"\r\n{column:10s}: ...")
@@ -35,59 +41,90 @@ class TermPlotter(object):
     print(self.term.move_up*(len(self.columns)+1))
     self.done = False
 
-  def bar(self, value, column, width=50):
+  def bars(self, low, high, width=50):
     """Internal helper for animating scalar values in ASCII.
-    Returns up to 'width' bars, plus two characters (surrounding square
-    brackets)"""
-    (rmin, rmax) = self.ranges[column]
-    if not math.isfinite(value) or not math.isfinite(rmin) or not math.isfinite(rmax):
-        return "[%s]" % ("x" * width)
-    if value > rmax or value < rmin:
-        rmax = max(value, rmax)
-        rmin = min(value, rmin)
-        self.ranges[column] = (rmin, rmax)
-    scale = rmax - rmin
-    if scale != 0:
-      fraction = (value - rmin) / (rmax - rmin)
+    Returns one string per column with 'width' characters plus two surrounding
+    square brackets: '#' up to the last value and '-' over the block's min/max."""
+    scale = self.rmax - self.rmin
+    with np.errstate(invalid='ignore', divide='ignore'):
+      position = lambda value: np.nan_to_num(np.clip((value - self.rmin) / np.where(scale != 0, scale, np.inf), 0, 1) * width).astype(int)
+      filled, start, stop = position(self.last), position(low), position(high)
+    valid = np.isfinite(self.last) & np.isfinite(self.rmin) & np.isfinite(self.rmax)
+    strings = []
+    for i in range(len(self.columns)):
+      if not valid[i]:
+        strings += ["[%s]" % ("x" * width)]
+        continue
+      envelope = max(0, stop[i] - max(filled[i], start[i]))
+      gap = max(0, start[i] - filled[i])
+      strings += ["[%s%s%s%s]" % ("#" * filled[i], " " * gap, "-" * envelope, " " * (width - filled[i] - gap - envelope))]
+    return strings
+
+  def update(self, data, status=""):
+    """Draws a block shaped (columns, samples); a single row is also accepted"""
+    data = np.asarray(data, dtype=np.float64)
+    if data.ndim == 1:
+      data = data[:, np.newaxis]
+    if data.shape[1] == 0: # Nothing arrived this frame
+      data = np.full((len(data), 1), np.nan)
+    now = time.monotonic()
+    if self.startTime is None:
+      self.startTime = now
+    self.frames += 1
+
+    # Per-frame aggregates
+    finite = np.isfinite(data)
+    count = finite.sum(axis=1)
+    present = count > 0
+    with np.errstate(invalid='ignore'):
+      low = np.where(present, np.where(finite, data, np.inf).min(axis=1), np.nan)
+      high = np.where(present, np.where(finite, data, -np.inf).max(axis=1), np.nan)
+    lastIndex = data.shape[1] - 1 - np.argmax(finite[:, ::-1], axis=1)
+    self.last = np.where(present, data[np.arange(len(data)), lastIndex], self.last)
+    self.counts += count
+    self.rmin = np.fmin(self.rmin, low)
+    self.rmax = np.fmax(self.rmax, high)
+
+    lines = []
+    if status:
+      lines += [f"\r\n{self.term.clear_eol}{status}"]
+    if self.simple:
+      for i, column in enumerate(self.columns):
+        lines += [f"\r\n{self.term.clear_eol}{column:{self.nameWidth}s} {self.last[i]:10.4g}"]
     else:
-      fraction = 0
-    bars = int(fraction * width)
-    s = "[%s%s]" % ("#" * bars, " " * (width-bars))
-    return s#[:width+2]
-
-  def update(self, row):
-    for i, datum in enumerate(row):
-      if (self.simple):
-        sys.stdout.write(f"\r\n{self.term.clear_eol}{self.columns[i]:{self.nameWidth}s} {datum:10.4g}")
-      else:
-        # Count data
-        self.counts[i] += 1
-        spinner = "🕛🕐🕑🕒🕓🕔🕕🕖🕗🕘🕙🕚"[self.counts[i] % 12]
-        #spinner = "|/-\\"[self.counts[i] % 4]
-
-        # Measure rate
-        if self.startTimes[i] is None:
-          self.startTimes[i] = time.time()
-          measuredRate = 0
-        else:
-          measuredRate = (self.counts[i]-1)/(time.time()-self.startTimes[i])
-        rateString = "%6.2f Hz"% measuredRate
-
-        barwidth = self.term.width - ( self.nameWidth + 29)
-        barString = self.bar(datum, i, width=barwidth)
-
-        sys.stdout.write(f"\r\n{self.term.clear_eol}{self.columns[i]:{self.nameWidth}s} {datum:10.4g} {spinner} {rateString} {barString}")
-
-    if len(row) == len(self.columns): # Clean up rest of screen
-      sys.stdout.write(self.term.clear_eos)
-    sys.stdout.write(self.term.move_up*(len(row)+1))
+      elapsed = now - self.startTime
+      rates = (self.counts - 1) / elapsed if elapsed > 0 else np.zeros(len(self.columns))
+      barwidth = max(1, (self.term.width or 80) - (self.nameWidth + 29))
+      bars = self.bars(low, high, width=barwidth)
+      for i, column in enumerate(self.columns):
+        spinner = "🕛🕐🕑🕒🕓🕔🕕🕖🕗🕘🕙🕚"[self.counts[i] % 12] if present[i] else " "
+        lines += [f"\r\n{self.term.clear_eol}{column:{self.nameWidth}s} {self.last[i]:10.4g} {spinner} {max(rates[i], 0):6.2f} Hz {bars[i]}"]
+    lines += [self.term.clear_eos, self.term.move_up*len(lines)] # Back up over the lines just drawn
+    sys.stdout.write("".join(lines))
+    sys.stdout.flush()
 
   def finish(self):
     self.done = True
-    print(self.term.move_down*(len(self.columns)))
-
-def monitor(dev, simple=False):
-  ui = TermPlotter(dev._tio.protocol.columns, simple=simple)
+    print(self.term.move_down*(len(self.columns)+1))
+
+def monitor(dev, simple=False, fps=10):
+  """Redraws at most fps times a second with every sample received since the last frame.
+  A reader thread drains the stream queue as packets arrive, so that it does not fill up
+  and drop samples between frames at high data rates."""
+  session = dev._tio
+  ui = TermPlotter(session.protocol.columns, simple=simple)
+  blocks = [] # Arrays shaped (columns, samples) read since the last frame
+  lock = threading.Lock()
+
+  def drain():
+    while True:
+      try:
+        sampleNumbers, data = session.stream_read_available(timeout=1)
+      except queue.Empty:
+        continue
+      with lock:
+        blocks.append(data)
+  threading.Thread(target=drain, daemon=True).start()
 
   def setExit(signal, frame):
     ui.finish()
@@ -95,9 +132,27 @@ def monitor(dev, simple=False):
   signal.signal(signal.SIGINT, setExit)
   signal.signal(signal.SIGTERM, setExit)
 
-  for row in dev.data.iter(): # This should block
-    sys.stdout.write(f"\r\n{dev._tio.name} - {dev._tio.desc}")
-    ui.update(row)
+  period = 1/fps
+  nextFrame = time.monotonic()
+  while True:
+    with lock:
+      frameBlocks = blocks[:]
+      del blocks[:]
+    if list(session.protocol.columns) != list(ui.columns): # Stream layout changed
+      ui.finish()
+      ui = TermPlotter(session.protocol.columns, simple=simple)
+      continue
+    frameBlocks = [block for block in frameBlocks if len(block) == len(ui.columns)]
+    data = np.concatenate(frameBlocks, axis=1) if frameBlocks else np.empty((len(ui.columns), 0))
+    dropped = session.statistics.dropped.get('pub', 0)
+    status = f"{session.name} - {session.desc}  queue {session.pub_queue.qsize()}/{session.pub_queue.maxsize}  dropped {dropped}  {data.shape[1]} samples/frame"
+    ui.update(data, status=status)
+    nextFrame += period
+    delay = nextFrame - time.monotonic()
+    if delay > 0:
+      time.sleep(delay) # Let samples accumulate for the next frame
+    else:
+      nextFrame = time.monotonic()
 
 def main():
   # Running this script will attempt to connect to an attached vector magnetometer
@@ -117,6 +172,10 @@ def main():
                       default=[],
                       type=lambda kv: kv.split(":"), 
                       help='Commands to be run on start; rpc:type:val')
+  parser.add_argument('--fps',
+                      type=float,
+                      default=10,
+                      help='Display refresh rate')
   parser.add_argument('--simple',
                       action="store_true",
                       default=False,
@@ -124,7 +183,7 @@ def main():
   args = parser.parse_args()
 
   device = tldevice.Device(url=args.url, rpcs=args.rpc, connectingMessage=False)
-  monitor(device, simple=args.simple)
+  monitor(device, simple=args.simple, fps=args.fps)
 
 
 if __name__ == "__main__":
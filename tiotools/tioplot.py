@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+..
+    Copyright: 2026 Twinleaf LLC
+
+Live plotting of streamed data with matplotlib.
+
+Samples are kept in preallocated NumPy circular buffers and read in blocks
+from a session subscription, so an animation tick never waits for data.
+Before drawing, each window is reduced to a min/max envelope with one bin
+per horizontal pixel; the plot looks the same as drawing every sample but
+the number of points drawn does not depend on the data rate.
+
+Python Library Dependencies:
+    - matplotlib (for LivePlot only)
+"""
+
+import numpy as np
+import queue
+import warnings
+
+class RingBuffer(object):
+  """Fixed-size buffer of the most recent samples of several channels"""
+
+  def __init__(self, channels, length, dtype=np.float64):
+    self.times = np.empty(length)
+    self.data = np.empty((channels, length), dtype=dtype)
+    self.length = length
+    self.end = 0 # Index after the newest sample
+    self.count = 0
+
+  def __len__(self):
+    return self.count
+
+  def extend(self, times, data):
+    """Appends a block shaped (channels, samples)"""
+    n = len(times)
+    if n >= self.length: # Only the tail survives
+      times, data, n = times[-self.length:], data[:, -self.length:], self.length
+    first = min(n, self.length - self.end)
+    self.times[self.end:self.end+first] = times[:first]
+    self.data[:, self.end:self.end+first] = data[:, :first]
+    self.times[:n-first] = times[first:]
+    self.data[:, :n-first] = data[:, first:]
+    self.end = (self.end + n) % self.length
+    self.count = min(self.count + n, self.length)
+
+  def view(self):
+    """Times and data in order, oldest first"""
+    start = (self.end - self.count) % self.length
+    if start + self.count <= self.length:
+      return self.times[start:start+self.count], self.data[:, start:start+self.count]
+    order = np.r_[start:self.length, 0:self.end]
+    return self.times[order], self.data[:, order]
+
+def envelope(times, data, pixels):
+  """Reduces data shaped (channels, samples) to the min and max of each of `pixels` bins.
+  Returns times and data with two points per bin (min then max), which draw as one
+  vertical stroke per pixel. Data shorter than two points per bin is returned as is."""
+  n = len(times)
+  pixels = int(pixels)
+  if pixels < 1 or n <= 2*pixels:
+    return times, data
+  binSize = n // pixels
+  usable = binSize * pixels
+  skip = n - usable # Drop the oldest samples so that bins stay aligned with the newest
+  blocks = data[:, skip:].reshape(data.shape[0], pixels, binSize)
+  binTimes = times[skip:].reshape(pixels, binSize)
+  outTimes = np.repeat(binTimes[:, binSize//2], 2)
+  outData = np.empty((data.shape[0], 2*pixels), dtype=np.float64)
+  with warnings.catch_warnings(): # Bins that hold only NaN give NaN without an All-NaN warning
+    warnings.simplefilter('ignore', RuntimeWarning)
+    outData[:, 0::2] = np.nanmin(blocks, axis=2)
+    outData[:, 1::2] = np.nanmax(blocks, axis=2)
+  return outTimes, outData
+
+class LivePlot(object):
+  """Scrolling plot of a stream (or one source of it), one axis per column. A source is
+  switched on while the plot is open, as stream_read_topic does, unless autoActivate is False."""
+
+  def __init__(self, session, topic=None, windowLength=10, interval=50, xlabel="Time (s)", ylabels=None, maxsize=10000, autoActivate=True):
+    self.session = session
+    self.topic = topic
+    self.subscription = None
+    self.activated = autoActivate and topic is not None
+    if self.activated:
+      session.activation.acquire([topic])
+    try:
+      self.setup(windowLength, interval, xlabel, ylabels, maxsize)
+    except BaseException:
+      self.close()
+      raise
+
+  def setup(self, windowLength, interval, xlabel, ylabels, maxsize):
+    import matplotlib.pyplot
+    import matplotlib.animation
+    session, topic = self.session, self.topic
+    stream = session.protocol.streams[0]
+    self.Fs = stream['stream_Fs']
+    self.startTime = stream['stream_start_time_sec']
+    if topic is None:
+      columns = list(session.protocol.columns)
+      rate = self.Fs
+    else:
+      columns = session.stream_topic_columnnames(topic, withName=False)
+      rate = session.source_rate(topic)
+    if ylabels is None:
+      ylabels = columns
+    self.buffer = RingBuffer(len(columns), int(windowLength*rate))
+    self.subscription = session.subscribe(maxsize=maxsize)
+
+    self.fig, self.axes = matplotlib.pyplot.subplots(len(columns), 1, sharex=True, squeeze=False, constrained_layout=True)
+    self.axes = self.axes[::-1, 0] # First column at the bottom
+    self.lines = []
+    for ax, ylabel in zip(self.axes, ylabels):
+      line = matplotlib.lines.Line2D([], [], color='black', linewidth=0.5)
+      ax.add_line(line)
+      ax.set_ylabel(ylabel)
+      self.lines += [line]
+    self.axes[0].set_xlabel(xlabel)
+    for ax in self.axes[1:]:
+      matplotlib.pyplot.setp(ax.get_xticklabels(), visible=False)
+
+    self.ani = matplotlib.animation.FuncAnimation(self.fig, self.animate, interval=interval, cache_frame_data=False)
+
+  def read(self):
+    """Moves everything received since the last tick into the buffer"""
+    try:
+      sampleNumbers, data = self.session.subscription_read_array(self.subscription, topic=self.topic, timeout=0)
+    except queue.Empty:
+      return
+    if data.shape[0] == self.buffer.data.shape[0]:
+      self.buffer.extend(sampleNumbers / self.Fs + self.startTime, data)
+
+  def animate(self, *args):
+    self.read()
+    if len(self.buffer) < 2:
+      return self.lines
+    times, data = self.buffer.view()
+    pixels = self.axes[0].get_window_extent().width
+    times, data = envelope(times, data, pixels)
+    for ax, line, channel in zip(self.axes, self.lines, data):
+      line.set_data(times, channel)
+      ax.relim()
+      ax.autoscale_view()
+    self.axes[0].set_xlim(times[0], times[-1])
+    return self.lines
+
+  def show(self):
+    import matplotlib.pyplot
+    try:
+      matplotlib.pyplot.show()
+    finally:
+      self.close()
+
+  def close(self):
+    if self.subscription is not None:
+      self.session.unsubscribe(self.subscription)
+      self.subscription = None
+    if self.activated:
+      self.activated = False
+      self.session.activation.release([self.topic])
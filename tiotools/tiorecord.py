@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+..
+    Copyright: 2026 Twinleaf LLC
+
+Record the packets of a device or of the TCP proxy to native .tio logs.
+
+The source is the proxy (tcp://host:port, 7855 by default) or a serial port
+(/dev/ttyUSB0, COM3 or any pyserial URL). From a serial port the SLIP
+framing is removed and each frame's CRC checked, so the log holds the same
+native packets as a proxy recording. Packets are written through a large
+buffer; --fsync sets when they are forced to disk.
+
+With --rotate-size or --rotate-time the recording is split into numbered
+files (log 000000.tio, log 000001.tio, ...). Each file starts with the
+latest metadata of every route, so that every file decodes on its own.
+
+A status line shows the data and packet rates and the gaps in the sample
+numbers of the streams.
+"""
+
+import argparse
+import os
+import socket
+import struct
+import sys
+import time
+import urllib.parse
+import zlib
+import slip
+import tio
+import tio.tio_logzip
+
+HEADER = struct.Struct("<BBH")
+SAMPLE_NUMBER = struct.Struct("<I")
+STREAM_TYPES = range(tio.TL_PTYPE_STREAM0, 256)
+SLIP_ESC_END = bytes([slip.SLIP_ESC, slip.SLIP_ESC_END])
+SLIP_ESC_ESC = bytes([slip.SLIP_ESC, slip.SLIP_ESC_ESC])
+
+class PacketSplitter(object):
+  """Whole packets from a byte stream that may split them anywhere"""
+
+  def __init__(self):
+    self.buffer = b""
+    self.errors = 0
+
+  def packets(self, data):
+    buffer = self.buffer + data if self.buffer else data
+    packets = []
+    offset = 0
+    while offset + 4 <= len(buffer):
+      payloadType, routingSize, payloadSize = HEADER.unpack_from(buffer, offset)
+      if payloadSize > tio.TL_PACKET_MAX_SIZE or routingSize > tio.TL_PACKET_MAX_ROUTING_SIZE:
+        raise IOError("Lost packet framing in the stream")
+      length = 4 + payloadSize + routingSize
+      if offset + length > len(buffer):
+        break
+      packets += [buffer[offset:offset+length]]
+      offset += length
+    self.buffer = buffer[offset:]
+    return packets
+
+class SLIPFramer(object):
+  """Native packets from a SLIP byte stream. Frames with a bad CRC are dropped and counted."""
+
+  def __init__(self, maxFrame=2*slip.SLIP_MAX_LEN):
+    self.buffer = b""
+    self.maxFrame = maxFrame
+    self.errors = 0
+
+  def packets(self, data):
+    frames = (self.buffer + data).split(slip.SLIP_END_CHAR)
+    self.buffer = frames.pop()
+    if len(self.buffer) > self.maxFrame: # No frame end in sight: noise, or the wrong baud rate
+      self.buffer = b""
+      self.errors += 1
+    packets = []
+    for frame in frames:
+      if len(frame) == 0:
+        continue
+      # Every escape byte starts an escape, so the two replacements cannot interfere
+      frame = frame.replace(SLIP_ESC_END, slip.SLIP_END_CHAR).replace(SLIP_ESC_ESC, bytes([slip.SLIP_ESC]))
+      if len(frame) < 8 or zlib.crc32(frame[:-4]) != SAMPLE_NUMBER.unpack_from(frame, len(frame)-4)[0]:
+        self.errors += 1
+        continue
+      packets += [frame[:-4]]
+    return packets
+
+class TCPSource(object):
+  def __init__(self, host, port, readSize=1<<16, timeout=0.2):
+    self.name = f"tcp://{host}:{port}"
+    self.socket = socket.create_connection((host, port))
+    self.socket.settimeout(timeout)
+    self.readSize = readSize
+    self.framer = PacketSplitter()
+
+  def read(self):
+    """Packets received so far, or [] after a short wait for more"""
+    try:
+      data = self.socket.recv(self.readSize)
+    except socket.timeout:
+      return []
+    if len(data) == 0:
+      raise EOFError(f"Connection to {self.name} closed")
+    return self.framer.packets(data)
+
+  def close(self):
+    self.socket.close()
+
+class SerialSource(object):
+  def __init__(self, port, baudrate=115200, timeout=0.2):
+    import serial
+    self.name = port
+    self.serial = serial.serial_for_url(port, baudrate=baudrate, timeout=timeout)
+    self.serial.reset_input_buffer()
+    self.framer = SLIPFramer()
+
+  def read(self):
+    return self.framer.packets(self.serial.read(self.serial.in_waiting or 1))
+
+  def close(self):
+    self.serial.close()
+
+def open_source(url, baudrate=115200):
+  uri = urllib.parse.urlparse(url)
+  if uri.scheme == "tcp":
+    return TCPSource(uri.hostname or "localhost", uri.port or 7855)
+  return SerialSource(url, baudrate)
+
+def fsync_policy(text):
+  """'never', 'close' (each file when it is closed), 'flush' (every buffer write) or seconds between syncs"""
+  if text in ['never', 'close', 'flush']:
+    return text
+  try:
+    return float(text)
+  except ValueError:
+    raise argparse.ArgumentTypeError(f"fsync policy must be never, close, flush or seconds, not {text}")
+
+def byte_size(text):
+  """A size such as 512M or 2G"""
+  units = {'K': 1<<10, 'M': 1<<20, 'G': 1<<30}
+  if text[-1:].upper() in units:
+    return int(float(text[:-1]) * units[text[-1:].upper()])
+  return int(text)
+
+class TIORecorder(object):
+  """Writes packets to a log, or to a series of numbered logs when rotating by size or time"""
+
+  def __init__(self, filename, rotateSize=None, rotateTime=None, fsync='close', bufferSize=1<<20, compress=None):
+    self.filename = filename
+    self.rotateSize = rotateSize
+    self.rotateTime = rotateTime
+    self.fsync = fsync
+    self.bufferSize = bufferSize
+    self.compress = compress
+    self.metadata = {} # (routing, type, id): latest packet
+    self.buffer = bytearray()
+    self.file = None
+    self.writer = None # Compressed log writer
+    self.fileIndex = 0
+    self.name = None
+    self.lastSync = time.monotonic()
+    self.open()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def file_name(self):
+    if self.rotateSize is None and self.rotateTime is None:
+      return self.filename
+    stem, ext = os.path.splitext(self.filename)
+    return f"{stem} {self.fileIndex:06d}{ext or '.tio'}"
+
+  def open(self):
+    self.name = self.file_name()
+    self.file = open(self.name, 'wb', buffering=0)
+    if self.compress:
+      self.writer = tio.tio_logzip.TIOZWriter(self.file, codec=self.compress)
+    self.fileStart = time.monotonic()
+    self.fileBytes = 0
+    # The latest metadata first, so that the file decodes on its own
+    self.write_raw(b"".join(packet for payloadType in tio.tio_logzip.METADATA_TYPES
+                            for key, packet in self.metadata.items() if key[1] == payloadType))
+
+  def write_raw(self, data):
+    if self.writer is not None:
+      self.writer.write(data)
+    else:
+      self.buffer += data
+      if len(self.buffer) >= self.bufferSize:
+        self.flush()
+    self.fileBytes += len(data)
+
+  def write_packets(self, packets):
+    """Writes whole packets, rotating to the next file between packets when it is due"""
+    start = 0
+    size = self.fileBytes
+    for i, packet in enumerate(packets):
+      payloadType, routingSize, payloadSize = HEADER.unpack_from(packet)
+      if payloadType in tio.tio_logzip.METADATA_TYPES:
+        self.metadata[(packet[4+payloadSize:], payloadType, packet[4:6])] = packet
+      elif self.rotateSize is not None and size + len(packet) > self.rotateSize and size > 0:
+        self.write_raw(b"".join(packets[start:i]))
+        start = i
+        self.rotate()
+        size = self.fileBytes
+      size += len(packet)
+    self.write_raw(b"".join(packets[start:]))
+
+  def tick(self):
+    """Periodic work: rotation by time and writing out the buffer"""
+    if self.rotateTime is not None and time.monotonic() - self.fileStart >= self.rotateTime:
+      self.rotate()
+    else:
+      self.flush()
+
+  def flush(self):
+    if self.writer is not None:
+      self.file.flush() # Chunks are written as they fill
+    elif self.buffer:
+      self.file.write(self.buffer)
+      self.buffer = bytearray()
+    if self.fsync == 'flush' or (isinstance(self.fsync, float) and time.monotonic() - self.lastSync >= self.fsync):
+      os.fsync(self.file.fileno())
+      self.lastSync = time.monotonic()
+
+  def close_file(self):
+    if self.writer is not None:
+      self.writer.close()
+    self.flush()
+    if self.fsync != 'never':
+      os.fsync(self.file.fileno())
+    self.file.close()
+
+  def rotate(self):
+    self.close_file()
+    self.fileIndex += 1
+    self.open()
+
+  def close(self):
+    if self.file is not None:
+      self.close_file()
+      self.file = None
+
+class RecordStatus(object):
+  """Rates and stream gaps of the packets recorded"""
+
+  def __init__(self):
+    self.started = self.last = time.monotonic()
+    self.bytes = self.packets = 0
+    self.lastBytes = self.lastPackets = 0
+    self.samples = {} # (routing, type): last sample number
+    self.gaps = 0
+    self.missed = 0
+
+  def add(self, packets):
+    self.packets += len(packets)
+    for packet in packets:
+      self.bytes += len(packet)
+      payloadType = packet[0]
+      if payloadType in STREAM_TYPES and len(packet) >= 8:
+        key = (packet[4+HEADER.unpack_from(packet)[2]:], payloadType)
+        sampleNumber = SAMPLE_NUMBER.unpack_from(packet, 4)[0]
+        previous = self.samples.get(key)
+        if previous is not None and sampleNumber != previous + 1:
+          self.gaps += 1
+          self.missed += max(sampleNumber - previous - 1, 0)
+        self.samples[key] = sampleNumber
+
+  def line(self, recorder, errors=0):
+    now = time.monotonic()
+    interval = max(now - self.last, 1e-9)
+    byteRate = (self.bytes - self.lastBytes) / interval
+    packetRate = (self.packets - self.lastPackets) / interval
+    self.last, self.lastBytes, self.lastPackets = now, self.bytes, self.packets
+    line = (f"{now - self.started:8.0f} s  {self.bytes/1e6:10.1f} MB  {byteRate/1e3:8.1f} kB/s  {packetRate:8.0f} packets/s"
+            f"  {self.gaps} gaps ({self.missed} samples)")
+    if errors:
+      line += f"  {errors} bad frames"
+    return line + f"  {os.path.basename(recorder.name)}"
+
+def record(source, recorder, status=None, interval=1.0, duration=None, out=sys.stderr):
+  """Records until the source ends, the duration passes or Ctrl-C"""
+  started = time.monotonic()
+  nextTick = started + interval
+  message = None
+  try:
+    while duration is None or time.monotonic() - started < duration:
+      packets = source.read()
+      if packets:
+        recorder.write_packets(packets)
+        if status is not None:
+          status.add(packets)
+      now = time.monotonic()
+      if now >= nextTick:
+        recorder.tick()
+        if status is not None:
+          out.write("\r" + status.line(recorder, source.framer.errors))
+          out.flush()
+        nextTick = now + interval
+  except KeyboardInterrupt:
+    pass
+  except EOFError as error:
+    message = str(error)
+  finally:
+    recorder.close()
+    source.close()
+    if status is not None:
+      out.write("\n")
+  if message is not None:
+    out.write(message + "\n")
+
+def main():
+  parser = argparse.ArgumentParser(prog='tiorecord',
+                                   description='Record Twinleaf I/O packets to .tio logs.')
+  parser.add_argument("url",
+                      nargs='?',
+                      default='tcp://localhost',
+                      help='tcp://host:port of the proxy, or a serial port such as /dev/ttyUSB0 or COM3')
+  parser.add_argument("file",
+                      nargs='?',
+                      default='log.tio',
+                      help='file to record to; numbered when rotating')
+  parser.add_argument("--baud",
+                      type=int,
+                      default=115200,
+                      help='serial baud rate')
+  parser.add_argument("--rotate-size",
+                      type=byte_size,
+                      default=None,
+                      help='start a new file after this many bytes (such as 512M)')
+  parser.add_argument("--rotate-time",
+                      type=float,
+                      default=None,
+                      help='start a new file after this many seconds')
+  parser.add_argument("--fsync",
+                      type=fsync_policy,
+                      default='close',
+                      help='when to force data to disk: never, close (each file), flush (every write) or seconds')
+  parser.add_argument("--buffer",
+                      type=byte_size,
+                      default=1<<20,
+                      help='bytes buffered between writes')
+  parser.add_argument("--compress",
+                      choices=['zlib', 'lzma'],
+                      default=None,
+                      help='store compressed chunks (read transparently by tiologparse and tio)')
+  parser.add_argument("--duration",
+                      type=float,
+                      default=None,
+                      help='stop after this many seconds')
+  parser.add_argument("-q", "--quiet",
+                      action='store_true',
+                      help='no status line')
+  args = parser.parse_args()
+
+  source = open_source(args.url, args.baud)
+  recorder = TIORecorder(args.file, rotateSize=args.rotate_size, rotateTime=args.rotate_time,
+                         fsync=args.fsync, bufferSize=args.buffer, compress=args.compress)
+  if not args.quiet:
+    sys.stderr.write(f"Recording {source.name} to {recorder.name}\n")
+  record(source, recorder, None if args.quiet else RecordStatus(), duration=args.duration)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+..
+    Copyright: 2026 Twinleaf LLC
+
+Block-formatted TSV/CSV writer for the logging tools.
+
+Rows are formatted a block at a time with one %-format call for the whole
+block instead of str() and join per value and per row, and written through
+a large buffer. With threaded=True, formatting and writing happen on a
+background thread so the reader only hands over the decoded arrays.
+
+With the default precision of None, values are written exactly as str()
+writes them, so the output matches the per-row code it replaces; a
+precision (significant digits) makes float formatting several times faster.
+"""
+
+import itertools
+import queue
+import threading
+
+def row_format(dtypes, precision=None, delimiter="\t"):
+  """%-format string for one row of columns with the given NumPy dtypes (or None for any value).
+  precision is the significant digits of floats, for all columns or as a list per column."""
+  formats = []
+  precisions = precision if isinstance(precision, (list, tuple)) else [precision] * len(dtypes)
+  for dtype, precision in zip(dtypes, precisions):
+    if precision is not None and getattr(dtype, 'kind', 'f') == 'f':
+      formats += [f"%.{precision}g"]
+    elif precision is not None and getattr(dtype, 'kind', None) in ['i', 'u', 'b']:
+      formats += ["%d"]
+    else:
+      formats += ["%r"]
+  return delimiter.join(formats) + "\n"
+
+def format_block(columns, precision=None, delimiter="\t", rowFormat=None):
+  """Text of the rows of a block given as a sequence of equal-length columns (arrays or lists)"""
+  import numpy as np
+  columns = [ np.atleast_1d(np.asarray(column)) for column in columns ]
+  if len(columns) == 0 or len(columns[0]) == 0:
+    return ""
+  if rowFormat is None:
+    rowFormat = row_format([column.dtype for column in columns], precision, delimiter)
+  values = zip(*[column.tolist() for column in columns])
+  return (rowFormat * len(columns[0])) % tuple(itertools.chain.from_iterable(values))
+
+class TSVWriter(object):
+  """Writes headers and blocks of columns to a file through a large buffer.
+
+  A block is a 2D array shaped (columns, samples) or a list of column arrays, as returned by
+  Device.data(samples, as_array=True), stream_read_available and SyncStream.readAvailable.
+  """
+
+  def __init__(self, file, precision=None, delimiter="\t", buffering=1<<20, blockRows=1<<14, threaded=False, maxsize=100):
+    self.owner = isinstance(file, str)
+    self.file = open(file, 'w', buffering=buffering) if self.owner else file
+    self.precision = precision
+    self.delimiter = delimiter
+    self.blockRows = blockRows # Rows formatted per call, which bounds the size of the format tuple
+    self.rowFormats = {} # dtypes: format
+    self.rows = 0
+    self.error = None
+    self.queue = None
+    if threaded:
+      self.queue = queue.Queue(maxsize=maxsize)
+      self.thread = threading.Thread(target=self.run, name='tsv-writer', daemon=True)
+      self.thread.start()
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *args):
+    self.close()
+
+  def write_header(self, names):
+    self.put(self.delimiter.join(map(str, names)) + "\n")
+
+  def write_text(self, text):
+    """Writes text that is already formatted, such as a batch of lines"""
+    self.put(text)
+
+  def write_block(self, block):
+    """Queues or writes a block of columns"""
+    self.put(block)
+
+  def write_rows(self, rows):
+    """Writes a sequence of rows (one sequence of values each)"""
+    self.put(list(zip(*rows)))
+
+  def put(self, item):
+    if self.error is not None:
+      raise self.error
+    if self.queue is None:
+      self.write_item(item)
+    else:
+      self.queue.put(item)
+
+  def write_item(self, item):
+    if isinstance(item, str):
+      self.file.write(item)
+      return
+    import numpy as np
+    columns = [ np.atleast_1d(np.asarray(column)) for column in item ]
+    if len(columns) == 0:
+      return
+    dtypes = tuple(column.dtype for column in columns)
+    rowFormat = self.rowFormats.get(dtypes)
+    if rowFormat is None:
+      rowFormat = self.rowFormats[dtypes] = row_format(dtypes, self.precision, self.delimiter)
+    count = len(columns[0])
+    for start in range(0, count, self.blockRows):
+      self.file.write(format_block([column[start:start+self.blockRows] for column in columns], rowFormat=rowFormat))
+    self.rows += count
+
+  def run(self):
+    while True:
+      item = self.queue.get()
+      try:
+        if item is None:
+          return
+        if self.error is None:
+          self.write_item(item)
+      except Exception as error:
+        self.error = error
+      finally:
+        self.queue.task_done()
+
+  def flush(self):
+    if self.queue is not None:
+      self.queue.join()
+    self.file.flush()
+    if self.error is not None:
+      raise self.error
+
+  def close(self):
+    if self.queue is not None:
+      self.queue.put(None)
+      self.thread.join()
+      self.queue = None
+    if self.owner:
+      self.file.close()
+    else:
+      self.file.flush()
+    if self.error is not None:
+      raise self.error
@@ -31,22 +31,88 @@ class TwinleafConfigController(object):
         enum_list += [(rpc['name'],rpc['datatype'])]
     return enum_list
 
+  def _identity(self):
+    """(document key, rpc, type) of the fields that identify the device; the type is taken from
+    the RPC metadata where there is some"""
+    types = { rpc['name']: rpc['datatype'] for rpc in self._dev._tio.rpcs if rpc['valid'] }
+    fields = [('Name', 'dev.name', tio.STRING_T), ('Revision', 'dev.revision', tio.UINT16_T),
+              ('Serial', 'dev.serial', tio.STRING_T), ('Firmware', 'dev.firmware.serial', tio.STRING_T)]
+    return [ (key, rpc, types.get(rpc, rpcType)) for key, rpc, rpcType in fields ]
+
+  def snapshot(self, window=8):
+    """
+    Reads the identity of the device and all values that are saved to EEPROM, as one pipelined
+    batch of RPCs. Returns a document as written by download: Name, Revision, Serial, Firmware
+    and the Configuration by RPC name.
+    """
+    identity = self._identity()
+    functions = self._enum()
+    values = self._dev._tio.rpc_val_batch([ (rpc, rpcType, None) for key, rpc, rpcType in identity ] +
+                                          [ (function, function_type, None) for function, function_type in functions ],
+                                          window=window)
+    for value in values[:len(identity)]:
+      if isinstance(value, Exception):
+        raise value
+    document = { key: value for (key, rpc, rpcType), value in zip(identity, values) }
+    document['Configuration'] = {}
+    for (function, function_type), value in zip(functions, values[len(identity):]):
+      if isinstance(value, Exception):
+        raise IOError(f"Could not read {function}: {value}")
+      document['Configuration'][function] = value
+    return document
+
+  def apply(self, snapshot, write=True, window=8):
+    """
+    Writes the stored values of a snapshot that differ from those on the device, as one
+    pipelined batch of RPCs (or only compares them when write is False). Raises an exception
+    when the snapshot is of another kind of device. Returns the differences:
+      changed      - {rpc: (device value, snapshot value)} of the values written
+      unchanged    - RPCs whose values already matched
+      failed       - {rpc: error} of the values that could not be written
+      unknown      - RPCs of the snapshot that are not stored on the device
+      not_provided - RPCs stored on the device that are not in the snapshot
+      identity     - {field: (device, snapshot)} for Revision, Serial and Firmware mismatches
+    """
+    current = self.snapshot(window=window)
+    if snapshot['Name'] != current['Name']:
+      raise Exception(f"Device mismatch: device is '{current['Name']}'; file is '{snapshot['Name']}'.")
+    diff = {'changed': {}, 'unchanged': [], 'failed': {}, 'unknown': [], 'not_provided': [], 'identity': {}}
+    for key in ['Revision', 'Serial', 'Firmware']:
+      if snapshot.get(key) != current[key]:
+        diff['identity'][key] = (current[key], snapshot.get(key))
+    configuration = snapshot['Configuration']
+    diff['unknown'] = [ function for function in configuration if function not in current['Configuration'] ]
+    writes = []
+    for function, function_type in self._enum():
+      if function not in configuration:
+        diff['not_provided'] += [function]
+      elif configuration[function] == current['Configuration'][function]:
+        diff['unchanged'] += [function]
+      else:
+        diff['changed'][function] = (current['Configuration'][function], configuration[function])
+        writes += [(function, function_type, configuration[function])]
+    if not write:
+      return diff
+    requests = []
+    for function, function_type, value in writes:
+      try:
+        requests += [(function, self._dev._tio.rpc_encode(function_type, value))]
+      except (struct.error, AttributeError) as error: # A value that does not fit the type
+        diff['failed'][function] = str(error)
+    replies = self._dev._tio.rpc_batch(requests, window=window)
+    for (function, payload), reply in zip(requests, replies):
+      if isinstance(reply, Exception):
+        diff['failed'][function] = str(reply) or type(reply).__name__
+    for function in diff['failed']:
+      del diff['changed'][function]
+    return diff
+
   def download(self, filename = "config.yaml"):
     """
     Reads all values that are saved to EEPROM
     """
-    configuration = {}
-    functions = self._enum()
-    for function, function_type in functions:
-      value = self._dev._tio.rpc_val(function, rpcType=function_type)
-      configuration[function] = value
-    document = {
-      'Name': self._dev.dev.name(),
-      'Revision': self._dev.dev.revision(),
-      'Serial': self._dev.dev.serial(),
-      'Firmware': self._dev.dev.firmware.serial(), 
-    }
-    document['Configuration'] = configuration
+    document = self.snapshot()
+    configuration = document['Configuration']
     if filename:
       stream = open(filename, 'w')
       yaml.dump(document, stream, default_flow_style=False)
@@ -59,44 +125,23 @@ class TwinleafConfigController(object):
     """
     stream = open(filename, 'r')
     document = yaml.load(stream, Loader=yaml.SafeLoader)
-
-    configuration = {}
-    functions = self._enum()
-    functionValues = self.download(filename = None)
-
-    dev_name = self._dev.dev.name()
-    revision = self._dev.dev.revision()
-    serial = self._dev.dev.serial()
-    firmware = self._dev.dev.firmware.serial()
-
-    if document['Name'] != dev_name:
-      raise Exception(f"Device mismatch: device is '{dev_name}'; file is '{document['Name']}'.")
-
-    if document['Revision'] != revision:
-      print(f"ID mismatch: device is {revision}; file is {document['Revision']}")
-
-    if document['Serial'] != serial:
-      print(f"ID mismatch: device is {serial}; file is {document['Serial']}")
-
-    if document['Firmware'] != firmware:
-      print(f"Firmware mismatch: device is {firmware}; file is {document['Firmware']}")
-
-    for function in document['Configuration'].keys():
-      if function not in functionValues.keys():
-        print(f'Skipping configuration for {function}; variable not available on device.')
-
-    for function, function_type in functions:
-      if function in list(document['Configuration'].keys()):
-        valueConfig = document['Configuration'][function]
-        valueDevice = functionValues[function]
-        if valueDevice == valueConfig:
-          print(f'Skipping configuration for {function}; value {valueConfig} not changed.')
-        else:
-          try: 
-            self._dev._tio.rpc_val(function, function_type, valueConfig)
-            print(f'Changing configuration for {function} from {valueDevice} to {valueConfig}.')
-          except:
-            print(f'Error changing configuration for {function} from {valueDevice} to {valueConfig}.')
-      else:
-        print(f'Skipping configuration for {function}; value not provided (is it a new variable on device?).')
+    diff = self.apply(document)
+
+    for key, (device, file) in diff['identity'].items():
+      kind = "Firmware" if key == 'Firmware' else "ID"
+      print(f"{kind} mismatch: device is {device}; file is {file}")
+
+    for function in diff['unknown']:
+      print(f'Skipping configuration for {function}; variable not available on device.')
+
+    if diff['unchanged']:
+      print(f'Skipping configuration for {len(diff["unchanged"])} values that did not change.')
+    for function in diff['changed']:
+      valueDevice, valueConfig = diff['changed'][function]
+      print(f'Changing configuration for {function} from {valueDevice} to {valueConfig}.')
+    for function, error in diff['failed'].items():
+      print(f'Error changing configuration for {function} to {document["Configuration"][function]}: {error}')
+    for function in diff['not_provided']:
+      print(f'Skipping configuration for {function}; value not provided (is it a new variable on device?).')
+    return diff
 
@@ -11,8 +11,8 @@ class TwinleafDataController(object):
   def __init__(self, dev):
     self._dev = dev
 
-  def __call__(self, samples=1, duration=None, timeaxis=False, flush=True, simplify_single=True):
-    return self._dev._tio.stream_read_raw(samples = samples, duration=duration, flush=flush, timeaxis=timeaxis, simplify_single=simplify_single)
+  def __call__(self, samples=1, duration=None, timeaxis=False, flush=True, simplify_single=True, hosttime=False, as_array=False):
+    return self._dev._tio.stream_read_raw(samples = samples, duration=duration, flush=flush, timeaxis=timeaxis, simplify_single=simplify_single, hosttime=hosttime, as_array=as_array)
 
   def columnnames(self, withName=True):
     columnnames = self._dev._tio.protocol.columns
@@ -21,17 +21,40 @@ class TwinleafDataController(object):
       columnnames = [self._dev._tio.name+' '+routingString+' '+columnname for columnname in columnnames ]
     return columnnames
 
-  def iter(self, samples=0, flush=True, timeaxis=False, simplify_single=True):
+  def iter(self, samples=0, flush=True, timeaxis=False, simplify_single=True, hosttime=False):
     if flush:
       self._dev._tio.pub_flush()
     if samples==0:
       while True:
         self._dev._tio.pub_warn_overload()
-        yield self._dev._tio.stream_read_raw(samples = 1, flush=False, timeaxis=timeaxis, simplify_single=simplify_single)
+        yield self._dev._tio.stream_read_raw(samples = 1, flush=False, timeaxis=timeaxis, simplify_single=simplify_single, hosttime=hosttime)
     else:
       for x in range(samples):
         self._dev._tio.pub_warn_overload()
-        yield self._dev._tio.stream_read_raw(samples = 1, flush=False, timeaxis=timeaxis, simplify_single=simplify_single)
+        yield self._dev._tio.stream_read_raw(samples = 1, flush=False, timeaxis=timeaxis, simplify_single=simplify_single, hosttime=hosttime)
+
+  def read_available(self, timeout=None, timeaxis=False):
+    """Every sample waiting in the queue as a list of one array per column, each in the column's
+    own type, waiting up to timeout for the first (raises queue.Empty). With timeaxis, the
+    first array is the time."""
+    sampleNumbers, data = self._dev._tio.stream_read_available(timeout=timeout, native=True)
+    if timeaxis:
+      stream = self._dev._tio.protocol.streams[0]
+      data = [sampleNumbers / stream['stream_Fs'] + stream['stream_start_time_sec']] + data
+    return data
+
+  def decimate(self, factor, method='boxcar', **options):
+    """Reader for the whole stream decimated on the host; see tio.tio_decimate"""
+    from tio.tio_decimate import TIODecimatedStream
+    return TIODecimatedStream(self._dev._tio, factor, method=method, **options)
+
+  def statistics(self, window=60, bucket=1.0):
+    """Running per-column statistics of the whole stream, kept up to date in the background; see tio.tio_runstats"""
+    from tio.tio_runstats import TIOStreamStatistics
+    return TIOStreamStatistics(self._dev._tio, window=window, bucket=bucket)
+
+  def latency(self, reset=False):
+    return self._dev._tio.latency(reset=reset)
 
   def queueSize(self):
     return self._dev._tio.pub_queue.qsize()
@@ -8,14 +8,52 @@ from typing import List
 import tio
 import struct
 
-def rpc_capture_block(self, index:int = 0, blocksize:int=256, size:int=32768, typecode:str="L") -> List[float]:
-  capture = []
-  blocks = int(size/blocksize)
-  entriesPerBlock = int(blocksize/struct.Struct('<'+typecode).size)
-  packcode = "<"+str(entriesPerBlock)+typecode
-  for blockindex in range(blocks):
-    block = self._tio.rpc_val('capture.block', rpcType = tio.UINT16_T, value=blockindex, returnRaw = True)
-    capture += struct.unpack(packcode, block)
-  return capture
+# struct codes of capture entries as NumPy types of the same size
+CAPTURE_DTYPES = {'b': 'i1', 'B': 'u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4', 'l': '<i4', 'L': '<u4',
+                  'q': '<i8', 'Q': '<u8', 'e': '<f2', 'f': '<f4', 'd': '<f8'}
 
+def capture_download(session, size=32768, blocksize=256, window=8, retries=3, segmentBlocks=1024, file=None, timeout=3.0):
+  """Reads size bytes of a capture with capture.block, keeping `window` requests outstanding and
+  putting each reply at its block's offset in a preallocated buffer. Blocks that fail are asked
+  for again, up to `retries` times. The capture is read in segments of segmentBlocks blocks; with
+  a file, each segment is written to it as it completes and only one segment is kept in memory.
+  Returns the buffer (a bytearray), or the number of bytes written to the file."""
+  blocks = size // blocksize
+  buffer = bytearray(min(blocks, segmentBlocks if file is not None else blocks) * blocksize)
+  view = memoryview(buffer)
+  written = 0
+  for first in range(0, blocks, segmentBlocks if file is not None else max(blocks, 1)):
+    segment = range(first, min(first + len(buffer) // blocksize, blocks))
+    missing = list(segment)
+    for attempt in range(retries + 1):
+      replies = session.rpc_batch([ ('capture.block', struct.pack("<H", block)) for block in missing ], window=window, timeout=timeout)
+      failed = []
+      for block, reply in zip(missing, replies):
+        if isinstance(reply, Exception) or reply is None or len(reply) != blocksize:
+          failed += [block]
+          continue
+        offset = (block - first) * blocksize
+        view[offset:offset+blocksize] = reply
+      missing = failed
+      if not missing:
+        break
+    if missing:
+      raise IOError(f"Could not read capture blocks {missing} after {retries + 1} attempts")
+    if file is not None:
+      file.write(view[:len(segment)*blocksize])
+      written += len(segment) * blocksize
+  return written if file is not None else buffer
 
+def rpc_capture_block(self, index:int = 0, blocksize:int=256, size:int=32768, typecode:str="L", window:int=8, retries:int=3, as_array:bool=False, filename:str=None) -> List[float]:
+  """Downloads a capture with pipelined capture.block requests (see capture_download). Returns the
+  entries as a list, or as a NumPy array with as_array. With a filename, the raw little-endian
+  entries are streamed to that file instead and the number of entries is returned."""
+  entrySize = struct.Struct('<'+typecode).size
+  if filename is not None:
+    with open(filename, 'wb') as f:
+      return capture_download(self._tio, size=size, blocksize=blocksize, window=window, retries=retries, file=f) // entrySize
+  buffer = capture_download(self._tio, size=size, blocksize=blocksize, window=window, retries=retries)
+  if as_array:
+    import numpy as np
+    return np.frombuffer(buffer, dtype=CAPTURE_DTYPES[typecode])
+  return [ entry for entry, in struct.iter_unpack('<'+typecode, buffer) ]
@@ -14,9 +14,122 @@ from .tl_cmds import *
 import types
 import re
 
+class RPCNode(object):
+  """A level of the RPC name tree, such as dev and dev.port for dev.port.mode. The nodes below
+  are made from the trie of RPC names when first accessed and kept."""
+  __slots__ = ('_tio', '_trie', '_children')
+
+  def __init__(self, session, trie):
+    self._tio = session
+    self._trie = trie # {name: [rpc or None, children]}
+    self._children = {}
+
+  def __getattr__(self, name):
+    if name in _NODE_SLOTS: # Not set yet, as while copying
+      raise AttributeError(name)
+    node = self._children.get(name)
+    if node is None:
+      if name not in self._trie:
+        raise AttributeError(f"No RPC or attribute {name}")
+      node = self._children[name] = _rpc_node(self._tio, self._trie[name])
+    return node
+
+  def __dir__(self):
+    return sorted(set(object.__dir__(self)) | set(self._trie))
+
+class RPCValue(RPCNode):
+  """An RPC that reads, or writes when given a value"""
+  __slots__ = ('_rpcName', '_rpcType')
+
+  def __init__(self, session, trie, rpcName, rpcType):
+    RPCNode.__init__(self, session, trie)
+    self._rpcName = rpcName
+    self._rpcType = rpcType
+
+  def __call__(self, value=None):
+    return self._tio.rpc_val(self._rpcName, self._rpcType, value)
+
+  def __repr__(self):
+    return f"<RPC {self._rpcName}>"
+
+class RPCReadOnly(RPCValue):
+  __slots__ = ()
+
+  def __call__(self):
+    return self._tio.rpc_val(self._rpcName, self._rpcType)
+
+class RPCDriver(RPCValue):
+  """An RPC handled by a driver function (rpc_<name> in tl_cmds) called with the node as self"""
+  __slots__ = ('_driver',)
+
+  def __init__(self, session, trie, rpcName, rpcType, driver):
+    RPCValue.__init__(self, session, trie, rpcName, rpcType)
+    self._driver = driver
+
+  def __call__(self, *args, **kwargs):
+    return self._driver(self, *args, **kwargs)
+
+_NODE_SLOTS = set(RPCNode.__slots__ + RPCValue.__slots__ + RPCDriver.__slots__)
+
+def _rpc_driver(rpc):
+  return globals().get('rpc_'+rpc['name'].replace('.','_'))
+
+def _rpc_trie(rpcs):
+  """Nested {name: [rpc or None, children]} of the RPC names split at the dots"""
+  root = {}
+  for rpc in rpcs:
+    node = [None, root]
+    for part in rpc['name'].split('.'):
+      node = node[1].setdefault(part, [None, {}])
+    node[0] = rpc
+  return root
+
+def _rpc_node(session, entry):
+  rpc, children = entry
+  if rpc is None:
+    return RPCNode(session, children)
+  if not rpc['valid']:
+    return RPCDriver(session, children, rpc['name'], rpc['datatype'], _rpc_driver(rpc))
+  if rpc['w']:
+    return RPCValue(session, children, rpc['name'], rpc['datatype'])
+  return RPCReadOnly(session, children, rpc['name'], rpc['datatype'])
+
+class TwinleafSource(object):
+  """A data source, read by calling it"""
+
+  def __init__(self, session, sourceName):
+    self._tio = session
+    self._sourceName = sourceName
+
+  def __call__(self, samples=1, duration=None, flush=True, timeaxis=False, simplify_single=True, hosttime=False, as_array=False):
+    return self._tio.stream_read_topic(self._sourceName, samples=samples, duration=duration, flush=flush, timeaxis=timeaxis, simplify_single=simplify_single, hosttime=hosttime, as_array=as_array)
+
+  def rate(self):
+    return self._tio.source_rate(self._sourceName)
+
+  def columnnames(self, withName = True):
+    return self._tio.stream_topic_columnnames(self._sourceName, withName = withName)
+
+  def queueSize(self):
+    return self._tio.pub_queue.qsize() # TODO: divide by stream column rate
+
+  def decimate(self, factor, method='boxcar', **options):
+    from tio.tio_decimate import TIODecimatedStream
+    return TIODecimatedStream(self._tio, factor, method=method, topic=self._sourceName, **options)
+
+  def statistics(self, window=60, bucket=1.0):
+    from tio.tio_runstats import TIOStreamStatistics
+    return TIOStreamStatistics(self._tio, topic=self._sourceName, window=window, bucket=bucket)
+
+class TwinleafSourceGroup(object):
+  """A level of source names, such as imu for imu.accel"""
+
+  def __init__(self, session):
+    self._tio = session
+
 class Device():
-  def __init__(self, url="tcp://localhost", verbose=False, rpcs=[], stateCache=True, connectingMessage = True, send_router=None, specialize=True, timeout=False):
-    self._tio = tio.TIOSession(url, verbose=verbose, rpcs=rpcs, stateCache=stateCache, connectingMessage = connectingMessage, send_router=send_router, specialize=specialize, timeout=timeout)
+  def __init__(self, url="tcp://localhost", verbose=False, rpcs=[], stateCache=True, connectingMessage = True, send_router=None, specialize=True, timeout=False, instrument=False, timestamps=False):
+    self._tio = tio.TIOSession(url, verbose=verbose, rpcs=rpcs, stateCache=stateCache, connectingMessage = connectingMessage, send_router=send_router, specialize=specialize, timeout=timeout, instrument=instrument, timestamps=timestamps)
     self.dev = TwinleafDevInfoController(self)
     if specialize:
       self._specialize()
@@ -51,84 +164,61 @@ class Device():
         banner=banner, 
         exitmsg = exit_msg)
 
-  def _add_rpc_method(parent,parentClass=None,name="test", rpcName="", rpcType=tio.FLOAT32_T, callWithValue=True, driver=None):
-    def  __init__(self):
-      self._tio = parent._tio
-      self._rpcName = rpcName
-      self._rpcType = rpcType
-    def rpcCallWithValue(self, value=None):
-      return self._tio.rpc_val(self._rpcName, self._rpcType, value)
-    def rpcCallNoValue(self):
-      return self._tio.rpc_val(self._rpcName, self._rpcType)
-    if rpcName is not "":
-      if driver is not None:
-        cls = type(name,(), {'__init__':__init__, '__call__':driver})
-      elif callWithValue:
-        cls = type(name,(), {'__init__':__init__, '__call__':rpcCallWithValue})
-      else:
-        cls = type(name,(), {'__init__':__init__, '__call__':rpcCallNoValue})
-    else:
-      cls = type(name,(), {'__init__':__init__})
-    clsInstance = cls()
-    setattr(parentClass, name, clsInstance)
+  def __getattr__(self, name):
+    # RPCs are made into attributes when first used
+    trie = self.__dict__.get('_rpcTrie')
+    if trie is None or name not in trie:
+      raise AttributeError(f"'Device' object has no attribute '{name}'")
+    node = self.__dict__[name] = _rpc_node(self._tio, trie[name])
+    return node
 
-  def _add_rpc_path(self,path="this.here.command", rpcType=tio.FLOAT32_T, callWithValue=True, driver=None):
-    parts = path.split('.')
-    parent = self
-    for part in parts[:-1]:
-      if part not in vars(parent).keys():
-        self._add_rpc_method(parentClass=parent, name=part)
-      parent = parent.__dict__[part]
-    self._add_rpc_method(parentClass=parent, name=parts[-1], rpcName=path, rpcType=rpcType, callWithValue=callWithValue, driver=driver)
+  def __dir__(self):
+    return sorted(set(object.__dir__(self)) | set(self.__dict__.get('_rpcTrie', {})))
 
   def _add_rpcs(self):
-    sorted_rpcs = self._tio.rpcs
-    sorted_rpcs.sort(key=lambda x:x['name']) # Make sure x() is registered before x.offset()
-    for rpc in sorted_rpcs:
-      if rpc['valid']:
-        self._add_rpc_path(path=rpc['name'], rpcType=rpc['datatype'], callWithValue=rpc['w'])
+    rpcs = []
+    for rpc in self._tio.rpcs:
+      # Without valid metadata, an RPC needs a special driver with its name
+      if rpc['valid'] or _rpc_driver(rpc) is not None:
+        rpcs += [rpc]
       else:
-        # print(f"Invalid metadata: {rpc['name']}")
-        # Look for special driver with the name of the rpc
-        rpcdrivername = 'rpc_'+rpc['name'].replace('.','_')
-        if rpcdrivername in globals():
-          rpcdriver = globals()[rpcdrivername]
-          self._add_rpc_path(path=rpc['name'], rpcType=rpc['datatype'], callWithValue=rpc['w'], driver=rpcdriver)
-        else:
-          self._tio.logger.debug(f"Unimplemented RPC: {rpc['name']}")
-
-  def _add_source_method(parent, parentClass=None, name="test", sourceName=""):
-    def __init__(self):
-      self._tio = parent._tio
-      self._sourceName = sourceName
-    def __call__(self, samples=1, duration=None, flush=True, timeaxis=False, simplify_single=True):
-      return self._tio.stream_read_topic(self._sourceName, samples=samples, duration=duration, flush=flush, timeaxis=timeaxis, simplify_single=simplify_single)
-    def rate(self):
-      return self._tio.source_rate(self._sourceName)
-    def columnnames(self, withName = True):
-      return self._tio.stream_topic_columnnames(self._sourceName, withName = withName)
-    def queueSize(self):
-      return self._tio.pub_queue.qsize() # TODO: divide by stream column rate
-    if sourceName is not "":
-      cls = type(name,(), {'__init__':__init__, '__call__':__call__, 'rate':rate, 'columnnames':columnnames, 'queueSize':queueSize})
+        self._tio.logger.debug(f"Unimplemented RPC: {rpc['name']}")
+    self._rpcTrie = _rpc_trie(rpcs)
+    for name, entry in self._rpcTrie.items():
+      existing = self.__dict__.get(name)
+      if isinstance(existing, RPCNode):
+        del self.__dict__[name] # Made from an earlier list of RPCs
+      elif existing is not None:
+        self._graft_rpc(self, name, entry)
+
+  def _graft_rpc(self, parent, name, entry):
+    """Attaches an RPC, or a level of RPC names, where there is an attribute that is not an
+    RPC node, such as dev (the device information controller) or a source. A level adds
+    its RPCs to the attribute; an RPC replaces it."""
+    existing = vars(parent).get(name)
+    if entry[0] is None and existing is not None and not isinstance(existing, RPCNode):
+      for childName, child in entry[1].items():
+        self._graft_rpc(existing, childName, child)
     else:
-      cls = type(name,(), {'__init__':__init__})
-    clsInstance = cls()
-    setattr(parentClass, name, clsInstance)
+      setattr(parent, name, _rpc_node(self._tio, entry))
 
   def _add_source_path(self, path="that.stream"):
     parts = path.split('.')
     parent = self
     for part in parts[:-1]:
       if part not in vars(parent).keys():
-        self._add_source_method(parentClass=parent, name=part)
+        setattr(parent, part, TwinleafSourceGroup(self._tio))
       parent = parent.__dict__[part]
-    self._add_source_method(parentClass=parent, name=parts[-1], sourceName=path)
+    setattr(parent, parts[-1], TwinleafSource(self._tio, path))
 
   def _add_sources(self):
     for source in self._tio.protocol.sources.values():
       self._add_source_path(path=source['source_name'])
 
+  def _enable_rpc_cache(self, ttl=0, policies=None, sessionInterval=5.0):
+    """Answers repeated RPC reads (dev.name, dev.serial, ...) from a cache; see tio.tio_rpccache"""
+    return self._tio.enable_rpc_cache(ttl=ttl, policies=policies, sessionInterval=sessionInterval)
+
   def _close(self):
     self._tio.close()
 